@@ -1,8 +1,19 @@
 from abc import ABC, abstractmethod
 from lpp.token import Token
-from typing import Optional
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterator,
+    Optional,
+)
+
+if TYPE_CHECKING:
+    from lpp.object import Object, ObjectType
+    from lpp.resolver import FunctionScope, Name
 
 class ASTNode(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def token_literal(self) -> str:
         pass
@@ -12,21 +23,50 @@ class ASTNode(ABC):
         pass
 
 
+# Nodes may be built without their token to save memory, only the offset of
+# the token is kept. token_literal() then rebuilds the literal from the node.
 class Statement(ASTNode):
-    def __init__(self, token: Token) -> None:
+    __slots__ = ('token', 'offset')
+
+    def __init__(self, token: Optional[Token], offset: Optional[int] = None) -> None:
         self.token = token
+        self.offset = _token_offset(token, offset)
 
     def token_literal(self) -> str:
-        return self.token.literal
+        if self.token is not None:
+            return self.token.literal
+        return self._literal()
+
+    @abstractmethod
+    def _literal(self) -> str:
+        pass
 
 class Expression(ASTNode):
-    def __init__(self, token: Token) -> None:
+    __slots__ = ('token', 'offset')
+
+    def __init__(self, token: Optional[Token], offset: Optional[int] = None) -> None:
         self.token = token
-    
+        self.offset = _token_offset(token, offset)
+
     def token_literal(self) -> str:
-        return self.token.literal
+        if self.token is not None:
+            return self.token.literal
+        return self._literal()
+
+    @abstractmethod
+    def _literal(self) -> str:
+        pass
+
+def _token_offset(token: Optional[Token], offset: Optional[int]) -> int:
+    if offset is not None:
+        return offset
+    if token is not None:
+        return token.offset
+    return -1
 
 class Program(ASTNode):
+    __slots__ = ('statements',)
+
     def __init__(self, statements: list[Statement]) -> None:
         self.statements = statements
 
@@ -39,121 +79,253 @@ class Program(ASTNode):
     def __str__(self) -> str:
         return ''.join([str(s) for s in self.statements])
 
+    @property
+    def offset(self) -> int:
+        return 0
+
 class Identifier(Expression):
-    def __init__(self, token: Token, value: str) -> None:
-        super().__init__(token)
+    __slots__ = ('value', 'resolved')
+
+    def __init__(
+        self,
+        token: Optional[Token],
+        value: str,
+        offset: Optional[int] = None
+    ) -> None:
+        super().__init__(token, offset)
         self.value = value
+        self.resolved: Optional['Name'] = None # filled in by lpp.resolver
 
     def __str__(self) -> str:
         return self.value
 
+    def _literal(self) -> str:
+        return self.value
+
 class LetStatement(Statement):
+    __slots__ = ('name', 'value', 'slot')
+
     def __init__(
         self,
-        token: Token,
+        token: Optional[Token],
         name: Identifier,
-        value: Optional[Expression] = None
+        value: Optional[Expression] = None,
+        offset: Optional[int] = None
     ) -> None:
 
-        super().__init__(token)
+        super().__init__(token, offset)
         self.name = name
         self.value = value
+        self.slot: Optional[int] = None # filled in by lpp.resolver
 
     def __str__(self) -> str:
         return f'{self.token_literal()} {str(self.name)} = {str(self.value)};'
 
+    def _literal(self) -> str:
+        return 'variable'
+
 class ReturnStatement(Statement):
+    __slots__ = ('return_value', 'tail')
+
     def __init__(
             self,
-            token: Token,
-            return_value: Optional[Expression] = None
+            token: Optional[Token],
+            return_value: Optional[Expression] = None,
+            offset: Optional[int] = None
         ) -> None:
-            super().__init__(token)
+            super().__init__(token, offset)
             self.return_value = return_value
+            # set by lpp.resolver, True for a call in tail position
+            self.tail: Optional[bool] = None
 
     def __str__(self) -> str:
         return f'{self.token_literal()} {str(self.return_value)};'
 
+    def _literal(self) -> str:
+        return 'regresa'
+
 class ExpressionStatement(Statement):
-    def __init__(self, token: Token, expression: Optional[Expression] = None) -> None:
-        super().__init__(token)
+    __slots__ = ('expression',)
+
+    def __init__(
+        self,
+        token: Optional[Token],
+        expression: Optional[Expression] = None,
+        offset: Optional[int] = None
+    ) -> None:
+        super().__init__(token, offset)
         self.expression = expression
 
     def __str__(self) -> str:
         return str(self.expression)
 
+    def _literal(self) -> str:
+        if self.expression is None:
+            return ''
+        return self.expression.token_literal()
+
 class Integer(Expression):
-    def __init__(self, token: Token, value: Optional[int] = None) -> None:
-        super().__init__(token)
+    __slots__ = ('value', 'constant')
+
+    def __init__(
+        self,
+        token: Optional[Token],
+        value: Optional[int] = None,
+        offset: Optional[int] = None
+    ) -> None:
+        super().__init__(token, offset)
         self.value = value
+        # the runtime object of the literal, created on its first evaluation
+        self.constant: Optional['Object'] = None
 
     def __str__(self) -> str:
         return str(self.value)
-        
+
+    def _literal(self) -> str:
+        return str(self.value)
+
 class StringLiteral(Expression):
-    def __init__(self, token: Token, value: str) -> None:
-        super().__init__(token)
+    __slots__ = ('value', 'constant')
+
+    def __init__(
+        self,
+        token: Optional[Token],
+        value: str,
+        offset: Optional[int] = None
+    ) -> None:
+        super().__init__(token, offset)
         self.value = value
+        # the runtime object of the literal, created on its first evaluation
+        self.constant: Optional['Object'] = None
 
     def __str__(self) -> str:
         return self.value
 
+    def _literal(self) -> str:
+        return self.value
+
 class Prefix(Expression):
+    __slots__ = ('operator', 'right', 'proven_types')
+
     def __init__(
         self,
-        token: Token,
+        token: Optional[Token],
         operator: str,
-        right: Optional[Expression] = None
+        right: Optional[Expression] = None,
+        offset: Optional[int] = None
     ) -> None:
-        super().__init__(token)
+        super().__init__(token, offset)
         self.operator = operator
         self.right = right
+        # set by lpp.inference, see Infix
+        self.proven_types: Optional[tuple['ObjectType', ...]] = None
 
     def __str__(self) -> str:
         return f'({self.operator}{str(self.right)})'
 
+    def _literal(self) -> str:
+        return self.operator
+
 class Infix(Expression):
+    __slots__ = ('left', 'operator', 'right', 'specialized', 'proven_types')
+
     def __init__(
         self,
-        token: Token,
+        token: Optional[Token],
         left: Expression,
         operator: str,
-        right: Optional[Expression] = None
+        right: Optional[Expression] = None,
+        offset: Optional[int] = None
     ) -> None:
-        super().__init__(token)
+        super().__init__(token, offset)
 
         self.left = left
         self.operator = operator
         self.right = right
+        # set by lpp.evaluator on the first evaluation, the operation for
+        # the operand types seen then
+        self.specialized: Optional[Callable[['Object', 'Object'], Optional['Object']]] = None
+        # set by lpp.inference, the types the operands always have, or ()
+        # when they could not be proven
+        self.proven_types: Optional[tuple['ObjectType', ...]] = None
 
     def __str__(self) -> str:
         return f'({str(self.left)} {self.operator} {str(self.right)})'
 
+    def _literal(self) -> str:
+        return self.operator
+
 class Boolean(Expression):
-    def __init__(self, token: Token, value: Optional[bool] = None) -> None:
-        super().__init__(token)
+    __slots__ = ('value',)
+
+    def __init__(
+        self,
+        token: Optional[Token],
+        value: Optional[bool] = None,
+        offset: Optional[int] = None
+    ) -> None:
+        super().__init__(token, offset)
         self.value = value
 
     def __str__(self) -> str:
         return self.token_literal()
 
+    def _literal(self) -> str:
+        return 'verdadero' if self.value else 'falso'
+
+# The statements of a block can be parsed on demand: parse_statements is
+# called the first time they are needed.
 class Block(Statement):
-    def __init__(self, token: Token, statements: list[Statement]) -> None:
-        super().__init__(token)
-        self.statements = statements
+    __slots__ = ('_statements', '_parse_statements', 'parse_error')
+
+    def __init__(
+        self,
+        token: Optional[Token],
+        statements: list[Statement],
+        offset: Optional[int] = None,
+        parse_statements: Optional[Callable[[], list[Statement]]] = None
+    ) -> None:
+        super().__init__(token, offset)
+        self._statements = statements
+        self._parse_statements = parse_statements
+        # first syntax error (message, offset) of a lazily parsed block,
+        # known once its statements are parsed
+        self.parse_error: Optional[tuple[str, int]] = None
+
+    @property
+    def statements(self) -> list[Statement]:
+        if self._parse_statements is not None:
+            self._statements = self._parse_statements()
+            self._parse_statements = None
+        return self._statements
+
+    @statements.setter
+    def statements(self, statements: list[Statement]) -> None:
+        self._statements = statements
+        self._parse_statements = None
+
+    @property
+    def parsed(self) -> bool:
+        return self._parse_statements is None
 
     def __str__(self) -> str:
         return ''.join([str(s) for s in self.statements])
 
+    def _literal(self) -> str:
+        return '{'
+
 class If(Expression):
+    __slots__ = ('condition', 'consequence', 'alternative')
+
     def __init__(
         self,
-        token: Token,
+        token: Optional[Token],
         condition: Optional[Expression] = None,
         consequence: Optional[Block] = None,
-        alternative: Optional[Block] = None
+        alternative: Optional[Block] = None,
+        offset: Optional[int] = None
     ) -> None:
-        super().__init__(token)
+        super().__init__(token, offset)
         self.condition = condition
         self.consequence = consequence
         self.alternative = alternative
@@ -165,33 +337,83 @@ class If(Expression):
 
         return out
 
+    def _literal(self) -> str:
+        return 'si'
+
 class Function(Expression):
+    __slots__ = ('parameters', 'body', 'scope')
+
     def __init__(
         self,
-        token: Token,
+        token: Optional[Token],
         parameters: list[Identifier] = [],
-        body: Optional[Block] = None
+        body: Optional[Block] = None,
+        offset: Optional[int] = None
     ) -> None:
-        super().__init__(token)
+        super().__init__(token, offset)
         self.parameters = parameters
         self.body = body
+        self.scope: Optional['FunctionScope'] = None # filled in by lpp.resolver
 
     def __str__(self) -> str:
         params = ',  '.join([str(p) for p in self.parameters])
         return f'{self.token_literal()}({params}) {str(self.body)}'
 
+    def _literal(self) -> str:
+        return 'procedimiento'
+
 
 class Call(Expression):
+    __slots__ = ('function', 'arguments')
+
     def __init__(
         self,
-        token: Token,
+        token: Optional[Token],
         function: Expression,
-        arguments: list[Expression]
+        arguments: list[Expression],
+        offset: Optional[int] = None
     ) -> None:
-        super().__init__(token)
+        super().__init__(token, offset)
         self.function = function
         self.arguments = arguments
 
     def __str__(self) -> str:
         args = ', '.join([str(a) for a in self.arguments])
         return f'{str(self.function)}({args})'
+
+    def _literal(self) -> str:
+        return '('
+
+
+def iter_children(node: ASTNode) -> Iterator[ASTNode]:
+    children: list[Optional[ASTNode]] = []
+
+    if isinstance(node, (Program, Block)):
+        children = list(node.statements)
+    elif isinstance(node, LetStatement):
+        children = [node.name, node.value]
+    elif isinstance(node, ReturnStatement):
+        children = [node.return_value]
+    elif isinstance(node, ExpressionStatement):
+        children = [node.expression]
+    elif isinstance(node, Prefix):
+        children = [node.right]
+    elif isinstance(node, Infix):
+        children = [node.left, node.right]
+    elif isinstance(node, If):
+        children = [node.condition, node.consequence, node.alternative]
+    elif isinstance(node, Function):
+        children = [*node.parameters, node.body]
+    elif isinstance(node, Call):
+        children = [node.function, *node.arguments]
+
+    for child in children:
+        if child is not None:
+            yield child
+
+def walk(node: ASTNode) -> Iterator[ASTNode]:
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(iter_children(node))))
@@ -2,9 +2,9 @@ from typing import cast
 from lpp.object import (
     Builtin,
     Error,
-    Integer,
     Object,
     String,
+    new_integer,
 )
 
 _WRONG_NUMBER_OF_ARGS = 'número incorrecto de argumentos para longitud, se recibieron {}, se requieren {}'
@@ -16,7 +16,7 @@ def longitud(*args: Object) -> Object:
 
     if type(args[0]) == String:
         argument = cast(String, args[0])
-        return Integer(len(argument.value))
+        return new_integer(len(argument.value))
     
     return Error(_UNSUPPORTED_ARGUMENT_TYPE.format(args[0].type().name))
 
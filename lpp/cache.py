@@ -0,0 +1,103 @@
+from hashlib import sha256
+from os import fdopen, makedirs, remove, replace
+from os.path import basename, dirname, join
+from struct import Struct
+from tempfile import mkstemp
+from typing import (
+    NamedTuple,
+    Optional,
+)
+
+from lpp.flat_ast import FlatProgram
+from lpp.lexer import CHUNK_SIZE, StreamLexer
+from lpp.parser import Parser
+
+CACHE_DIRECTORY = '__lppcache__'
+CACHE_SUFFIX = '.lppc'
+
+# Must change whenever the lexer, the parser or the flat AST format change
+# in a way that makes previously cached programs different.
+CACHE_VERSION = 1
+
+# magic number, cache version and sha256 of the source
+_HEADER = Struct('<4sH32s')
+_MAGIC = b'LPPC'
+
+class ParsedFile(NamedTuple):
+    program: FlatProgram
+    errors: list[str]
+    error_offsets: list[int]
+
+def parse_file(path: str, use_cache: bool = True) -> ParsedFile:
+    if not use_cache:
+        return _parse(path)
+
+    digest = _source_digest(path)
+    cache_path = cache_path_for(path)
+
+    program = _load(cache_path, digest)
+    if program is not None:
+        return ParsedFile(program, [], [])
+
+    parsed = _parse(path)
+    if len(parsed.errors) == 0:
+        _store(cache_path, digest, parsed.program)
+
+    return parsed
+
+def cache_path_for(path: str) -> str:
+    return join(dirname(path), CACHE_DIRECTORY, basename(path) + CACHE_SUFFIX)
+
+def _parse(path: str) -> ParsedFile:
+    with open(path, 'r') as f:
+        parser = Parser(StreamLexer(f), retain_tokens=False)
+        program = parser.parse_program(flat=True)
+
+    return ParsedFile(program, parser.errors, parser.error_offsets)
+
+def _source_digest(path: str) -> bytes:
+    digest = sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.digest()
+
+def _load(cache_path: str, digest: bytes) -> Optional[FlatProgram]:
+    try:
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, source_digest = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != CACHE_VERSION or source_digest != digest:
+        return None
+
+    try:
+        return FlatProgram.from_bytes(data[_HEADER.size:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+# Every writer uses a temporary file of its own, so concurrent runs of the
+# same script never replace the cache with a file another one is writing.
+def _store(cache_path: str, digest: bytes, program: FlatProgram) -> None:
+    data = _HEADER.pack(_MAGIC, CACHE_VERSION, digest) + program.to_bytes()
+
+    try:
+        makedirs(dirname(cache_path), exist_ok=True)
+        descriptor, temporary_path = mkstemp(dir=dirname(cache_path))
+    except OSError:
+        return
+
+    try:
+        with fdopen(descriptor, 'wb') as f:
+            f.write(data)
+        replace(temporary_path, cache_path)
+    except OSError:
+        try:
+            remove(temporary_path)
+        except OSError:
+            pass
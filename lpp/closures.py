@@ -0,0 +1,387 @@
+from operator import (
+    add,
+    eq,
+    floordiv,
+    gt,
+    lt,
+    mul,
+    ne,
+    sub,
+)
+from typing import (
+    Callable,
+    Iterable,
+    Optional,
+    Union,
+    cast,
+)
+
+import lpp.ast as ast
+from lpp.builtins import BUILTINS
+from lpp.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    _UNKNOW_IDENTIFIER,
+    _apply_function,
+    _evaluate_infix_expression,
+    _evaluate_prefix_expression,
+    _locate,
+    _new_error,
+    _parse_error,
+)
+from lpp.flat_ast import FlatProgram
+from lpp.object import (
+    Builtin,
+    Enviroment,
+    Error,
+    Function,
+    Integer,
+    Object,
+    Return,
+    SMALL_INTEGERS,
+    String,
+    new_integer,
+)
+
+# Every node is compiled once into a closure that evaluates it in an
+# enviroment. The closures call the same helpers as lpp.evaluator, so the
+# results (and error messages and offsets) are the same as evaluate().
+Code = Callable[[Enviroment], Optional[Object]]
+
+_INTEGER_OPERATIONS: dict[str, Callable[[int, int], int]] = {
+    '+': add,
+    '-': sub,
+    '*': mul,
+    '/': floordiv,
+}
+
+_INTEGER_COMPARISONS: dict[str, Callable[[int, int], bool]] = {
+    '<': lt,
+    '>': gt,
+    '==': eq,
+    '!=': ne,
+}
+
+# The body of a function literal is compiled the first time the function is
+# called, so lazily parsed bodies are not parsed before they are needed.
+class FunctionCode:
+    __slots__ = ('_body', '_code')
+
+    def __init__(self, body: ast.Block) -> None:
+        self._body = body
+        self._code: Optional[Code] = None
+
+    def __call__(self, env: Enviroment) -> Optional[Object]:
+        if self._code is None:
+            self._code = compile_node(self._body)
+        return self._code(env)
+
+class CompiledFunction(Function):
+    def __init__(
+        self,
+        parameters: list[ast.Identifier],
+        body: ast.Block,
+        env: Enviroment,
+        code: FunctionCode
+    ):
+        super().__init__(parameters, body, env)
+        self.code = code
+
+def execute(
+    program: Union[ast.Program, FlatProgram],
+    env: Enviroment
+) -> Optional[Object]:
+    return compile_node(program)(env)
+
+def compile_node(node: ast.ASTNode) -> Code:
+    node_type = type(node)
+
+    if node_type == ast.Program:
+        node = cast(ast.Program, node)
+        return _compile_program(node.statements)
+
+    if node_type == FlatProgram:
+        node = cast(FlatProgram, node)
+        return _compile_program(node.iter_statements())
+
+    if node_type == ast.ExpressionStatement:
+        node = cast(ast.ExpressionStatement, node)
+        assert node.expression is not None
+        return compile_node(node.expression)
+
+    if node_type == ast.Integer:
+        node = cast(ast.Integer, node)
+        assert node.value is not None
+        return _compile_constant(new_integer(node.value))
+
+    if node_type == ast.Boolean:
+        node = cast(ast.Boolean, node)
+        assert node.value is not None
+        return _compile_constant(TRUE if node.value else FALSE)
+
+    if node_type == ast.StringLiteral:
+        node = cast(ast.StringLiteral, node)
+        return _compile_constant(String(node.value))
+
+    if node_type == ast.Prefix:
+        node = cast(ast.Prefix, node)
+        return _compile_prefix(node)
+
+    if node_type == ast.Infix:
+        node = cast(ast.Infix, node)
+        return _compile_infix(node)
+
+    if node_type == ast.Block:
+        node = cast(ast.Block, node)
+        return _compile_block(node)
+
+    if node_type == ast.If:
+        node = cast(ast.If, node)
+        return _compile_if(node)
+
+    if node_type == ast.ReturnStatement:
+        node = cast(ast.ReturnStatement, node)
+        return _compile_return(node)
+
+    if node_type == ast.LetStatement:
+        node = cast(ast.LetStatement, node)
+        return _compile_let(node)
+
+    if node_type == ast.Identifier:
+        node = cast(ast.Identifier, node)
+        return _compile_identifier(node)
+
+    if node_type == ast.Function:
+        node = cast(ast.Function, node)
+        return _compile_function(node)
+
+    if node_type == ast.Call:
+        node = cast(ast.Call, node)
+        return _compile_call(node)
+
+    return _compile_constant(None)
+
+def _compile_program(statements: Iterable[ast.Statement]) -> Code:
+    codes = [compile_node(statement) for statement in statements]
+
+    def program(env: Enviroment) -> Optional[Object]:
+        result: Optional[Object] = None
+        for code in codes:
+            result = code(env)
+            if type(result) == Return:
+                return cast(Return, result).value
+            elif type(result) == Error:
+                return result
+
+        return result
+
+    return program
+
+def _compile_block(block: ast.Block) -> Code:
+    statements = block.statements
+    if block.parse_error is not None:
+        def parse_error(env: Enviroment) -> Optional[Object]:
+            return _parse_error(block)
+
+        return parse_error
+
+    codes = [compile_node(statement) for statement in statements]
+
+    if len(codes) == 1:
+        return codes[0]
+
+    def block_statement(env: Enviroment) -> Optional[Object]:
+        result: Optional[Object] = None
+        for code in codes:
+            result = code(env)
+            if type(result) == Return or type(result) == Error:
+                return result
+
+        return result
+
+    return block_statement
+
+def _compile_constant(value: Optional[Object]) -> Code:
+    def constant(env: Enviroment) -> Optional[Object]:
+        return value
+
+    return constant
+
+def _compile_prefix(node: ast.Prefix) -> Code:
+    assert node.right is not None
+    right_code = compile_node(node.right)
+    operator = node.operator
+
+    if operator == '-':
+        def minus(env: Enviroment) -> Optional[Object]:
+            right = right_code(env)
+            if type(right) == Integer:
+                number = -cast(Integer, right).value
+                return SMALL_INTEGERS.get(number) or Integer(number)
+
+            assert right is not None
+            return _locate(_evaluate_prefix_expression(operator, right), node)
+
+        return minus
+
+    def prefix(env: Enviroment) -> Optional[Object]:
+        right = right_code(env)
+        assert right is not None
+        return _locate(_evaluate_prefix_expression(operator, right), node)
+
+    return prefix
+
+def _compile_infix(node: ast.Infix) -> Code:
+    assert node.left is not None
+    assert node.right is not None
+    left_code = compile_node(node.left)
+    right_code = compile_node(node.right)
+    operator = node.operator
+
+    def generic(left: Optional[Object], right: Optional[Object]) -> Object:
+        assert left is not None
+        assert right is not None
+        return _locate(_evaluate_infix_expression(operator, left, right), node)
+
+    if operator in _INTEGER_OPERATIONS:
+        operation = _INTEGER_OPERATIONS[operator]
+
+        def integer_operation(env: Enviroment) -> Optional[Object]:
+            left = left_code(env)
+            right = right_code(env)
+            if type(left) == Integer and type(right) == Integer:
+                number = operation(
+                    cast(Integer, left).value,
+                    cast(Integer, right).value,
+                )
+                return SMALL_INTEGERS.get(number) or Integer(number)
+            return generic(left, right)
+
+        return integer_operation
+
+    if operator in _INTEGER_COMPARISONS:
+        comparison = _INTEGER_COMPARISONS[operator]
+
+        def integer_comparison(env: Enviroment) -> Optional[Object]:
+            left = left_code(env)
+            right = right_code(env)
+            if type(left) == Integer and type(right) == Integer:
+                if comparison(
+                    cast(Integer, left).value,
+                    cast(Integer, right).value,
+                ):
+                    return TRUE
+                return FALSE
+            return generic(left, right)
+
+        return integer_comparison
+
+    def infix(env: Enviroment) -> Optional[Object]:
+        return generic(left_code(env), right_code(env))
+
+    return infix
+
+def _compile_if(node: ast.If) -> Code:
+    assert node.condition is not None
+    assert node.consequence is not None
+    condition_code = compile_node(node.condition)
+    consequence_code = compile_node(node.consequence)
+    alternative_code = _compile_constant(NULL)
+    if node.alternative is not None:
+        alternative_code = compile_node(node.alternative)
+
+    def if_expression(env: Enviroment) -> Optional[Object]:
+        condition = condition_code(env)
+        assert condition is not None
+        if condition is not NULL and condition is not FALSE:
+            return consequence_code(env)
+        return alternative_code(env)
+
+    return if_expression
+
+def _compile_return(node: ast.ReturnStatement) -> Code:
+    assert node.return_value is not None
+    value_code = compile_node(node.return_value)
+
+    def return_statement(env: Enviroment) -> Optional[Object]:
+        value = value_code(env)
+        assert value is not None
+        return Return(value)
+
+    return return_statement
+
+def _compile_let(node: ast.LetStatement) -> Code:
+    assert node.value is not None
+    value_code = compile_node(node.value)
+    name = node.name.value
+
+    def let_statement(env: Enviroment) -> Optional[Object]:
+        env[name] = value_code(env)
+        return None
+
+    return let_statement
+
+def _compile_identifier(node: ast.Identifier) -> Code:
+    name = node.value
+
+    def identifier(env: Enviroment) -> Optional[Object]:
+        try:
+            value = env[name]
+        except KeyError:
+            value = BUILTINS.get(name)
+            if value is None:
+                value = _new_error(_UNKNOW_IDENTIFIER, [name])
+
+        if type(value) == Error:
+            return _locate(value, node)
+        return value
+
+    return identifier
+
+def _compile_function(node: ast.Function) -> Code:
+    assert node.body is not None
+    parameters = node.parameters
+    body = node.body
+    code = FunctionCode(body)
+
+    def function(env: Enviroment) -> Optional[Object]:
+        return CompiledFunction(parameters, body, env, code)
+
+    return function
+
+def _compile_call(node: ast.Call) -> Code:
+    function_code = compile_node(node.function)
+    argument_codes = [compile_node(argument) for argument in node.arguments]
+
+    def call(env: Enviroment) -> Optional[Object]:
+        function = function_code(env)
+        assert function is not None
+        args = [code(env) for code in argument_codes]
+        assert None not in args
+        result = _apply(function, cast(list[Object], args))
+        if type(result) == Error:
+            return _locate(result, node)
+        return result
+
+    return call
+
+def _apply(fn: Object, args: list[Object]) -> Object:
+    if type(fn) == CompiledFunction:
+        fn = cast(CompiledFunction, fn)
+        env = Enviroment(outer=fn.env)
+        for arg, param in zip(args, fn.parameters):
+            env[param.value] = arg
+
+        evaluated = fn.code(env)
+        assert evaluated is not None
+        if type(evaluated) == Return:
+            return cast(Return, evaluated).value
+        return evaluated
+
+    if type(fn) == Builtin:
+        return cast(Builtin, fn).fn(*args)
+
+    # functions created by the tree walker and anything that is not a
+    # function are handled by the evaluator
+    return _apply_function(fn, args)
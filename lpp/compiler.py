@@ -0,0 +1,472 @@
+from array import array
+from enum import (
+    IntEnum,
+    unique,
+)
+from typing import (
+    Optional,
+    Sequence,
+    Union,
+    cast,
+)
+
+import lpp.ast as ast
+from lpp.flat_ast import (
+    NO_INDEX,
+    FlatProgram,
+    NodeKind,
+)
+from lpp.object import (
+    Error,
+    String,
+)
+from lpp.resolver import (
+    Layout,
+    Name,
+    find,
+)
+
+@unique
+class Opcode(IntEnum):
+    LOAD_CONST = 1 # constant index
+    LOAD_NONE = 2 # value of let statements and empty blocks
+    LOAD_LOCAL = 3 # name index, first candidate is a local slot
+    LOAD_NAME = 4 # name index, candidates in enclosing functions
+    LOAD_GLOBAL = 5 # name index
+    STORE_LOCAL = 6 # slot
+    STORE_GLOBAL = 7 # name index
+    ADD = 8
+    SUB = 9
+    MUL = 10
+    DIV = 11
+    LT = 12
+    GT = 13
+    EQ = 14
+    NE = 15
+    INFIX = 16 # constant index of the operator
+    MINUS = 17
+    NOT = 18
+    PREFIX = 19 # constant index of the operator
+    JUMP = 20 # target
+    JUMP_IF_FALSY = 21 # target, pops the condition
+    JUMP_IF_ABRUPT = 22 # target, keeps a Return or an Error, pops anything else
+    MAKE_RETURN = 23
+    MAKE_FUNCTION = 24 # constant index of the CodeObject
+    CALL = 25 # number of arguments
+    RETURN = 26
+
+_INFIX_OPCODES: dict[str, Opcode] = {
+    '+': Opcode.ADD,
+    '-': Opcode.SUB,
+    '*': Opcode.MUL,
+    '/': Opcode.DIV,
+    '<': Opcode.LT,
+    '>': Opcode.GT,
+    '==': Opcode.EQ,
+    '!=': Opcode.NE,
+}
+
+_PREFIX_OPCODES: dict[str, Opcode] = {
+    '-': Opcode.MINUS,
+    '!': Opcode.NOT,
+}
+
+# Every instruction is an opcode followed by one argument in `instructions`;
+# `offsets` has the source offset of each instruction, used to locate the
+# errors it produces. Function bodies are compiled on their first call.
+# Integer, boolean and null constants are unboxed values, see lpp.vm.
+#
+# The functions of a flat program are compiled from its arrays: `flat` and
+# `flat_index` locate the function node, and `function` is built from them
+# only when it is asked for.
+class CodeObject:
+    def __init__(
+        self,
+        function: Optional[ast.Function] = None,
+        enclosing: list[Layout] = [],
+        flat: Optional[FlatProgram] = None,
+        flat_index: int = NO_INDEX
+    ) -> None:
+        self._function = function
+        self.flat = flat
+        self.flat_index = flat_index
+        self.enclosing = enclosing # layouts of the enclosing functions
+        self.instructions = array('i')
+        self.offsets = array('i')
+        self.constants: list[object] = []
+        self.names: list[Name] = []
+        self.parameter_slots: list[int] = []
+        self.local_count = 0
+        self.unset_locals: tuple[object, ...] = ()
+        # frames of calls that create no closures are reused, see lpp.vm
+        self.creates_closures = True
+        self.free_frames: list[object] = []
+        self.compiled = function is None and flat is None
+
+    @property
+    def function(self) -> Optional[ast.Function]:
+        if self._function is None and self.flat is not None:
+            self._function = cast(ast.Function, self.flat.node(self.flat_index))
+        return self._function
+
+    def ensure_compiled(self) -> None:
+        if self.compiled:
+            return
+
+        if self.flat is not None:
+            FlatCompiler(self, self.flat).compile_flat_function(self.flat_index)
+        else:
+            assert self.function is not None
+            assert self.function.body is not None
+            Compiler(self).compile_function(self.function)
+        self.compiled = True
+
+    def disassemble(self) -> list[str]:
+        lines: list[str] = []
+        for index in range(0, len(self.instructions), 2):
+            opcode = Opcode(self.instructions[index])
+            lines.append(f'{index:4} {opcode.name} {self.instructions[index + 1]}')
+
+        return lines
+
+def compile_program(program: Union[ast.Program, FlatProgram]) -> CodeObject:
+    code = CodeObject()
+    if type(program) == FlatProgram:
+        flat = cast(FlatProgram, program)
+        flat_compiler = FlatCompiler(code, flat)
+        flat_compiler.compile_flat_block(flat.statements, offset=0)
+        flat_compiler.emit(Opcode.RETURN, 0, 0)
+    else:
+        compiler = Compiler(code)
+        compiler.compile_block(cast(ast.Program, program).statements, offset=0)
+        compiler.emit(Opcode.RETURN, 0, 0)
+
+    return code
+
+class Compiler:
+    def __init__(self, code: CodeObject) -> None:
+        self._code = code
+        self._layouts: list[Layout] = [] # innermost first, empty at the top level
+        self._constant_index: dict[tuple[type, object], int] = {}
+        self._name_index: dict[Name, int] = {}
+
+    def compile_function(self, function: ast.Function) -> None:
+        assert function.body is not None
+        self.enter(Layout.of_function(function))
+
+        body = function.body
+        statements = body.statements
+        if body.parse_error is not None:
+            # a lazily parsed body with a syntax error returns the error
+            message, offset = body.parse_error
+            self.emit(Opcode.LOAD_CONST, self._constant(Error(message, offset)), offset)
+        else:
+            self.compile_block(statements, body.offset)
+        self.emit(Opcode.RETURN, 0, body.offset)
+
+    def enter(self, layout: Layout) -> None:
+        self._layouts = [layout, *self._code.enclosing]
+        self._code.parameter_slots = layout.parameter_slots
+        self._code.local_count = layout.size
+        self._code.unset_locals = layout.unset_locals
+        self._code.creates_closures = layout.creates_closures
+
+    def emit(self, opcode: Opcode, argument: int, offset: int) -> int:
+        self._code.instructions.append(opcode)
+        self._code.instructions.append(argument)
+        self._code.offsets.append(offset)
+
+        return len(self._code.instructions) - 2
+
+    def patch(self, position: int) -> None:
+        self._code.instructions[position + 1] = len(self._code.instructions)
+
+    # The value of a block is the value of its last statement, unless a
+    # statement evaluates to a Return or an Error: that value is left on the
+    # stack and the rest of the block is skipped.
+    def compile_block(self, statements: list[ast.Statement], offset: int) -> None:
+        if len(statements) == 0:
+            self.emit(Opcode.LOAD_NONE, 0, offset)
+            return
+
+        exits: list[int] = []
+        for index, statement in enumerate(statements):
+            last = index == len(statements) - 1
+
+            if type(statement) == ast.LetStatement:
+                self._compile_let(cast(ast.LetStatement, statement))
+                if last:
+                    self.emit(Opcode.LOAD_NONE, 0, statement.offset)
+                continue
+
+            self._compile_statement(statement)
+            if not last:
+                exits.append(self.emit(Opcode.JUMP_IF_ABRUPT, 0, statement.offset))
+
+        for position in exits:
+            self.patch(position)
+
+    def _compile_statement(self, statement: ast.Statement) -> None:
+        statement_type = type(statement)
+
+        if statement_type == ast.ExpressionStatement:
+            expression = cast(ast.ExpressionStatement, statement).expression
+            assert expression is not None
+            self._compile_expression(expression)
+        elif statement_type == ast.ReturnStatement:
+            return_value = cast(ast.ReturnStatement, statement).return_value
+            assert return_value is not None
+            self._compile_expression(return_value)
+            self.emit(Opcode.MAKE_RETURN, 0, statement.offset)
+        elif statement_type == ast.Block:
+            block = cast(ast.Block, statement)
+            self.compile_block(block.statements, block.offset)
+        else:
+            self.emit(Opcode.LOAD_NONE, 0, statement.offset)
+
+    def _compile_let(self, statement: ast.LetStatement) -> None:
+        assert statement.value is not None
+        self._compile_expression(statement.value)
+        self._compile_store(statement.name.value, statement.offset)
+
+    def _compile_store(self, name: str, offset: int) -> None:
+        if len(self._layouts) == 0:
+            self.emit(Opcode.STORE_GLOBAL, self._name(name), offset)
+        else:
+            slot = self._layouts[0].names[name]
+            self.emit(Opcode.STORE_LOCAL, slot, offset)
+
+    def _compile_expression(self, node: ast.Expression) -> None:
+        node_type = type(node)
+
+        if node_type == ast.Integer:
+            value = cast(ast.Integer, node).value
+            assert value is not None
+            self.emit(Opcode.LOAD_CONST, self._constant(value), node.offset)
+
+        elif node_type == ast.Boolean:
+            boolean = cast(ast.Boolean, node).value
+            assert boolean is not None
+            self.emit(Opcode.LOAD_CONST, self._constant(boolean), node.offset)
+
+        elif node_type == ast.StringLiteral:
+            string = String(cast(ast.StringLiteral, node).value)
+            self.emit(Opcode.LOAD_CONST, self._constant(string), node.offset)
+
+        elif node_type == ast.Identifier:
+            identifier = cast(ast.Identifier, node)
+            self._compile_load(identifier.value, identifier.offset)
+
+        elif node_type == ast.Prefix:
+            prefix = cast(ast.Prefix, node)
+            assert prefix.right is not None
+            self._compile_expression(prefix.right)
+            self._compile_prefix(prefix.operator, node.offset)
+
+        elif node_type == ast.Infix:
+            infix = cast(ast.Infix, node)
+            assert infix.left is not None
+            assert infix.right is not None
+            self._compile_expression(infix.left)
+            self._compile_expression(infix.right)
+            self._compile_infix(infix.operator, node.offset)
+
+        elif node_type == ast.If:
+            self._compile_if(cast(ast.If, node))
+
+        elif node_type == ast.Function:
+            function = cast(ast.Function, node)
+            assert function.body is not None
+            code = CodeObject(function, self._layouts)
+            self.emit(Opcode.MAKE_FUNCTION, self._constant(code), node.offset)
+
+        elif node_type == ast.Call:
+            call = cast(ast.Call, node)
+            self._compile_expression(call.function)
+            for argument in call.arguments:
+                self._compile_expression(argument)
+            self.emit(Opcode.CALL, len(call.arguments), node.offset)
+
+        else:
+            self.emit(Opcode.LOAD_NONE, 0, node.offset)
+
+    def _compile_if(self, node: ast.If) -> None:
+        assert node.condition is not None
+        assert node.consequence is not None
+        self._compile_expression(node.condition)
+        alternative = self.emit(Opcode.JUMP_IF_FALSY, 0, node.offset)
+
+        consequence = node.consequence
+        self.compile_block(consequence.statements, consequence.offset)
+        end = self.emit(Opcode.JUMP, 0, node.offset)
+
+        self.patch(alternative)
+        if node.alternative is not None:
+            self.compile_block(node.alternative.statements, node.alternative.offset)
+        else:
+            self.emit(Opcode.LOAD_CONST, self._constant(None), node.offset)
+        self.patch(end)
+
+    def _compile_load(self, name: str, offset: int) -> None:
+        candidates = find(name, self._layouts)
+
+        index = self._name(name, candidates)
+        if len(candidates) == 0:
+            self.emit(Opcode.LOAD_GLOBAL, index, offset)
+        elif candidates[0][0] == 0:
+            self.emit(Opcode.LOAD_LOCAL, index, offset)
+        else:
+            self.emit(Opcode.LOAD_NAME, index, offset)
+
+    def _compile_prefix(self, operator: str, offset: int) -> None:
+        if operator in _PREFIX_OPCODES:
+            self.emit(_PREFIX_OPCODES[operator], 0, offset)
+        else:
+            self.emit(Opcode.PREFIX, self._constant(operator), offset)
+
+    def _compile_infix(self, operator: str, offset: int) -> None:
+        if operator in _INFIX_OPCODES:
+            self.emit(_INFIX_OPCODES[operator], 0, offset)
+        else:
+            self.emit(Opcode.INFIX, self._constant(operator), offset)
+
+    def _constant(self, value: object) -> int:
+        if isinstance(value, CodeObject):
+            key: tuple[type, object] = (type(value), id(value))
+        elif isinstance(value, String):
+            key = (type(value), value.value)
+        else:
+            key = (type(value), value)
+
+        if key not in self._constant_index:
+            self._constant_index[key] = len(self._code.constants)
+            self._code.constants.append(value)
+
+        return self._constant_index[key]
+
+    def _name(
+        self,
+        name: str,
+        candidates: tuple[tuple[int, int], ...] = ()
+    ) -> int:
+        key = Name(name, candidates)
+        if key not in self._name_index:
+            self._name_index[key] = len(self._code.names)
+            self._code.names.append(key)
+
+        return self._name_index[key]
+
+# Compiles the nodes of a flat program from its arrays, without building
+# their ast nodes. Emits the same instructions as Compiler.
+class FlatCompiler(Compiler):
+    def __init__(self, code: CodeObject, program: FlatProgram) -> None:
+        super().__init__(code)
+        self._program = program
+
+    def compile_flat_function(self, index: int) -> None:
+        self.enter(Layout.of_flat_function(self._program, index))
+
+        body = self._program.child_indices(index)[-1]
+        offset = self._program.offsets[body]
+        self.compile_flat_block(self._program.child_indices(body), offset)
+        self.emit(Opcode.RETURN, 0, offset)
+
+    def compile_flat_block(self, statements: Sequence[int], offset: int) -> None:
+        if len(statements) == 0:
+            self.emit(Opcode.LOAD_NONE, 0, offset)
+            return
+
+        program = self._program
+        exits: list[int] = []
+        for index, statement in enumerate(statements):
+            last = index == len(statements) - 1
+            statement_offset = program.offsets[statement]
+
+            if program.kinds[statement] == NodeKind.LET:
+                name, value = program.child_indices(statement)
+                self._compile_flat_node(value)
+                self._compile_store(cast(str, program.literal(name)), statement_offset)
+                if last:
+                    self.emit(Opcode.LOAD_NONE, 0, statement_offset)
+                continue
+
+            self._compile_flat_node(statement)
+            if not last:
+                exits.append(self.emit(Opcode.JUMP_IF_ABRUPT, 0, statement_offset))
+
+        for position in exits:
+            self.patch(position)
+
+    def _compile_flat_node(self, index: int) -> None:
+        program = self._program
+        kind = program.kinds[index]
+        offset = program.offsets[index]
+        children = program.child_indices(index)
+
+        if kind == NodeKind.EXPRESSION:
+            self._compile_flat_node(children[0])
+
+        elif kind == NodeKind.RETURN:
+            self._compile_flat_node(children[0])
+            self.emit(Opcode.MAKE_RETURN, 0, offset)
+
+        elif kind == NodeKind.BLOCK:
+            self.compile_flat_block(children, offset)
+
+        elif kind in [NodeKind.INTEGER, NodeKind.BOOLEAN]:
+            self.emit(Opcode.LOAD_CONST, self._constant(program.literal(index)), offset)
+
+        elif kind == NodeKind.STRING:
+            string = String(cast(str, program.literal(index)))
+            self.emit(Opcode.LOAD_CONST, self._constant(string), offset)
+
+        elif kind == NodeKind.IDENTIFIER:
+            self._compile_load(cast(str, program.literal(index)), offset)
+
+        elif kind == NodeKind.PREFIX:
+            self._compile_flat_node(children[0])
+            self._compile_prefix(cast(str, program.literal(index)), offset)
+
+        elif kind == NodeKind.INFIX:
+            self._compile_flat_node(children[0])
+            self._compile_flat_node(children[1])
+            self._compile_infix(cast(str, program.literal(index)), offset)
+
+        elif kind == NodeKind.IF:
+            self._compile_flat_if(index)
+
+        elif kind == NodeKind.FUNCTION:
+            code = CodeObject(None, self._layouts, program, index)
+            self.emit(Opcode.MAKE_FUNCTION, self._constant(code), offset)
+
+        elif kind == NodeKind.CALL:
+            for child in children:
+                self._compile_flat_node(child)
+            self.emit(Opcode.CALL, len(children) - 1, offset)
+
+        else:
+            self.emit(Opcode.LOAD_NONE, 0, offset)
+
+    def _compile_flat_if(self, index: int) -> None:
+        program = self._program
+        offset = program.offsets[index]
+        condition, consequence, alternative = program.child_indices(index)
+
+        self._compile_flat_node(condition)
+        jump_to_alternative = self.emit(Opcode.JUMP_IF_FALSY, 0, offset)
+
+        self.compile_flat_block(
+            program.child_indices(consequence),
+            program.offsets[consequence]
+        )
+        end = self.emit(Opcode.JUMP, 0, offset)
+
+        self.patch(jump_to_alternative)
+        if alternative != NO_INDEX:
+            self.compile_flat_block(
+                program.child_indices(alternative),
+                program.offsets[alternative]
+            )
+        else:
+            self.emit(Opcode.LOAD_CONST, self._constant(None), offset)
+        self.patch(end)
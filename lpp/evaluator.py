@@ -1,23 +1,47 @@
+from operator import (
+    add,
+    eq,
+    floordiv,
+    gt,
+    lt,
+    mul,
+    ne,
+    sub,
+)
 from typing import (
     Optional,
     Any,
+    Callable,
+    Iterable,
     cast,
 )
 import lpp.ast as ast
+from lpp.flat_ast import FlatProgram
 from lpp.object import (
     Object,
+    Bindings,
     Enviroment,
+    Frame,
+    UNSET,
     Integer,
     Boolean,
     String,
     Null,
     Return,
+    TailCall,
     ObjectType,
     Error,
     Function,
     Builtin,
+    SMALL_INTEGERS,
+    new_integer,
 )
 from lpp.builtins import BUILTINS
+from lpp.resolver import (
+    BY_NAME,
+    DYNAMIC,
+    resolve,
+)
 
 TRUE = Boolean(True)
 FALSE = Boolean(False)
@@ -30,12 +54,16 @@ _UNKNOW_INFIX_OPERATOR = 'Operador desconocido: {} {} {}'
 _UNKNOW_IDENTIFIER = 'Identificador no encontrado: {}'
 _NOT_A_FUNCTION = 'No es una funcion: {}'
 
-def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
+def evaluate(node: ast.ASTNode, env: Bindings) -> Optional[Object]:
     node_type = type(node)
 
     if node_type == ast.Program:
         node = cast(ast.Program, node)
-        return _evaluate_program(node, env)
+        return _evaluate_program(node.statements, env)
+
+    if node_type == FlatProgram:
+        node = cast(FlatProgram, node)
+        return _evaluate_program(node.iter_statements(), env)
 
     if node_type == ast.ExpressionStatement:
         node = cast(ast.ExpressionStatement, node)
@@ -43,9 +71,7 @@ def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
         return evaluate(node.expression, env)
 
     if node_type == ast.Integer:
-        node = cast(ast.Integer, node)
-        assert node.value is not None
-        return Integer(node.value)
+        return _integer_literal(cast(ast.Integer, node))
 
     if node_type == ast.Boolean:
         node = cast(ast.Boolean, node)
@@ -54,8 +80,7 @@ def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
         return _to_boolean_object(node.value)
 
     if node_type == ast.StringLiteral:
-        node = cast(ast.StringLiteral, node)
-        return String(node.value)
+        return _string_literal(cast(ast.StringLiteral, node))
 
     if node_type == ast.Prefix:
         node = cast(ast.Prefix, node)
@@ -64,7 +89,7 @@ def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
         right = evaluate(node.right, env)
 
         assert right is not None
-        return _evaluate_prefix_expression(node.operator, right)
+        return _evaluate_prefix(node, right)
 
     if node_type == ast.Infix:
         node = cast(ast.Infix, node)
@@ -74,7 +99,7 @@ def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
         right = evaluate(node.right, env)
         assert left is not None
         assert right is not None
-        return _evaluate_infix_expression(node.operator, left, right)
+        return _evaluate_infix(node, left, right)
 
     if node_type == ast.Block:
         node = cast(ast.Block, node)
@@ -87,6 +112,12 @@ def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
     if node_type == ast.ReturnStatement:
         node = cast(ast.ReturnStatement, node)
         assert node.return_value is not None
+        if node.tail:
+            call = cast(ast.Call, node.return_value)
+            function = evaluate(call.function, env)
+            assert function is not None
+            return TailCall(function, _evaluate_expression(call.arguments, env), call)
+
         value = evaluate(node.return_value, env)
         assert value is not None
         return Return(value)
@@ -96,11 +127,14 @@ def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
         assert node.value is not None
         value = evaluate(node.value, env)
 
-        env[node.name.value] = value
+        if node.slot is not None and node.slot != BY_NAME and type(env) == Frame:
+            cast(Frame, env).locals[node.slot] = value
+        else:
+            env[node.name.value] = value
 
     if node_type == ast.Identifier:
         node = cast(ast.Identifier, node)
-        return _evaluate_identifier(node, env)
+        return _locate(_evaluate_identifier(node, env), node)
 
     if node_type == ast.Function:
         node = cast(ast.Function, node)
@@ -110,6 +144,7 @@ def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
             parameters=node.parameters,
             body=node.body,
             env=env,
+            scope=node.scope,
         )
 
     if node_type == ast.Call:
@@ -117,13 +152,17 @@ def evaluate(node: ast.ASTNode, env: Enviroment) -> Optional[Object]:
         function = evaluate(node.function, env)
         assert function is not None
         args = _evaluate_expression(node.arguments, env)
-        return _apply_function(function, args)
+        return _locate(_apply_function(function, args), node)
 
     return None
 
-def _evaluate_program(program: ast.Program, env: Enviroment) -> Optional[Object]:
+def _evaluate_program(
+    statements: Iterable[ast.Statement],
+    env: Bindings
+) -> Optional[Object]:
     result: Optional[Object] = None
-    for statement in program.statements:
+    for statement in statements:
+        resolve(statement)
         result = evaluate(statement, env)
         if result is not None and type(result) == Return:
             result = cast(Return, result)
@@ -133,9 +172,13 @@ def _evaluate_program(program: ast.Program, env: Enviroment) -> Optional[Object]
 
     return result
 
-def _evaluate_block_statement(block: ast.Block, env: Enviroment) -> Optional[Object]:
+def _evaluate_block_statement(block: ast.Block, env: Bindings) -> Optional[Object]:
+    statements = block.statements
+    if block.parse_error is not None:
+        return _parse_error(block)
+
     result: Optional[Object] = None
-    for statement in block.statements:
+    for statement in statements:
         result = evaluate(statement, env)
         if (
             result is not None and \
@@ -146,9 +189,29 @@ def _evaluate_block_statement(block: ast.Block, env: Enviroment) -> Optional[Obj
 
     return result
 
+def _integer_literal(node: ast.Integer) -> Object:
+    if node.constant is None:
+        assert node.value is not None
+        node.constant = new_integer(node.value)
+    return node.constant
+
+def _string_literal(node: ast.StringLiteral) -> Object:
+    if node.constant is None:
+        node.constant = String(node.value)
+    return node.constant
+
 def _to_boolean_object(value: bool) -> Boolean:
     return TRUE if value else FALSE
 
+# An integer proven by lpp.inference is negated without checking its type.
+def _evaluate_prefix(node: ast.Prefix, right: Object) -> Object:
+    if node.operator == '-' and node.proven_types == _INTEGER_OPERAND:
+        return new_integer(-cast(Integer, right).value)
+
+    return _locate(_evaluate_prefix_expression(node.operator, right), node)
+
+_INTEGER_OPERAND = (ObjectType.INTEGER,)
+
 def _evaluate_prefix_expression(operator: str, right: Object) -> Object:
     if operator == '!':
         return _evaluate_bang_operator_expression(right)
@@ -173,7 +236,152 @@ def _evaluate_minus_operator_expression(right: Object) -> Object:
             ['-', right.type().name]
         )
     right = cast(Integer, right)
-    return Integer(-right.value)
+    return new_integer(-right.value)
+
+# Infix nodes specialize on their first evaluation: the operation for the
+# operator and the operand types seen is kept in the node, and later
+# evaluations call it directly. A specialized operation returns None when
+# its operands are of other types, the node then goes back to the generic
+# path for good. Nodes whose operand types were proven by lpp.inference
+# get an operation that does not check them, for as long as the proof
+# holds: a later inference can only weaken it to ().
+def _evaluate_infix(node: ast.Infix, left: Object, right: Object) -> Object:
+    specialized = node.specialized
+    if specialized is None:
+        unchecked = _UNCHECKED_OPERATIONS.get((node.proven_types, node.operator))
+        if unchecked is not None:
+            node.specialized = unchecked
+            return cast(Object, unchecked(left, right))
+
+        node.specialized = _SPECIALIZED_OPERATIONS.get(
+            (type(left), node.operator, type(right)),
+            _generic_operation,
+        )
+    elif specialized is not _generic_operation:
+        if node.proven_types == () and specialized in _UNCHECKED_OPERATION_SET:
+            node.specialized = None
+            return _evaluate_infix(node, left, right)
+
+        result = specialized(left, right)
+        if result is not None:
+            return result
+        node.specialized = _generic_operation
+
+    return _locate(_evaluate_infix_expression(node.operator, left, right), node)
+
+def _generic_operation(left: Object, right: Object) -> Optional[Object]:
+    return None
+
+def _integer_operation(
+    operation: Callable[[int, int], int]
+) -> Callable[[Object, Object], Optional[Object]]:
+    def specialized(left: Object, right: Object) -> Optional[Object]:
+        if type(left) is not Integer or type(right) is not Integer:
+            return None
+        value = operation(cast(Integer, left).value, cast(Integer, right).value)
+        return SMALL_INTEGERS.get(value) or Integer(value)
+
+    return specialized
+
+def _integer_comparison(
+    comparison: Callable[[int, int], bool]
+) -> Callable[[Object, Object], Optional[Object]]:
+    def specialized(left: Object, right: Object) -> Optional[Object]:
+        if type(left) is not Integer or type(right) is not Integer:
+            return None
+        if comparison(cast(Integer, left).value, cast(Integer, right).value):
+            return TRUE
+        return FALSE
+
+    return specialized
+
+def _string_concatenation(left: Object, right: Object) -> Optional[Object]:
+    if type(left) is not String or type(right) is not String:
+        return None
+    return String(cast(String, left).value + cast(String, right).value)
+
+def _string_comparison(
+    comparison: Callable[[str, str], bool]
+) -> Callable[[Object, Object], Optional[Object]]:
+    def specialized(left: Object, right: Object) -> Optional[Object]:
+        if type(left) is not String or type(right) is not String:
+            return None
+        if comparison(cast(String, left).value, cast(String, right).value):
+            return TRUE
+        return FALSE
+
+    return specialized
+
+# booleans are singletons, they are equal when they are the same object
+def _boolean_comparison(equal: bool) -> Callable[[Object, Object], Optional[Object]]:
+    def specialized(left: Object, right: Object) -> Optional[Object]:
+        if type(left) is not Boolean or type(right) is not Boolean:
+            return None
+        if (left is right) == equal:
+            return TRUE
+        return FALSE
+
+    return specialized
+
+_SPECIALIZED_OPERATIONS: dict[
+    tuple[type, str, type],
+    Callable[[Object, Object], Optional[Object]]
+] = {
+    (Integer, '+', Integer): _integer_operation(add),
+    (Integer, '-', Integer): _integer_operation(sub),
+    (Integer, '*', Integer): _integer_operation(mul),
+    (Integer, '/', Integer): _integer_operation(floordiv),
+    (Integer, '<', Integer): _integer_comparison(lt),
+    (Integer, '>', Integer): _integer_comparison(gt),
+    (Integer, '==', Integer): _integer_comparison(eq),
+    (Integer, '!=', Integer): _integer_comparison(ne),
+    (String, '+', String): _string_concatenation,
+    (String, '==', String): _string_comparison(eq),
+    (String, '!=', String): _string_comparison(ne),
+    (Boolean, '==', Boolean): _boolean_comparison(True),
+    (Boolean, '!=', Boolean): _boolean_comparison(False),
+}
+
+def _unchecked_integer_operation(
+    operation: Callable[[int, int], int]
+) -> Callable[[Object, Object], Optional[Object]]:
+    def unchecked(left: Object, right: Object) -> Optional[Object]:
+        value = operation(cast(Integer, left).value, cast(Integer, right).value)
+        return SMALL_INTEGERS.get(value) or Integer(value)
+
+    return unchecked
+
+def _unchecked_integer_comparison(
+    comparison: Callable[[int, int], bool]
+) -> Callable[[Object, Object], Optional[Object]]:
+    def unchecked(left: Object, right: Object) -> Optional[Object]:
+        if comparison(cast(Integer, left).value, cast(Integer, right).value):
+            return TRUE
+        return FALSE
+
+    return unchecked
+
+def _unchecked_string_concatenation(left: Object, right: Object) -> Optional[Object]:
+    return String(cast(String, left).value + cast(String, right).value)
+
+_INTEGER_OPERANDS = (ObjectType.INTEGER, ObjectType.INTEGER)
+
+_UNCHECKED_OPERATIONS: dict[
+    tuple[Optional[tuple[ObjectType, ...]], str],
+    Callable[[Object, Object], Optional[Object]]
+] = {
+    (_INTEGER_OPERANDS, '+'): _unchecked_integer_operation(add),
+    (_INTEGER_OPERANDS, '-'): _unchecked_integer_operation(sub),
+    (_INTEGER_OPERANDS, '*'): _unchecked_integer_operation(mul),
+    (_INTEGER_OPERANDS, '/'): _unchecked_integer_operation(floordiv),
+    (_INTEGER_OPERANDS, '<'): _unchecked_integer_comparison(lt),
+    (_INTEGER_OPERANDS, '>'): _unchecked_integer_comparison(gt),
+    (_INTEGER_OPERANDS, '=='): _unchecked_integer_comparison(eq),
+    (_INTEGER_OPERANDS, '!='): _unchecked_integer_comparison(ne),
+    ((ObjectType.STRING, ObjectType.STRING), '+'): _unchecked_string_concatenation,
+}
+
+_UNCHECKED_OPERATION_SET = set(_UNCHECKED_OPERATIONS.values())
 
 def _evaluate_infix_expression(operator: str, left: Object, right: Object) -> Object:
     left_type = left.type()
@@ -201,13 +409,13 @@ def _evaluate_integer_infix_expression(operator: str, left: Object, right: Objec
     right_value = cast(Integer, right).value
 
     if operator == '+':
-        return Integer(left_value + right_value)
+        return new_integer(left_value + right_value)
     if operator == '-':
-        return Integer(left_value - right_value)
+        return new_integer(left_value - right_value)
     if operator == '*':
-        return Integer(left_value * right_value)
+        return new_integer(left_value * right_value)
     if operator == '/':
-        return Integer(left_value // right_value)
+        return new_integer(left_value // right_value)
 
     if operator == '<':
         return _to_boolean_object(left_value < right_value)
@@ -237,7 +445,7 @@ def _evaluate_string_infix_expression(operator: str, left: Object, right: Object
         [left.type().name, operator, right.type().name]
     )
 
-def _evaluate_if_expression(if_node: ast.If, env: Enviroment) -> Optional[Object]:
+def _evaluate_if_expression(if_node: ast.If, env: Bindings) -> Optional[Object]:
     assert if_node.condition is not None
     condition = evaluate(if_node.condition, env)
     assert condition is not None
@@ -258,19 +466,41 @@ def _is_truthy(obj: Object) -> bool:
         return False
     return True
 
+# A lazily parsed function body with a syntax error evaluates to the error.
+def _parse_error(block: ast.Block) -> Error:
+    assert block.parse_error is not None
+    message, offset = block.parse_error
+    return Error(message, offset)
+
 def _new_error(message: str, args: list[Any]) -> Error:
     return Error(message.format(*args))
 
-def _evaluate_identifier(node: ast.Identifier, env: Enviroment) -> Object:
+def _locate(obj: Object, node: ast.Expression) -> Object:
+    if type(obj) == Error:
+        obj = cast(Error, obj)
+        if obj.offset is None:
+            obj.offset = node.offset
+
+    return obj
+
+def _evaluate_identifier(node: ast.Identifier, env: Bindings) -> Object:
+    resolved = node.resolved
+    if type(env) == Frame and resolved is not None and resolved is not DYNAMIC:
+        frame = cast(Frame, env)
+        value = frame.lookup(resolved)
+        if value is not UNSET:
+            return cast(Object, value)
+        env = frame.globals
+
     try:
-        return env[node.value]
+        return cast(Object, env[node.value])
     except KeyError:
         return BUILTINS.get(
             node.value,
             _new_error(_UNKNOW_IDENTIFIER, [node.value])
         )
 
-def _evaluate_expression(expressions: list[ast.Expression], env: Enviroment) -> list[Object]:
+def _evaluate_expression(expressions: list[ast.Expression], env: Bindings) -> list[Object]:
     result: list[Object] = []
     for expression in expressions:
         evaluated = evaluate(expression, env)
@@ -279,13 +509,34 @@ def _evaluate_expression(expressions: list[ast.Expression], env: Enviroment) ->
         
     return result
 
+# Calls in tail position come back as a TailCall and are made here, in a
+# loop, so tail recursion does not grow the Python stack. Errors are
+# located at the last call made, as if the calls were nested.
 def _apply_function(fn: Object, args: list[Object]) -> Object:
     if type(fn) == Function:
-        fn = cast(Function, fn)
-        extended_environment = _extended_function_enviroment(fn, args)
-        evaluated = evaluate(fn.body, extended_environment)
-        assert evaluated is not None
-        return _unwrap_return_value(evaluated)
+        tail_call: Optional[ast.Call] = None
+        while True:
+            function = cast(Function, fn)
+            extended_environment = _extended_function_enviroment(function, args)
+            evaluated = evaluate(function.body, extended_environment)
+            if type(extended_environment) == Frame:
+                cast(Frame, extended_environment).release()
+
+            assert evaluated is not None
+            if type(evaluated) != TailCall:
+                break
+
+            next_call = cast(TailCall, evaluated)
+            fn = next_call.function
+            args = next_call.arguments
+            tail_call = next_call.call
+            if type(fn) != Function:
+                return _locate(_apply_function(fn, args), tail_call)
+
+        result = _unwrap_return_value(evaluated)
+        if tail_call is not None:
+            return _locate(result, tail_call)
+        return result
 
     if type(fn) == Builtin:
         fn = cast(Builtin, fn)
@@ -293,13 +544,31 @@ def _apply_function(fn: Object, args: list[Object]) -> Object:
 
     return _new_error(_NOT_A_FUNCTION, [fn.type().name])
 
-def _extended_function_enviroment(fn: Function, args: list[Object]) -> Enviroment:
+def _extended_function_enviroment(fn: Function, args: list[Object]) -> Bindings:
+    if fn.scope is not None:
+        return _function_frame(fn, args)
+
     env = Enviroment(outer=fn.env)
     for arg, param in zip(args, fn.parameters):
         env[param.value] = arg
     
     return env
 
+def _function_frame(fn: Function, args: list[Object]) -> Frame:
+    assert fn.scope is not None
+    fn.scope.ensure_resolved()
+
+    if type(fn.env) == Frame:
+        parent = cast(Frame, fn.env)
+        frame = Frame.acquire(fn.scope, parent, parent.globals)
+    else:
+        frame = Frame.acquire(fn.scope, None, cast(Enviroment, fn.env))
+
+    for arg, slot in zip(args, fn.scope.layout.parameter_slots):
+        frame.locals[slot] = arg
+
+    return frame
+
 def _unwrap_return_value(obj: Object) -> Object:
     if type(obj) == Return:
         obj = cast(Return, obj)
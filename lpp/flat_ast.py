@@ -0,0 +1,338 @@
+from array import array
+from enum import (
+    IntEnum,
+    unique,
+)
+from marshal import dumps, loads
+from typing import (
+    Iterator,
+    Optional,
+    Union,
+    cast,
+)
+
+import lpp.ast as ast
+
+# Index used in the arrays when a child or a literal is missing.
+NO_INDEX = 0xFFFFFFFF
+
+Literal = Union[str, int, bool]
+
+@unique
+class NodeKind(IntEnum):
+    LET = 1
+    RETURN = 2
+    EXPRESSION = 3
+    BLOCK = 4
+    IDENTIFIER = 5
+    INTEGER = 6
+    STRING = 7
+    BOOLEAN = 8
+    PREFIX = 9
+    INFIX = 10
+    IF = 11
+    FUNCTION = 12
+    CALL = 13
+
+# A program stored as parallel arrays, one entry per node. The children of a
+# node are a contiguous run of node indices in `children`, and its literal
+# (identifier name, value or operator) is an index in the literal pool.
+# Children are always stored before their parents.
+#
+# The bytecode compiler (see lpp.compiler) reads the arrays directly, and
+# builds the ast node of a function only if the function is inspected. The
+# other engines read it through iter_statements and node(), which build the
+# ast nodes of a statement again every time it is walked.
+class FlatProgram(ast.ASTNode):
+    __slots__ = (
+        'kinds',
+        'offsets',
+        'literals',
+        'first_child',
+        'child_count',
+        'children',
+        'statements',
+        'pool',
+        '_pool_index',
+    )
+
+    def __init__(self) -> None:
+        self.kinds = array('B')
+        self.offsets = array('i')
+        self.literals = array('I')
+        self.first_child = array('I')
+        self.child_count = array('I')
+        self.children = array('I')
+        self.statements = array('I') # nodes of the top level statements
+        self.pool: list[Literal] = []
+        self._pool_index: dict[tuple[type, Literal], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __str__(self) -> str:
+        return ''.join([str(s) for s in self.iter_statements()])
+
+    def token_literal(self) -> str:
+        for statement in self.iter_statements():
+            return statement.token_literal()
+        return ''
+
+    @property
+    def offset(self) -> int:
+        return 0
+
+    def add_statement(self, statement: ast.Statement) -> None:
+        self.statements.append(self._add(statement))
+
+    def iter_statements(self) -> Iterator[ast.Statement]:
+        for index in self.statements:
+            yield cast(ast.Statement, self.node(index))
+
+    def program(self) -> ast.Program:
+        return ast.Program(statements=list(self.iter_statements()))
+
+    def node(self, index: int) -> ast.ASTNode:
+        kind = self.kinds[index]
+        offset = self.offsets[index]
+        children = self.child_indices(index)
+
+        if kind == NodeKind.IDENTIFIER:
+            return self._identifier(index)
+        if kind == NodeKind.INTEGER:
+            return ast.Integer(
+                token=None,
+                value=cast(int, self.literal(index)),
+                offset=offset,
+            )
+        if kind == NodeKind.STRING:
+            return ast.StringLiteral(
+                token=None,
+                value=cast(str, self.literal(index)),
+                offset=offset,
+            )
+        if kind == NodeKind.BOOLEAN:
+            return ast.Boolean(
+                token=None,
+                value=cast(bool, self.literal(index)),
+                offset=offset,
+            )
+        if kind == NodeKind.PREFIX:
+            return ast.Prefix(
+                token=None,
+                operator=cast(str, self.literal(index)),
+                right=self._expression(children[0]),
+                offset=offset,
+            )
+        if kind == NodeKind.INFIX:
+            left = self._expression(children[0])
+            assert left is not None
+            return ast.Infix(
+                token=None,
+                left=left,
+                operator=cast(str, self.literal(index)),
+                right=self._expression(children[1]),
+                offset=offset,
+            )
+        if kind == NodeKind.IF:
+            return ast.If(
+                token=None,
+                condition=self._expression(children[0]),
+                consequence=self._block(children[1]),
+                alternative=self._block(children[2]),
+                offset=offset,
+            )
+        if kind == NodeKind.FUNCTION:
+            return ast.Function(
+                token=None,
+                parameters=[self._identifier(c) for c in children[:-1]],
+                body=self._block(children[-1]),
+                offset=offset,
+            )
+        if kind == NodeKind.CALL:
+            function = self._expression(children[0])
+            assert function is not None
+            return ast.Call(
+                token=None,
+                function=function,
+                arguments=[
+                    cast(ast.Expression, self.node(c)) for c in children[1:]
+                ],
+                offset=offset,
+            )
+        if kind == NodeKind.LET:
+            return ast.LetStatement(
+                token=None,
+                name=self._identifier(children[0]),
+                value=self._expression(children[1]),
+                offset=offset,
+            )
+        if kind == NodeKind.RETURN:
+            return ast.ReturnStatement(
+                token=None,
+                return_value=self._expression(children[0]),
+                offset=offset,
+            )
+        if kind == NodeKind.EXPRESSION:
+            return ast.ExpressionStatement(
+                token=None,
+                expression=self._expression(children[0]),
+                offset=offset,
+            )
+        if kind == NodeKind.BLOCK:
+            return ast.Block(
+                token=None,
+                statements=[cast(ast.Statement, self.node(c)) for c in children],
+                offset=offset,
+            )
+
+        raise ValueError(f'Tipo de nodo desconocido: {kind}')
+
+    def child_indices(self, index: int) -> 'array[int]':
+        first = self.first_child[index]
+        return self.children[first:first + self.child_count[index]]
+
+    def literal(self, index: int) -> Literal:
+        return self.pool[self.literals[index]]
+
+    def to_bytes(self) -> bytes:
+        return dumps((
+            self.kinds.tobytes(),
+            self.offsets.tobytes(),
+            self.literals.tobytes(),
+            self.first_child.tobytes(),
+            self.child_count.tobytes(),
+            self.children.tobytes(),
+            self.statements.tobytes(),
+            self.pool,
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'FlatProgram':
+        (
+            kinds,
+            offsets,
+            literals,
+            first_child,
+            child_count,
+            children,
+            statements,
+            pool,
+        ) = loads(data)
+
+        program = cls()
+        program.kinds.frombytes(kinds)
+        program.offsets.frombytes(offsets)
+        program.literals.frombytes(literals)
+        program.first_child.frombytes(first_child)
+        program.child_count.frombytes(child_count)
+        program.children.frombytes(children)
+        program.statements.frombytes(statements)
+        program.pool = pool
+        program._pool_index = {
+            (type(value), value): index for index, value in enumerate(pool)
+        }
+
+        return program
+
+    def _add(self, node: Optional[ast.ASTNode]) -> int:
+        if node is None:
+            return NO_INDEX
+
+        node_type = type(node)
+        literal: Optional[Literal] = None
+        children: list[Optional[ast.ASTNode]] = []
+
+        if node_type == ast.Identifier:
+            kind = NodeKind.IDENTIFIER
+            literal = cast(ast.Identifier, node).value
+        elif node_type == ast.Integer:
+            kind = NodeKind.INTEGER
+            literal = cast(ast.Integer, node).value
+        elif node_type == ast.StringLiteral:
+            kind = NodeKind.STRING
+            literal = cast(ast.StringLiteral, node).value
+        elif node_type == ast.Boolean:
+            kind = NodeKind.BOOLEAN
+            literal = cast(ast.Boolean, node).value
+        elif node_type == ast.Prefix:
+            prefix = cast(ast.Prefix, node)
+            kind = NodeKind.PREFIX
+            literal = prefix.operator
+            children = [prefix.right]
+        elif node_type == ast.Infix:
+            infix = cast(ast.Infix, node)
+            kind = NodeKind.INFIX
+            literal = infix.operator
+            children = [infix.left, infix.right]
+        elif node_type == ast.If:
+            if_node = cast(ast.If, node)
+            kind = NodeKind.IF
+            children = [
+                if_node.condition,
+                if_node.consequence,
+                if_node.alternative,
+            ]
+        elif node_type == ast.Function:
+            function = cast(ast.Function, node)
+            kind = NodeKind.FUNCTION
+            children = [*function.parameters, function.body]
+        elif node_type == ast.Call:
+            call = cast(ast.Call, node)
+            kind = NodeKind.CALL
+            children = [call.function, *call.arguments]
+        elif node_type == ast.LetStatement:
+            let_statement = cast(ast.LetStatement, node)
+            kind = NodeKind.LET
+            children = [let_statement.name, let_statement.value]
+        elif node_type == ast.ReturnStatement:
+            kind = NodeKind.RETURN
+            children = [cast(ast.ReturnStatement, node).return_value]
+        elif node_type == ast.ExpressionStatement:
+            kind = NodeKind.EXPRESSION
+            children = [cast(ast.ExpressionStatement, node).expression]
+        elif node_type == ast.Block:
+            kind = NodeKind.BLOCK
+            children = list(cast(ast.Block, node).statements)
+        else:
+            raise ValueError(f'Tipo de nodo desconocido: {node_type.__name__}')
+
+        child_indices = [self._add(child) for child in children]
+
+        self.kinds.append(kind)
+        self.offsets.append(cast(ast.Expression, node).offset)
+        self.literals.append(self._intern(literal))
+        self.first_child.append(len(self.children))
+        self.child_count.append(len(child_indices))
+        self.children.extend(child_indices)
+
+        return len(self.kinds) - 1
+
+    def _intern(self, literal: Optional[Literal]) -> int:
+        if literal is None:
+            return NO_INDEX
+
+        key = (type(literal), literal)
+        try:
+            return self._pool_index[key]
+        except KeyError:
+            self._pool_index[key] = len(self.pool)
+            self.pool.append(literal)
+            return len(self.pool) - 1
+
+    def _identifier(self, index: int) -> ast.Identifier:
+        return ast.Identifier(
+            token=None,
+            value=cast(str, self.literal(index)),
+            offset=self.offsets[index],
+        )
+
+    def _expression(self, index: int) -> Optional[ast.Expression]:
+        if index == NO_INDEX:
+            return None
+        return cast(ast.Expression, self.node(index))
+
+    def _block(self, index: int) -> Optional[ast.Block]:
+        if index == NO_INDEX:
+            return None
+        return cast(ast.Block, self.node(index))
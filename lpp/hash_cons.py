@@ -0,0 +1,184 @@
+from typing import (
+    Hashable,
+    Optional,
+    Union,
+    cast,
+)
+
+import lpp.ast as ast
+
+Node = Union[ast.Statement, ast.Expression]
+
+# Interns AST nodes so that structurally equal subtrees are the same object.
+# Two nodes are equal when they have the same type, the same literal (value
+# or operator) and the same interned children, so the table key only needs
+# the ids of the children. The nodes whose evaluation can give an error
+# (identifiers, calls, prefix and infix expressions) are also equal only at
+# the same offset, so errors point to their own occurrence; the other nodes
+# keep the offset (and token) of the first occurrence seen. Interned nodes
+# must be treated as immutable.
+#
+# The structural hash of every interned node is kept in the conser, by node
+# id, instead of in the nodes: the table keeps the nodes alive, so their ids
+# are not reused while the conser is.
+class HashConser:
+
+    def __init__(self) -> None:
+        self._table: dict[tuple[Hashable, ...], Node] = {}
+        self._hashes: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def structural_hash(self, node: Node) -> Optional[int]:
+        return self._hashes.get(id(node))
+
+    def intern(self, node: Node) -> Node:
+        # post order without recursion, deeply nested programs are valid
+        stack: list[tuple[Optional[Node], bool]] = [(node, False)]
+        results: list[Optional[Node]] = []
+
+        while stack:
+            current, children_done = stack.pop()
+
+            if current is None or id(current) in self._hashes:
+                # missing child, or already interned (possibly while
+                # interning a previous tree)
+                results.append(current)
+                continue
+
+            children = _children(current)
+            if not children_done:
+                stack.append((current, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+
+            first = len(results) - len(children)
+            interned = results[first:]
+            del results[first:]
+            results.append(self._intern(current, interned))
+
+        return cast(Node, results.pop())
+
+    def _intern(self, node: Node, children: list[Optional[Node]]) -> Node:
+        _set_children(node, children)
+
+        key = (
+            type(node),
+            _literal(node),
+            node.offset if type(node) in _LOCATED else None,
+            *[id(child) if child is not None else None for child in children],
+        )
+        try:
+            return self._table[key]
+        except KeyError:
+            pass
+
+        self._hashes[id(node)] = hash((
+            type(node).__name__,
+            _literal(node),
+            *[self._hashes[id(child)] if child is not None else None for child in children],
+        ))
+        self._table[key] = node
+
+        return node
+
+def hash_cons(
+    program: ast.Program,
+    conser: Optional[HashConser] = None
+) -> ast.Program:
+    if conser is None:
+        conser = HashConser()
+
+    program.statements = [
+        cast(ast.Statement, conser.intern(statement))
+        for statement in program.statements
+    ]
+
+    return program
+
+_LOCATED = (ast.Identifier, ast.Call, ast.Infix, ast.Prefix)
+
+def _literal(node: Node) -> Hashable:
+    node_type = type(node)
+
+    if node_type in (ast.Identifier, ast.Integer, ast.StringLiteral, ast.Boolean):
+        return cast(ast.Identifier, node).value
+    if node_type == ast.Prefix or node_type == ast.Infix:
+        return cast(ast.Infix, node).operator
+    if node_type == ast.Function:
+        return len(cast(ast.Function, node).parameters)
+    if node_type == ast.Block and not cast(ast.Block, node).parsed:
+        # the body is only known once parsed, do not force it
+        return id(node)
+
+    return None
+
+def _children(node: Node) -> list[Optional[Node]]:
+    node_type = type(node)
+
+    if node_type == ast.LetStatement:
+        let_statement = cast(ast.LetStatement, node)
+        return [let_statement.name, let_statement.value]
+    if node_type == ast.ReturnStatement:
+        return [cast(ast.ReturnStatement, node).return_value]
+    if node_type == ast.ExpressionStatement:
+        return [cast(ast.ExpressionStatement, node).expression]
+    if node_type == ast.Block:
+        block = cast(ast.Block, node)
+        if not block.parsed:
+            return []
+        return list(block.statements)
+    if node_type == ast.Prefix:
+        return [cast(ast.Prefix, node).right]
+    if node_type == ast.Infix:
+        infix = cast(ast.Infix, node)
+        return [infix.left, infix.right]
+    if node_type == ast.If:
+        if_node = cast(ast.If, node)
+        return [if_node.condition, if_node.consequence, if_node.alternative]
+    if node_type == ast.Function:
+        function = cast(ast.Function, node)
+        return [*function.parameters, function.body]
+    if node_type == ast.Call:
+        call = cast(ast.Call, node)
+        return [call.function, *call.arguments]
+
+    return []
+
+def _set_children(node: Node, children: list[Optional[Node]]) -> None:
+    node_type = type(node)
+
+    if node_type == ast.LetStatement:
+        let_statement = cast(ast.LetStatement, node)
+        let_statement.name = cast(ast.Identifier, children[0])
+        let_statement.value = cast(Optional[ast.Expression], children[1])
+    elif node_type == ast.ReturnStatement:
+        return_statement = cast(ast.ReturnStatement, node)
+        return_statement.return_value = cast(Optional[ast.Expression], children[0])
+    elif node_type == ast.ExpressionStatement:
+        expression_statement = cast(ast.ExpressionStatement, node)
+        expression_statement.expression = cast(Optional[ast.Expression], children[0])
+    elif node_type == ast.Block:
+        block = cast(ast.Block, node)
+        if block.parsed:
+            block.statements = cast(list[ast.Statement], children)
+    elif node_type == ast.Prefix:
+        cast(ast.Prefix, node).right = cast(Optional[ast.Expression], children[0])
+    elif node_type == ast.Infix:
+        infix = cast(ast.Infix, node)
+        infix.left = cast(ast.Expression, children[0])
+        infix.right = cast(Optional[ast.Expression], children[1])
+    elif node_type == ast.If:
+        if_node = cast(ast.If, node)
+        if_node.condition = cast(Optional[ast.Expression], children[0])
+        if_node.consequence = cast(Optional[ast.Block], children[1])
+        if_node.alternative = cast(Optional[ast.Block], children[2])
+    elif node_type == ast.Function:
+        function = cast(ast.Function, node)
+        function.parameters = cast(list[ast.Identifier], children[:-1])
+        function.body = cast(Optional[ast.Block], children[-1])
+    elif node_type == ast.Call:
+        call = cast(ast.Call, node)
+        call.function = cast(ast.Expression, children[0])
+        call.arguments = cast(list[ast.Expression], children[1:])
@@ -0,0 +1,109 @@
+from bisect import bisect_left
+from typing import (
+    NamedTuple,
+    Optional,
+)
+
+from lpp.ast import (
+    Expression,
+    Program,
+    Statement,
+    walk,
+)
+from lpp.lexer import Lexer
+from lpp.parser import Parser
+from lpp.token import SymbolTable
+
+class TextEdit(NamedTuple):
+    start: int # offset in the old source where the replaced text starts
+    end: int # offset in the old source where the replaced text ends
+    text: str # text that replaces it
+
+class Reparse(NamedTuple):
+    program: Program
+    source: str
+    errors: list[str] # errors of the statements that were parsed again
+    error_offsets: list[int]
+    parsed: int # number of statements parsed again
+    reused: int # number of statements kept from the old program
+
+def apply_edit(source: str, edit: TextEdit) -> str:
+    return source[:edit.start] + edit.text + source[edit.end:]
+
+# What a top level statement parses to only depends on the tokens from its
+# start, but where a statement without a final ';' ends depends on the
+# tokens after it. Parsing starts again at the last statement before the
+# one with the edit that ends in an explicit ';', and stops as soon as a
+# statement starts where an old statement after the edit starts (shifted by
+# the edit), from there on the old statements are reused. The old program must not be used
+# afterwards, the offsets of its reused nodes are shifted in place.
+def reparse(
+    program: Program,
+    source: str,
+    edit: TextEdit,
+    symbols: Optional[SymbolTable] = None,
+    retain_tokens: bool = True,
+) -> Reparse:
+    new_source = apply_edit(source, edit)
+    delta = len(edit.text) - (edit.end - edit.start)
+
+    old_statements = program.statements
+    starts = [statement.offset for statement in old_statements]
+
+    first = bisect_left(starts, edit.start) - 2
+    while first > 0 and not _ends_with_semicolon(source, starts[first + 1]):
+        first -= 1
+    if first > 0:
+        start = starts[first]
+    else:
+        first = 0
+        start = 0
+    reusable = {
+        offset + delta: index
+        for index, offset in enumerate(starts)
+        if offset >= edit.end
+    }
+
+    lexer = Lexer(new_source, symbols, start)
+    parser = Parser(lexer, retain_tokens=retain_tokens)
+    statements = old_statements[:first]
+    resync = parser.parse_statements_until(
+        statements,
+        lambda offset: offset in reusable,
+    )
+
+    parsed = len(statements) - first
+    reused = 0
+    if resync is not None:
+        kept = old_statements[reusable[resync]:]
+        for statement in kept:
+            _shift(statement, delta)
+        statements.extend(kept)
+        reused = len(kept)
+
+    return Reparse(
+        program=Program(statements=statements),
+        source=new_source,
+        errors=parser.errors,
+        error_offsets=parser.error_offsets,
+        parsed=parsed,
+        reused=first + reused,
+    )
+
+# Whether the statement that ends where the next one starts ends in ';'.
+def _ends_with_semicolon(source: str, next_start: int) -> bool:
+    index = next_start - 1
+    while index >= 0 and source[index].isspace():
+        index -= 1
+
+    return index >= 0 and source[index] == ';'
+
+def _shift(statement: Statement, delta: int) -> None:
+    if delta == 0:
+        return
+
+    for node in walk(statement):
+        if isinstance(node, (Statement, Expression)):
+            node.offset += delta
+            if node.token is not None:
+                node.token = node.token._replace(offset=node.offset)
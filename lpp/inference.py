@@ -0,0 +1,195 @@
+from typing import (
+    Optional,
+    Union,
+    cast,
+)
+
+import lpp.ast as ast
+from lpp.evaluator import (
+    TRUE,
+    _evaluate_infix_expression,
+    _evaluate_prefix_expression,
+)
+from lpp.flat_ast import FlatProgram
+from lpp.object import (
+    Enviroment,
+    Error,
+    Function,
+    Integer,
+    Object,
+    ObjectType,
+    String,
+)
+from lpp.resolver import declared_names
+
+# Types of the variables of a function (or of the program) whose value is
+# known at some point of its body.
+TypeEnviroment = dict[str, ObjectType]
+
+# Proves the types of the operands of prefix and infix expressions, and
+# keeps them in the nodes (proven_types) so the evaluator can skip checking
+# them. Returns the errors the program is sure to give if those expressions
+# are evaluated, like 'Discrepancia de tipos: INTEGER + STRING'.
+#
+# The types come from literals, from the operations over them, and from the
+# variables bound to those in the same function, in the statements that
+# follow the let statement. Everything else (parameters, calls, variables
+# of enclosing functions, variables that an if may bind) is unknown.
+#
+# Nodes shared between contexts (see lpp.hash_cons) keep a proof only when
+# it holds in all of them. Function bodies that were not parsed yet are
+# not analyzed, their nodes are evaluated as usual.
+def infer(program: Union[ast.Program, FlatProgram]) -> list[Error]:
+    if type(program) == FlatProgram:
+        statements = list(cast(FlatProgram, program).iter_statements())
+    else:
+        statements = cast(ast.Program, program).statements
+
+    inference = TypeInference()
+    inference.infer_statements(statements, {})
+    return inference.errors
+
+class TypeInference:
+    def __init__(self) -> None:
+        self.errors: list[Error] = []
+
+    def infer_statements(self, statements: list[ast.Statement], env: TypeEnviroment) -> None:
+        for statement in statements:
+            self._infer_statement(statement, env)
+
+    def _infer_statement(self, statement: ast.Statement, env: TypeEnviroment) -> None:
+        statement_type = type(statement)
+
+        if statement_type == ast.ExpressionStatement:
+            self._infer_optional(cast(ast.ExpressionStatement, statement).expression, env)
+
+        elif statement_type == ast.LetStatement:
+            let_statement = cast(ast.LetStatement, statement)
+            value_type = self._infer_optional(let_statement.value, env)
+            if value_type is None:
+                env.pop(let_statement.name.value, None)
+            else:
+                env[let_statement.name.value] = value_type
+
+        elif statement_type == ast.ReturnStatement:
+            self._infer_optional(cast(ast.ReturnStatement, statement).return_value, env)
+
+        elif statement_type == ast.Block:
+            self.infer_statements(cast(ast.Block, statement).statements, env)
+
+    def _infer_optional(
+        self,
+        node: Optional[ast.Expression],
+        env: TypeEnviroment
+    ) -> Optional[ObjectType]:
+        if node is None:
+            return None
+        return self._infer_expression(node, env)
+
+    def _infer_expression(self, node: ast.Expression, env: TypeEnviroment) -> Optional[ObjectType]:
+        node_type = type(node)
+
+        if node_type == ast.Integer:
+            return ObjectType.INTEGER
+
+        if node_type == ast.StringLiteral:
+            return ObjectType.STRING
+
+        if node_type == ast.Boolean:
+            return ObjectType.BOOLEAN
+
+        if node_type == ast.Identifier:
+            return env.get(cast(ast.Identifier, node).value)
+
+        if node_type == ast.Prefix:
+            return self._infer_prefix(cast(ast.Prefix, node), env)
+
+        if node_type == ast.Infix:
+            return self._infer_infix(cast(ast.Infix, node), env)
+
+        if node_type == ast.If:
+            self._infer_if(cast(ast.If, node), env)
+            return None
+
+        if node_type == ast.Function:
+            body = cast(ast.Function, node).body
+            if body is not None and body.parsed:
+                self.infer_statements(body.statements, {})
+            return ObjectType.FUNCTION
+
+        if node_type == ast.Call:
+            call = cast(ast.Call, node)
+            self._infer_expression(call.function, env)
+            for argument in call.arguments:
+                self._infer_expression(argument, env)
+
+        return None
+
+    def _infer_prefix(self, node: ast.Prefix, env: TypeEnviroment) -> Optional[ObjectType]:
+        right = self._infer_optional(node.right, env)
+        if right is None:
+            _prove(node, ())
+            return ObjectType.BOOLEAN if node.operator == '!' else None
+
+        _prove(node, (right,))
+        result = _evaluate_prefix_expression(node.operator, _SAMPLES[right])
+        return self._result_type(result, node)
+
+    def _infer_infix(self, node: ast.Infix, env: TypeEnviroment) -> Optional[ObjectType]:
+        left = self._infer_optional(node.left, env)
+        right = self._infer_optional(node.right, env)
+        if left is None or right is None:
+            _prove(node, ())
+            # values of different types are compared by identity
+            return ObjectType.BOOLEAN if node.operator in ['==', '!='] else None
+
+        _prove(node, (left, right))
+        result = _evaluate_infix_expression(node.operator, _SAMPLES[left], _SAMPLES[right])
+        return self._result_type(result, node)
+
+    # The branches are analyzed with the types known before the if, and the
+    # variables they bind are unknown after it: the branch that runs may not
+    # reach its let statements.
+    def _infer_if(self, node: ast.If, env: TypeEnviroment) -> None:
+        self._infer_optional(node.condition, env)
+
+        branches = [node.consequence, node.alternative]
+        for branch in branches:
+            if branch is not None:
+                self.infer_statements(branch.statements, dict(env))
+        for branch in branches:
+            if branch is not None:
+                for name in declared_names(branch):
+                    env.pop(name, None)
+
+    # The result of an operation depends only on the types of its operands,
+    # so an error for the samples is an error for any values. The type of
+    # an error is not used, the expressions over it are not reported again.
+    def _result_type(self, result: Object, node: ast.Expression) -> Optional[ObjectType]:
+        if type(result) == Error:
+            self.errors.append(Error(cast(Error, result).message, node.offset))
+            return None
+        return result.type()
+
+# A weakened proof also drops the operation the evaluator chose for it, it
+# may not check the operand types.
+def _prove(node: Union[ast.Prefix, ast.Infix], types: tuple[ObjectType, ...]) -> None:
+    if node.proven_types is None:
+        node.proven_types = types
+    elif node.proven_types != types:
+        node.proven_types = ()
+        if type(node) == ast.Infix:
+            cast(ast.Infix, node).specialized = None
+
+# A value of each type, to evaluate the operations with. The integer is not
+# zero, so divisions do not raise.
+_SAMPLES: dict[ObjectType, Object] = {
+    ObjectType.INTEGER: Integer(1),
+    ObjectType.STRING: String(''),
+    ObjectType.BOOLEAN: TRUE,
+    ObjectType.FUNCTION: Function(
+        parameters=[],
+        body=ast.Block(None, [], offset=0),
+        env=Enviroment(),
+    ),
+}
@@ -0,0 +1,232 @@
+from typing import (
+    Callable,
+    Generator,
+    Iterable,
+    Optional,
+    Union,
+    cast,
+)
+
+import lpp.ast as ast
+from lpp.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    _apply_function,
+    _evaluate_identifier,
+    _evaluate_infix,
+    _evaluate_prefix,
+    _extended_function_enviroment,
+    _integer_literal,
+    _is_truthy,
+    _locate,
+    _parse_error,
+    _string_literal,
+    _unwrap_return_value,
+)
+from lpp.flat_ast import FlatProgram
+from lpp.object import (
+    Bindings,
+    Enviroment,
+    Error,
+    Frame,
+    Function,
+    Object,
+    ObjectType,
+    Return,
+)
+from lpp.resolver import (
+    BY_NAME,
+    resolve,
+)
+
+# A step evaluates one node: it yields the (node, enviroment) of every child
+# it needs and receives its value back, and returns the value of the node.
+Step = Generator[tuple[ast.ASTNode, Bindings], Optional[Object], Optional[Object]]
+
+def execute(
+    program: Union[ast.Program, FlatProgram],
+    env: Enviroment
+) -> Optional[Object]:
+    return evaluate(program, env)
+
+# Evaluates the same programs as lpp.evaluator.evaluate, but the nodes being
+# evaluated (and the calls being made) are kept in an explicit stack of
+# steps instead of the Python stack, so the recursion depth of lpp programs
+# is only limited by memory. Nodes without children are evaluated in place.
+def evaluate(node: ast.ASTNode, env: Bindings) -> Optional[Object]:
+    stack: list[Step] = []
+    result: Optional[Object] = None
+    request: Optional[tuple[ast.ASTNode, Bindings]] = (node, env)
+
+    while True:
+        if request is not None:
+            node, env = request
+            node_type = type(node)
+            while node_type == ast.ExpressionStatement:
+                expression = cast(ast.ExpressionStatement, node).expression
+                assert expression is not None
+                node = expression
+                node_type = type(node)
+
+            if node_type == ast.Identifier:
+                identifier = cast(ast.Identifier, node)
+                result = _locate(_evaluate_identifier(identifier, env), identifier)
+            elif node_type == ast.Integer:
+                result = _integer_literal(cast(ast.Integer, node))
+            elif node_type == ast.Boolean:
+                result = TRUE if cast(ast.Boolean, node).value else FALSE
+            elif node_type == ast.StringLiteral:
+                result = _string_literal(cast(ast.StringLiteral, node))
+            elif node_type == ast.Function:
+                result = _function(cast(ast.Function, node), env)
+            elif node_type in _STEPS:
+                stack.append(_STEPS[node_type](node, env))
+                result = None
+            else:
+                result = None
+
+        if not stack:
+            return result
+
+        try:
+            request = stack[-1].send(result)
+        except StopIteration as stop:
+            stack.pop()
+            result = stop.value
+            request = None
+
+def _program_step(node: ast.ASTNode, env: Bindings) -> Step:
+    if type(node) == FlatProgram:
+        statements: Iterable[ast.Statement] = cast(FlatProgram, node).iter_statements()
+    else:
+        statements = cast(ast.Program, node).statements
+
+    result: Optional[Object] = None
+    for statement in statements:
+        resolve(statement)
+        result = yield statement, env
+        if type(result) == Return:
+            return cast(Return, result).value
+        elif type(result) == Error:
+            return result
+
+    return result
+
+def _block_step(node: ast.ASTNode, env: Bindings) -> Step:
+    block = cast(ast.Block, node)
+    statements = block.statements
+    if block.parse_error is not None:
+        return _parse_error(block)
+
+    result: Optional[Object] = None
+    for statement in statements:
+        result = yield statement, env
+        if (
+            result is not None and
+            result.type() in [ObjectType.RETURN, ObjectType.ERROR]
+        ):
+            return result
+
+    return result
+
+def _prefix_step(node: ast.ASTNode, env: Bindings) -> Step:
+    prefix = cast(ast.Prefix, node)
+    assert prefix.right is not None
+    right = yield prefix.right, env
+
+    assert right is not None
+    return _evaluate_prefix(prefix, right)
+
+def _infix_step(node: ast.ASTNode, env: Bindings) -> Step:
+    infix = cast(ast.Infix, node)
+    assert infix.left is not None
+    assert infix.right is not None
+    left = yield infix.left, env
+    right = yield infix.right, env
+
+    assert left is not None
+    assert right is not None
+    return _evaluate_infix(infix, left, right)
+
+def _if_step(node: ast.ASTNode, env: Bindings) -> Step:
+    if_node = cast(ast.If, node)
+    assert if_node.condition is not None
+    condition = yield if_node.condition, env
+
+    assert condition is not None
+    if _is_truthy(condition):
+        assert if_node.consequence is not None
+        return (yield if_node.consequence, env)
+    elif if_node.alternative is not None:
+        return (yield if_node.alternative, env)
+
+    return NULL
+
+# The value of a return statement is evaluated here even when the resolver
+# marked it as a tail call: calls do not use the Python stack anyway.
+def _return_step(node: ast.ASTNode, env: Bindings) -> Step:
+    return_statement = cast(ast.ReturnStatement, node)
+    assert return_statement.return_value is not None
+    value = yield return_statement.return_value, env
+
+    assert value is not None
+    return Return(value)
+
+def _let_step(node: ast.ASTNode, env: Bindings) -> Step:
+    let_statement = cast(ast.LetStatement, node)
+    assert let_statement.value is not None
+    value = yield let_statement.value, env
+
+    slot = let_statement.slot
+    if slot is not None and slot != BY_NAME and type(env) == Frame:
+        cast(Frame, env).locals[slot] = value
+    else:
+        env[let_statement.name.value] = value
+
+    return None
+
+def _call_step(node: ast.ASTNode, env: Bindings) -> Step:
+    call = cast(ast.Call, node)
+    function = yield call.function, env
+    assert function is not None
+
+    args: list[Object] = []
+    for argument in call.arguments:
+        evaluated = yield argument, env
+        assert evaluated is not None
+        args.append(evaluated)
+
+    if type(function) != Function:
+        return _locate(_apply_function(function, args), call)
+
+    fn = cast(Function, function)
+    extended_environment = _extended_function_enviroment(fn, args)
+    evaluated = yield fn.body, extended_environment
+    if type(extended_environment) == Frame:
+        cast(Frame, extended_environment).release()
+
+    assert evaluated is not None
+    return _locate(_unwrap_return_value(evaluated), call)
+
+def _function(node: ast.Function, env: Bindings) -> Function:
+    assert node.body is not None
+
+    return Function(
+        parameters=node.parameters,
+        body=node.body,
+        env=env,
+        scope=node.scope,
+    )
+
+_STEPS: dict[type, Callable[[ast.ASTNode, Bindings], Step]] = {
+    ast.Program: _program_step,
+    FlatProgram: _program_step,
+    ast.Block: _block_step,
+    ast.Prefix: _prefix_step,
+    ast.Infix: _infix_step,
+    ast.If: _if_step,
+    ast.ReturnStatement: _return_step,
+    ast.LetStatement: _let_step,
+    ast.Call: _call_step,
+}
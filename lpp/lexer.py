@@ -1,6 +1,23 @@
-from lpp.token import Token, TokenType, lookup_token_type
-from re import compile, Pattern
-from typing import NamedTuple
+from array import array
+from codecs import getincrementaldecoder
+from concurrent.futures import ProcessPoolExecutor
+from lpp.token import (
+    SymbolTable,
+    Token,
+    TokenType,
+    lookup_token_type,
+)
+from mmap import mmap
+from re import compile, Match, Pattern, DOTALL, VERBOSE
+from typing import (
+    BinaryIO,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Protocol,
+    TextIO,
+    Union,
+)
 
 class TokenRegex(NamedTuple):
     n_characters: int
@@ -34,7 +51,327 @@ NUMBER_REGEX = compile(r'^[0-9]$')
 WHITESPACE_REGEX = compile(r'^\s+$')
 QUOTATION_REGEX = compile(r'^"$')
 
+# A single alternation that skips leading whitespace and recognizes the next
+# token. The name of the group that matched tells the token kind.
+SCANNER_REGEX = compile(r'''
+    \s*
+    (?:
+        (?P<IDENT>[a-záéíóúA-ZÁÉÍÓÚñÑ_][a-záéíóúA-ZÁÉÍÓÚñÑ_0-9]*)
+      | (?P<INT>[0-9]+)
+      | "(?P<STRING>[^"]*)"?
+      | (?P<OPERATOR>==|!=|[=+(){},;<>\-/*!])
+      | (?P<EOF>\Z)
+      | (?P<ILLEGAL>.)
+    )
+''', DOTALL | VERBOSE)
+
+BRACE_REGEX = compile(r'"[^"]*"?|[{}]')
+
+OPERATORS: dict[str, TokenType] = {
+    '==': TokenType.EQ,
+    '!=': TokenType.NOT_EQ,
+    '=': TokenType.ASSIGN,
+    '+': TokenType.PLUS,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    '{': TokenType.LBRACE,
+    '}': TokenType.RBRACE,
+    ',': TokenType.COMMA,
+    ';': TokenType.SEMICOLON,
+    '<': TokenType.LT,
+    '>': TokenType.GT,
+    '-': TokenType.MINUS,
+    '/': TokenType.DIVISION,
+    '*': TokenType.MULTIPLICATION,
+    '!': TokenType.NEGATION,
+}
+
+# Token types indexed by their code (the enum value) in a TokenStream.
+TOKEN_TYPES: dict[int, TokenType] = {
+    token_type.value: token_type for token_type in TokenType
+}
+
+# Number of characters (or bytes) pulled from a stream on each read.
+CHUNK_SIZE = 64 * 1024
+
+# Sources are not split in chunks smaller than this for parallel lexing.
+PARALLEL_MIN_CHUNK_SIZE = 1024 * 1024
+
+_IDENT_CODE = TokenType.IDENT.value
+_STRING_CODE = TokenType.STRING.value
+
+class TokenSource(Protocol):
+    def next_token(self) -> Token: ...
+
 class Lexer:
+    def __init__(
+        self,
+        source: str,
+        symbols: Optional[SymbolTable] = None,
+        start: int = 0,
+        end: Optional[int] = None,
+    ) -> None:
+        self._source = source
+        self._position: int = start # _position is the index of the next character to scan
+        self._end: int = end if end is not None else len(source) # _end is where EOF is found
+        self.symbols = symbols if symbols is not None else SymbolTable()
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    def next_token(self) -> Token:
+        match = SCANNER_REGEX.match(self._source, self._position, self._end)
+        assert match is not None
+        self._position = match.end()
+
+        return _token_from_match(match, self.symbols, 0)
+
+    # Returns the offset of the brace that closes `depth` open braces, only
+    # looking at braces and string literals, without producing tokens.
+    def find_closing_brace(self, depth: int) -> Optional[int]:
+        for match in BRACE_REGEX.finditer(self._source, self._position, self._end):
+            brace = match.group()
+            if brace == '{':
+                depth += 1
+            elif brace == '}':
+                depth -= 1
+                if depth == 0:
+                    return match.start()
+
+        return None
+
+    def seek(self, position: int) -> None:
+        self._position = position
+
+class StreamLexer:
+    def __init__(
+        self,
+        stream: Union[TextIO, BinaryIO, mmap],
+        chunk_size: int = CHUNK_SIZE,
+        symbols: Optional[SymbolTable] = None,
+    ) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = getincrementaldecoder('utf-8')()
+        self._buffer: str = '' # _buffer holds the characters read but not yet scanned
+        self._position: int = 0 # _position is the index of the next character to scan in _buffer
+        self._offset: int = 0 # _offset is the offset in the source of the start of _buffer
+        self._eof: bool = False
+        self.symbols = symbols if symbols is not None else SymbolTable()
+
+    def next_token(self) -> Token:
+        while True:
+            match = SCANNER_REGEX.match(self._buffer, self._position)
+            assert match is not None
+            # A match that reaches the end of the buffer may continue in the
+            # next chunk (identifiers, numbers, strings, == and !=).
+            if self._eof or match.end() < len(self._buffer):
+                break
+            self._read_chunk()
+
+        self._position = match.end()
+
+        return _token_from_match(match, self.symbols, self._offset)
+
+    def _read_chunk(self) -> None:
+        data = self._stream.read(self._chunk_size)
+        if isinstance(data, bytes):
+            text = self._decoder.decode(data, final=not data)
+        else:
+            text = data
+
+        if not data:
+            self._eof = True
+
+        self._buffer = self._buffer[self._position:] + text
+        self._offset += self._position
+        self._position = 0
+
+def _token_from_match(match: Match[str], symbols: SymbolTable, base: int) -> Token:
+    kind = match.lastgroup
+    assert kind is not None
+    literal = match.group(kind)
+    offset = base + match.start(kind)
+
+    if kind == 'IDENT':
+        token_type, literal = symbols.lookup(literal)
+        return Token(token_type, literal, offset)
+    if kind == 'OPERATOR':
+        return Token(OPERATORS[literal], literal, offset)
+    if kind == 'INT':
+        return Token(TokenType.INT, literal, offset)
+    if kind == 'STRING':
+        return Token(TokenType.STRING, literal, offset - 1)
+    if kind == 'EOF':
+        return Token(TokenType.EOF, literal, offset)
+
+    return Token(TokenType.ILLEGAL, literal, offset)
+
+class TokenStream:
+    def __init__(
+        self,
+        source: str,
+        types: 'array[int]',
+        starts: 'array[int]',
+        ends: 'array[int]',
+        symbols: SymbolTable,
+    ) -> None:
+        self.source = source
+        self.types = types # token type codes
+        self.starts = starts # offset where each literal starts
+        self.ends = ends # offset where each literal ends
+        self.symbols = symbols
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, index: int) -> Token:
+        return Token(self.token_type(index), self.literal(index), self.offset(index))
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self.types)):
+            yield self[index]
+
+    def token_type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.types[index]]
+
+    def literal(self, index: int) -> str:
+        literal = self.source[self.starts[index]:self.ends[index]]
+        if self.types[index] == _IDENT_CODE:
+            return self.symbols.intern(literal)
+
+        return literal
+
+    def offset(self, index: int) -> int:
+        if self.types[index] == _STRING_CODE:
+            return self.starts[index] - 1 # the opening quotation mark
+
+        return self.starts[index]
+
+    def reader(self) -> 'TokenStreamReader':
+        return TokenStreamReader(self)
+
+class TokenStreamReader:
+    def __init__(self, stream: TokenStream) -> None:
+        self._stream = stream
+        self._index: int = 0
+        self._last: int = len(stream) - 1
+
+    def next_token(self) -> Token:
+        token = self._stream[self._index]
+        if self._index < self._last:
+            self._index += 1
+
+        return token
+
+def tokenize(source: str, symbols: Optional[SymbolTable] = None) -> TokenStream:
+    if symbols is None:
+        symbols = SymbolTable()
+
+    types, starts, ends = _scan(source, symbols, 0)
+
+    return TokenStream(source, types, starts, ends, symbols)
+
+def lex_parallel(
+    source: str,
+    workers: int = 4,
+    symbols: Optional[SymbolTable] = None,
+    min_chunk_size: int = PARALLEL_MIN_CHUNK_SIZE,
+) -> TokenStream:
+    if symbols is None:
+        symbols = SymbolTable()
+
+    n_chunks = min(workers, len(source) // min_chunk_size)
+    points = _split_points(source, n_chunks)
+    if len(points) <= 2:
+        return tokenize(source, symbols)
+
+    chunks = [source[start:end] for start, end in zip(points, points[1:])]
+    types = array('B')
+    starts = array('I')
+    ends = array('I')
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_types, chunk_starts, chunk_ends in executor.map(
+            _scan_chunk,
+            chunks,
+            points,
+        ):
+            types.frombytes(chunk_types)
+            starts.frombytes(chunk_starts)
+            ends.frombytes(chunk_ends)
+
+    types.append(TokenType.EOF.value)
+    starts.append(len(source))
+    ends.append(len(source))
+
+    return TokenStream(source, types, starts, ends, symbols)
+
+def _scan(
+    source: str,
+    symbols: SymbolTable,
+    base: int,
+) -> tuple['array[int]', 'array[int]', 'array[int]']:
+    types = array('B')
+    starts = array('I')
+    ends = array('I')
+
+    for match in SCANNER_REGEX.finditer(source):
+        kind = match.lastgroup
+        assert kind is not None
+
+        if kind == 'IDENT':
+            code = symbols.lookup(match[kind])[0].value
+        elif kind == 'OPERATOR':
+            code = OPERATORS[match[kind]].value
+        else:
+            code = TokenType[kind].value
+
+        types.append(code)
+        starts.append(base + match.start(kind))
+        ends.append(base + match.end(kind))
+
+        if kind == 'EOF':
+            break
+
+    return types, starts, ends
+
+def _scan_chunk(chunk: str, base: int) -> tuple[bytes, bytes, bytes]:
+    types, starts, ends = _scan(chunk, SymbolTable(), base)
+
+    # Every chunk ends with its own EOF token, only the last one is kept.
+    return (
+        types[:-1].tobytes(),
+        starts[:-1].tobytes(),
+        ends[:-1].tobytes(),
+    )
+
+# Chunks are split right after a newline that is not inside a string
+# literal. There are no escape sequences, so a position is outside a string
+# when an even number of quotation marks comes before it.
+def _split_points(source: str, n_chunks: int) -> list[int]:
+    points = [0]
+    quotes = 0 # quotes counts the quotation marks before checked
+    checked = 0
+
+    for chunk in range(1, n_chunks):
+        index = max(len(source) * chunk // n_chunks, points[-1])
+        while True:
+            index = source.find('\n', index)
+            if index == -1:
+                return points + [len(source)]
+
+            quotes += source.count('"', checked, index)
+            checked = index
+            if quotes % 2 == 0:
+                break
+            index += 1
+
+        points.append(index + 1)
+
+    return points + [len(source)]
+
+class LegacyLexer:
     def __init__(self, source: str) -> None:
         self._source = source
         self._character: str = '' # _character is the current character
@@ -45,10 +382,11 @@ class Lexer:
 
     def next_token(self) -> Token:
         self._skip_whitespace()
+        offset = self._position
         for (n_characters, regex, token_type) in TOKEN_REGEX:
             literal = self._character + self._peek_character(n_characters - 1)
             if regex.match(literal):
-                token = Token(token_type, literal)
+                token = Token(token_type, literal, offset)
                 self._read_character(n_characters=n_characters)
                 return token
 
@@ -56,17 +394,17 @@ class Lexer:
             literal = self._read_identifier()
             token_type = lookup_token_type(literal)
 
-            return Token(token_type, literal)
+            return Token(token_type, literal, offset)
 
         if self._is_number(self._character):
             literal = self._read_number()
-            return Token(TokenType.INT, literal)
+            return Token(TokenType.INT, literal, offset)
 
         if QUOTATION_REGEX.match(self._character):
             literal = self._read_string()
-            return Token(TokenType.STRING, literal)
+            return Token(TokenType.STRING, literal, offset)
 
-        token =  Token(TokenType.ILLEGAL, self._character)
+        token =  Token(TokenType.ILLEGAL, self._character, offset)
         self._read_character()
         return token
 
@@ -93,7 +431,7 @@ class Lexer:
 
         if not self._is_letter(self._character):
             return ''
-        
+
         self._read_character()
         while self._is_letter(self._character) or self._is_number(self._character):
             self._read_character()
@@ -113,7 +451,7 @@ class Lexer:
         initial_position = self._position
         while not QUOTATION_REGEX.match(self._character) and self._read_position <= len(self._source):
             self._read_character()
-        
+
         string = self._source[initial_position:self._position]
         self._read_character()
         return string
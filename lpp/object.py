@@ -9,9 +9,20 @@ from enum import (
 )
 from lpp.ast import (
     Block,
+    Call,
     Identifier,
 )
-from typing import Protocol
+from lpp.resolver import (
+    UNSET,
+    FunctionScope,
+    Name,
+)
+from typing import (
+    Optional,
+    Protocol,
+    Union,
+    cast,
+)
 
 @unique
 class ObjectType(Enum):
@@ -33,24 +44,106 @@ class Object(ABC):
     def inspect(self) -> str:
         pass
 
+# The variables are stored in the dict itself, lookups only reach Python
+# code (__missing__) when the name is not in this enviroment.
 class Enviroment(dict):
+    __slots__ = ('_outer',)
+
     def __init__(self, outer=None):
-        self._store = dict()
+        super().__init__()
         self._outer = outer
 
-    def __getitem__(self, key):
-        try:
-            return self._store[key]
-        except KeyError as e:
-            if self._outer is not None:
-                return self._outer[key]
-            raise e
-    
-    def __setitem__(self, key, value):
-        self._store[key] = value
+    def __missing__(self, key):
+        if self._outer is not None:
+            return self._outer[key]
+        raise KeyError(key)
+
+# Frames kept for reuse by each layout, enough for the recursion depth of
+# most programs.
+MAX_FREE_FRAMES = 64
+
+# Variables of a call to a resolved function, one slot per name of its
+# layout. `parent` is the frame where the function was created and
+# `globals` the enviroment of the program. `scopes` has the locals of this
+# frame and of its parents, indexed by the depths of resolved names.
+#
+# Frames of functions that create no closures cannot be referenced once the
+# call returns, they are released to a free-list of their layout and reused
+# by later calls.
+class Frame:
+    __slots__ = ('scope', 'locals', 'parent', 'globals', 'scopes')
+
+    def __init__(
+        self,
+        scope: FunctionScope,
+        parent: Optional['Frame'],
+        globals: Enviroment
+    ) -> None:
+        self.scope = scope
+        self.locals: list[object] = [UNSET] * scope.layout.size
+        self.globals = globals
+        self._link(parent)
+
+    @classmethod
+    def acquire(
+        cls,
+        scope: FunctionScope,
+        parent: Optional['Frame'],
+        globals: Enviroment
+    ) -> 'Frame':
+        free_frames = scope.layout.free_frames
+        if len(free_frames) == 0:
+            return cls(scope, parent, globals)
+
+        frame = cast(Frame, free_frames.pop())
+        frame.globals = globals
+        if parent is not None:
+            frame._link(parent)
+
+        return frame
+
+    def release(self) -> None:
+        layout = self.scope.layout
+        if layout.creates_closures or len(layout.free_frames) >= MAX_FREE_FRAMES:
+            return
+
+        self.locals[:] = layout.unset_locals
+        if self.parent is not None:
+            self._link(None)
+        layout.free_frames.append(self)
+
+    def _link(self, parent: Optional['Frame']) -> None:
+        self.parent = parent
+        if parent is None:
+            self.scopes: tuple[list[object], ...] = (self.locals,)
+        else:
+            self.scopes = (self.locals, *parent.scopes)
 
-    def __delitem__(self, key):
-        del self._store[key]
+    # Returns UNSET when the name is not set in any of the enclosing frames.
+    def lookup(self, name: Name) -> object:
+        scopes = self.scopes
+        for depth, slot in name.candidates:
+            value = scopes[depth][slot]
+            if value is not UNSET:
+                return value
+
+        return UNSET
+
+    # Lookups by name, for the nodes that could not be resolved.
+    def __getitem__(self, key: str) -> object:
+        frame: Optional[Frame] = self
+        while frame is not None:
+            slot = frame.scope.layout.names.get(key)
+            if slot is not None and frame.locals[slot] is not UNSET:
+                return frame.locals[slot]
+            frame = frame.parent
+
+        return self.globals[key]
+
+    def __setitem__(self, key: str, value: object) -> None:
+        self.locals[self.scope.layout.names[key]] = value
+
+Bindings = Union[Enviroment, Frame]
 
 class Integer(Object):
     def __init__(self, value: int):
@@ -62,6 +155,23 @@ class Integer(Object):
     def inspect(self) -> str:
         return str(self.value)
 
+# Integer objects are never modified, so the ones for the values most
+# programs use are created once and shared by the whole runtime, like the
+# small integers of CPython. The dict is updated in place, hot loops may
+# keep a reference to it.
+SMALL_INTEGERS: dict[int, Integer] = {}
+
+def configure_small_integers(minimum: int = -5, maximum: int = 256) -> None:
+    SMALL_INTEGERS.clear()
+    SMALL_INTEGERS.update(
+        (value, Integer(value)) for value in range(minimum, maximum + 1)
+    )
+
+def new_integer(value: int) -> Integer:
+    return SMALL_INTEGERS.get(value) or Integer(value)
+
+configure_small_integers()
+
 class String(Object):
     def __init__(self, value: str):
         self.value = value
@@ -99,9 +209,25 @@ class Return(Object):
     def inspect(self) -> str:
         return self.value.inspect()
 
+# The call of a return statement in tail position, evaluated by the caller
+# (lpp.evaluator._apply_function) once the frame of the function is gone.
+# It goes through blocks like a Return.
+class TailCall(Object):
+    def __init__(self, function: Object, arguments: list[Object], call: Call):
+        self.function = function
+        self.arguments = arguments
+        self.call = call
+
+    def type(self) -> ObjectType:
+        return ObjectType.RETURN
+
+    def inspect(self) -> str:
+        return str(self.call)
+
 class Error(Object):
-    def __init__(self, message: str):
+    def __init__(self, message: str, offset: Optional[int] = None):
         self.message = message
+        self.offset = offset # offset is where the error was raised in the source
 
     def type(self) -> ObjectType:
         return ObjectType.ERROR
@@ -114,11 +240,13 @@ class Function(Object):
         self,
         parameters: list[Identifier],
         body: Block,
-        env: Enviroment
+        env: Bindings,
+        scope: Optional[FunctionScope] = None
     ):
         self.parameters = parameters
         self.body = body
         self.env = env
+        self.scope = scope # set when the function literal was resolved
     
     def type(self) -> ObjectType:
         return ObjectType.FUNCTION
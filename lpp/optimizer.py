@@ -0,0 +1,526 @@
+from typing import (
+    Optional,
+    Union,
+    cast,
+)
+
+import lpp.ast as ast
+from lpp.evaluator import (
+    FALSE,
+    TRUE,
+    _evaluate_infix_expression,
+    _evaluate_prefix_expression,
+)
+from lpp.flat_ast import FlatProgram
+from lpp.object import (
+    Boolean,
+    Integer,
+    Object,
+    String,
+    new_integer,
+)
+
+# Largest function body (in nodes) that is inlined at its call sites.
+INLINE_MAX_NODES = 24
+
+# Rewrites a program into an equivalent one with less work to do:
+#
+# - calls to small functions are replaced by their bodies, see _inlinable
+# - prefix and infix expressions over literals are folded into a literal,
+#   unless evaluating them gives an Error (or raises), those are kept so
+#   the error and its offset are the same at run time
+# - an if with a literal condition is replaced by the branch it takes
+# - statements after a return statement are dropped, and so are literals
+#   whose value is discarded
+#
+# Nodes are never modified, the ones that change are rebuilt, so nodes
+# shared with other trees (see lpp.hash_cons) stay as they are. Function
+# bodies that were not parsed yet are optimized when they are parsed.
+#
+# Inlining assumes the program runs in an enviroment of its own: a REPL,
+# where later programs can bind the names again, has to turn it off.
+def optimize(
+    program: Union[ast.Program, FlatProgram],
+    inline_functions: bool = True
+) -> ast.Program:
+    if type(program) == FlatProgram:
+        statements = list(cast(FlatProgram, program).iter_statements())
+    else:
+        statements = cast(ast.Program, program).statements
+
+    optimizer = Optimizer(inline_functions)
+    return ast.Program(optimizer.optimize_program(statements))
+
+def count_nodes(node: ast.ASTNode) -> int:
+    return sum(1 for _ in ast.walk(node))
+
+class Optimizer:
+    def __init__(self, inline_functions: bool = True) -> None:
+        self._inline_functions = inline_functions
+        # functions that can be inlined, by name, with their body expression
+        self._inlinable: dict[str, tuple[ast.Function, ast.Expression]] = {}
+        self._bindings: dict[str, int] = {}
+
+    def optimize_program(self, statements: list[ast.Statement]) -> list[ast.Statement]:
+        if self._inline_functions:
+            self._bindings = _count_bindings(statements)
+        return self._optimize_statements(statements, top_level=True)
+
+    def _optimize_statements(
+        self,
+        statements: list[ast.Statement],
+        top_level: bool = False
+    ) -> list[ast.Statement]:
+        optimized: list[ast.Statement] = []
+        for statement in statements:
+            statement = self._optimize_statement(statement)
+            if top_level and self._inline_functions:
+                self._register_inlinable(statement)
+
+            branch = _taken_branch(statement)
+            if branch is not None and len(branch.statements) > 0:
+                optimized.extend(branch.statements)
+            else:
+                optimized.append(statement)
+
+            if type(optimized[-1]) == ast.ReturnStatement:
+                break
+
+        last = len(optimized) - 1
+        return [
+            statement
+            for index, statement in enumerate(optimized)
+            if index == last or not _is_discarded_constant(statement)
+        ]
+
+    def _optimize_statement(self, statement: ast.Statement) -> ast.Statement:
+        statement_type = type(statement)
+
+        if statement_type == ast.ExpressionStatement:
+            expression_statement = cast(ast.ExpressionStatement, statement)
+            expression = self._optimize_optional(expression_statement.expression)
+            if expression is expression_statement.expression:
+                return statement
+            return ast.ExpressionStatement(statement.token, expression, statement.offset)
+
+        if statement_type == ast.LetStatement:
+            let_statement = cast(ast.LetStatement, statement)
+            value = self._optimize_optional(let_statement.value)
+            if value is let_statement.value:
+                return statement
+            return ast.LetStatement(statement.token, let_statement.name, value, statement.offset)
+
+        if statement_type == ast.ReturnStatement:
+            return_statement = cast(ast.ReturnStatement, statement)
+            return_value = self._optimize_optional(return_statement.return_value)
+            if return_value is return_statement.return_value:
+                return statement
+            return ast.ReturnStatement(statement.token, return_value, statement.offset)
+
+        if statement_type == ast.Block:
+            return self._optimize_block(cast(ast.Block, statement))
+
+        return statement
+
+    def _optimize_block(self, block: ast.Block) -> ast.Block:
+        if not block.parsed:
+            # nothing is inlined in the body, it may be parsed (and called)
+            # before the functions are bound
+            def parse_statements() -> list[ast.Statement]:
+                statements = block.statements
+                optimized.parse_error = block.parse_error
+                if block.parse_error is not None:
+                    return statements
+                return Optimizer(False)._optimize_statements(statements)
+
+            optimized = ast.Block(
+                block.token,
+                [],
+                block.offset,
+                parse_statements=parse_statements,
+            )
+            return optimized
+
+        if block.parse_error is not None:
+            # the statements of a body with a syntax error are never run
+            return block
+
+        statements = self._optimize_statements(block.statements)
+        if len(statements) == len(block.statements) and all(
+            optimized is original
+            for optimized, original in zip(statements, block.statements)
+        ):
+            return block
+
+        return ast.Block(block.token, statements, block.offset)
+
+    def _optimize_optional(self, node: Optional[ast.Expression]) -> Optional[ast.Expression]:
+        if node is None:
+            return None
+        return self._optimize_expression(node)
+
+    def _optimize_expression(self, node: ast.Expression) -> ast.Expression:
+        node_type = type(node)
+
+        if node_type == ast.Prefix:
+            return self._optimize_prefix(cast(ast.Prefix, node))
+
+        if node_type == ast.Infix:
+            return self._optimize_infix(cast(ast.Infix, node))
+
+        if node_type == ast.If:
+            return self._optimize_if(cast(ast.If, node))
+
+        if node_type == ast.Function:
+            function = cast(ast.Function, node)
+            assert function.body is not None
+            body = self._optimize_block(function.body)
+            if body is function.body:
+                return node
+            return ast.Function(node.token, function.parameters, body, node.offset)
+
+        if node_type == ast.Call:
+            return self._optimize_call(cast(ast.Call, node))
+
+        return node
+
+    def _optimize_prefix(self, node: ast.Prefix) -> ast.Expression:
+        right = self._optimize_optional(node.right)
+
+        right_constant = _constant(right)
+        if right_constant is not None:
+            folded = _literal(_evaluate_prefix_expression(node.operator, right_constant), node)
+            if folded is not None:
+                return folded
+
+        if right is node.right:
+            return node
+        return ast.Prefix(node.token, node.operator, right, node.offset)
+
+    def _optimize_infix(self, node: ast.Infix) -> ast.Expression:
+        left = self._optimize_expression(node.left)
+        right = self._optimize_optional(node.right)
+
+        left_constant = _constant(left)
+        right_constant = _constant(right)
+        if left_constant is not None and right_constant is not None:
+            result: Optional[Object] = None
+            try:
+                result = _evaluate_infix_expression(node.operator, left_constant, right_constant)
+            except ZeroDivisionError:
+                pass
+            folded = _literal(result, node)
+            if folded is not None:
+                return folded
+
+        if left is node.left and right is node.right:
+            return node
+        return ast.Infix(node.token, left, node.operator, right, node.offset)
+
+    def _optimize_if(self, node: ast.If) -> ast.Expression:
+        condition = self._optimize_optional(node.condition)
+        consequence = node.consequence
+        if consequence is not None:
+            consequence = self._optimize_block(consequence)
+        alternative = node.alternative
+        if alternative is not None:
+            alternative = self._optimize_block(alternative)
+
+        condition_constant = _constant(condition)
+        if condition_constant is not None:
+            # the branch that is not taken is dropped, and a branch with a
+            # single expression takes the place of the if
+            if _is_truthy(condition_constant):
+                alternative = None
+                branch = consequence
+            else:
+                consequence = ast.Block(None, [], node.offset)
+                branch = alternative
+
+            if branch is not None and len(branch.statements) == 1:
+                statement = branch.statements[0]
+                if type(statement) == ast.ExpressionStatement:
+                    expression = cast(ast.ExpressionStatement, statement).expression
+                    if expression is not None:
+                        return expression
+
+        if (
+            condition is node.condition and
+            consequence is node.consequence and
+            alternative is node.alternative
+        ):
+            return node
+        return ast.If(node.token, condition, consequence, alternative, node.offset)
+
+    def _optimize_call(self, node: ast.Call) -> ast.Expression:
+        function_node = self._optimize_expression(node.function)
+        arguments = [self._optimize_expression(argument) for argument in node.arguments]
+
+        inlined = self._inline_call(function_node, arguments)
+        if inlined is not None:
+            # the arguments may make the body foldable, but the functions
+            # they name are not inlined again, a function can be applied
+            # to itself
+            inlinable = self._inlinable
+            self._inlinable = {}
+            try:
+                return self._optimize_expression(inlined)
+            finally:
+                self._inlinable = inlinable
+
+        if function_node is node.function and all(
+            optimized is original
+            for optimized, original in zip(arguments, node.arguments)
+        ):
+            return node
+        return ast.Call(node.token, function_node, arguments, node.offset)
+
+    def _register_inlinable(self, statement: ast.Statement) -> None:
+        if type(statement) != ast.LetStatement:
+            return
+
+        let_statement = cast(ast.LetStatement, statement)
+        name = let_statement.name.value
+        if type(let_statement.value) != ast.Function or self._bindings.get(name) != 1:
+            return
+
+        function = cast(ast.Function, let_statement.value)
+        expression = _inlinable(function)
+        if expression is not None:
+            self._inlinable[name] = (function, expression)
+
+    # The body of the function called, with the parameters replaced by the
+    # arguments. Arguments other than literals and identifiers are only
+    # substituted if they are evaluated once, in order, and before anything
+    # in the body that can print or raise: a call or a division.
+    def _inline_call(
+        self,
+        function_node: ast.Expression,
+        arguments: list[ast.Expression]
+    ) -> Optional[ast.Expression]:
+        if type(function_node) != ast.Identifier:
+            return None
+
+        inlinable = self._inlinable.get(cast(ast.Identifier, function_node).value)
+        if inlinable is None:
+            return None
+
+        function, expression = inlinable
+        if len(arguments) != len(function.parameters):
+            return None
+
+        substitutions = {
+            parameter.value: argument
+            for parameter, argument in zip(function.parameters, arguments)
+        }
+        expected = [
+            parameter.value
+            for parameter, argument in zip(function.parameters, arguments)
+            if not _is_trivial(argument)
+        ]
+        evaluated: list[str] = []
+        effects = False
+        for node in _evaluation_order(expression):
+            if type(node) == ast.Identifier:
+                name = cast(ast.Identifier, node).value
+                if not _is_trivial(substitutions[name]):
+                    if effects:
+                        return None
+                    evaluated.append(name)
+            elif type(node) == ast.Call or (
+                type(node) == ast.Infix and cast(ast.Infix, node).operator == '/'
+            ):
+                effects = True
+
+        if evaluated != expected:
+            return None
+
+        return _substitute(expression, substitutions)
+
+# The number of let statements and parameters that bind each name, in the
+# parsed part of the program. Bodies that were not parsed yet are not
+# inlined into, the names they bind locally do not matter.
+def _count_bindings(statements: list[ast.Statement]) -> dict[str, int]:
+    bindings: dict[str, int] = {}
+    stack: list[ast.ASTNode] = list(statements)
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type == ast.LetStatement:
+            name = cast(ast.LetStatement, node).name.value
+            bindings[name] = bindings.get(name, 0) + 1
+        elif node_type == ast.Function:
+            for parameter in cast(ast.Function, node).parameters:
+                bindings[parameter.value] = bindings.get(parameter.value, 0) + 1
+        elif node_type == ast.Block and not cast(ast.Block, node).parsed:
+            continue
+        stack.extend(ast.iter_children(node))
+
+    return bindings
+
+# The expression of a function that can take the place of its calls: a
+# body of a single expression (or return statement) made only of
+# literals, operators, calls and the parameters, so it does not depend on
+# where it is evaluated and cannot return from the caller. A body that is a
+# parameter alone is not inlined, calls unwrap a Return passed as argument.
+def _inlinable(function: ast.Function) -> Optional[ast.Expression]:
+    body = function.body
+    if body is None or not body.parsed or len(body.statements) != 1:
+        return None
+
+    parameters = {parameter.value for parameter in function.parameters}
+    if len(parameters) != len(function.parameters):
+        return None
+
+    statement = body.statements[0]
+    if type(statement) == ast.ReturnStatement:
+        expression = cast(ast.ReturnStatement, statement).return_value
+    elif type(statement) == ast.ExpressionStatement:
+        expression = cast(ast.ExpressionStatement, statement).expression
+    else:
+        return None
+
+    if expression is None or type(expression) == ast.Identifier:
+        return None
+
+    size = 0
+    for node in ast.walk(expression):
+        size += 1
+        node_type = type(node)
+        if node_type == ast.Identifier:
+            if cast(ast.Identifier, node).value not in parameters:
+                return None
+        elif node_type not in _INLINABLE_NODES:
+            return None
+
+    if size > INLINE_MAX_NODES:
+        return None
+    return expression
+
+_INLINABLE_NODES = (
+    ast.Integer,
+    ast.Boolean,
+    ast.StringLiteral,
+    ast.Prefix,
+    ast.Infix,
+    ast.Call,
+)
+
+# Arguments that can be evaluated any number of times, or not at all.
+def _is_trivial(argument: ast.Expression) -> bool:
+    return type(argument) in (ast.Identifier, ast.Integer, ast.Boolean, ast.StringLiteral)
+
+# The nodes of an inlinable expression in the order they are evaluated.
+def _evaluation_order(expression: ast.Expression) -> list[ast.Expression]:
+    order: list[ast.Expression] = []
+    stack: list[tuple[ast.Expression, bool]] = [(expression, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if children_done:
+            order.append(node)
+            continue
+
+        stack.append((node, True))
+        children = [cast(ast.Expression, child) for child in ast.iter_children(node)]
+        stack.extend((child, False) for child in reversed(children))
+
+    return order
+
+def _substitute(
+    node: ast.Expression,
+    substitutions: dict[str, ast.Expression]
+) -> ast.Expression:
+    node_type = type(node)
+
+    if node_type == ast.Identifier:
+        return substitutions[cast(ast.Identifier, node).value]
+
+    if node_type == ast.Prefix:
+        prefix = cast(ast.Prefix, node)
+        assert prefix.right is not None
+        right = _substitute(prefix.right, substitutions)
+        return ast.Prefix(node.token, prefix.operator, right, node.offset)
+
+    if node_type == ast.Infix:
+        infix = cast(ast.Infix, node)
+        assert infix.right is not None
+        left = _substitute(infix.left, substitutions)
+        right = _substitute(infix.right, substitutions)
+        return ast.Infix(node.token, left, infix.operator, right, node.offset)
+
+    if node_type == ast.Call:
+        call = cast(ast.Call, node)
+        return ast.Call(
+            node.token,
+            _substitute(call.function, substitutions),
+            [_substitute(argument, substitutions) for argument in call.arguments],
+            node.offset,
+        )
+
+    return node
+
+# The block an if statement with a literal condition evaluates to, whose
+# statements can take the place of the if in the enclosing block.
+def _taken_branch(statement: ast.Statement) -> Optional[ast.Block]:
+    if type(statement) != ast.ExpressionStatement:
+        return None
+
+    expression = cast(ast.ExpressionStatement, statement).expression
+    if type(expression) != ast.If:
+        return None
+
+    if_node = cast(ast.If, expression)
+    condition = _constant(if_node.condition)
+    if condition is None:
+        return None
+    if _is_truthy(condition):
+        return if_node.consequence
+    return if_node.alternative
+
+def _is_discarded_constant(statement: ast.Statement) -> bool:
+    if type(statement) != ast.ExpressionStatement:
+        return False
+
+    expression = cast(ast.ExpressionStatement, statement).expression
+    if type(expression) == ast.If:
+        # only a literal condition with no branch to take is left here
+        if_node = cast(ast.If, expression)
+        return _constant(if_node.condition) is not None and _taken_branch(statement) is None
+
+    return expression is not None and (
+        type(expression) == ast.Function or _constant(expression) is not None
+    )
+
+# The value of a literal node, None for anything else.
+def _constant(node: Optional[ast.Expression]) -> Optional[Object]:
+    node_type = type(node)
+
+    if node_type == ast.Integer:
+        value = cast(ast.Integer, node).value
+        if value is not None:
+            return new_integer(value)
+    elif node_type == ast.Boolean:
+        boolean = cast(ast.Boolean, node).value
+        if boolean is not None:
+            return TRUE if boolean else FALSE
+    elif node_type == ast.StringLiteral:
+        return String(cast(ast.StringLiteral, node).value)
+
+    return None
+
+# The literal node for a folded value, located where the folded expression
+# was. None when the value has no literal (errors).
+def _literal(value: Optional[Object], node: ast.Expression) -> Optional[ast.Expression]:
+    value_type = type(value)
+
+    if value_type == Integer:
+        return ast.Integer(None, cast(Integer, value).value, node.offset)
+    if value_type == Boolean:
+        return ast.Boolean(None, cast(Boolean, value).value, node.offset)
+    if value_type == String:
+        return ast.StringLiteral(None, cast(String, value).value, node.offset)
+
+    return None
+
+def _is_truthy(value: Object) -> bool:
+    return value is not FALSE
@@ -1,6 +1,9 @@
 from typing import (
+    Any,
     Optional,
     Callable,
+    Generator,
+    Union,
 )
 from enum import (
     IntEnum,
@@ -25,7 +28,8 @@ from lpp.ast import (
     Call,
     StringLiteral,
 )
-from lpp.lexer import Lexer
+from lpp.flat_ast import FlatProgram
+from lpp.lexer import Lexer, TokenSource, TokenStream
 from lpp.token import Token, TokenType
 
 @unique
@@ -59,10 +63,38 @@ InfixParseFn = Callable[[Expression], Optional[Expression]]
 PrefixParseFns = dict[TokenType, PrefixParseFn]
 InfixParseFns = dict[TokenType, InfixParseFn]
 
+# A parse step of the IterativeParser. It yields the steps it depends on
+# (other ParseSteps) and receives their results, its return value is the
+# parsed node.
+ParseStep = Generator[Any, Any, Any]
+PrefixParseStep = Callable[[], ParseStep]
+InfixParseStep = Callable[[Expression], ParseStep]
+
+class _TokenListReader:
+    def __init__(self, tokens: list[Token]) -> None:
+        self._tokens = tokens
+        self._index: int = 0
+
+    def next_token(self) -> Token:
+        token = self._tokens[self._index]
+        if self._index < len(self._tokens) - 1:
+            self._index += 1
+
+        return token
+
 class Parser:
 
-    def __init__(self, lexer: Lexer) -> None:
-        self._lexer = lexer
+    def __init__(
+        self,
+        lexer: Union[TokenSource, TokenStream],
+        retain_tokens: bool = True,
+        lazy_functions: bool = False,
+    ) -> None:
+        if isinstance(lexer, TokenStream):
+            lexer = lexer.reader()
+        self._lexer: TokenSource = lexer
+        self._retain_tokens = retain_tokens
+        self._lazy_functions = lazy_functions
 
         self._prefix_parse_fns: PrefixParseFns = self._register_prefix_fns()
         self._infix_parse_fns: InfixParseFns = self._register_infix_fns()
@@ -71,12 +103,20 @@ class Parser:
         self._peek_token: Token = lexer.next_token()
 
         self._errors: list[str] = []
+        self._error_offsets: list[int] = []
 
     @property
     def errors(self) -> list[str]:
         return self._errors
 
-    def parse_program(self):
+    @property
+    def error_offsets(self) -> list[int]:
+        return self._error_offsets
+
+    def parse_program(self, flat: bool = False):
+        if flat:
+            return self._parse_flat_program()
+
         statements=[]
 
         while self._current_token.token_type != TokenType.EOF:
@@ -88,6 +128,44 @@ class Parser:
 
         return Program(statements=statements)
 
+    # Parses top level statements into `statements` until EOF or until `stop`
+    # accepts the offset where the next statement starts. Returns that
+    # offset, or None when EOF was reached.
+    def parse_statements_until(
+        self,
+        statements: list[Statement],
+        stop: Callable[[int], bool],
+    ) -> Optional[int]:
+        while self._current_token.token_type != TokenType.EOF:
+            offset = self._current_token.offset
+            if stop(offset):
+                return offset
+
+            statement = self._parse_statement()
+            if statement is not None:
+                statements.append(statement)
+
+            self._advance_token()
+
+        return None
+
+    # Each top level statement is moved to the arrays as soon as it is
+    # parsed, so only one statement exists as Python objects at a time.
+    def _parse_flat_program(self) -> FlatProgram:
+        program = FlatProgram()
+
+        while self._current_token.token_type != TokenType.EOF:
+            statement = self._parse_statement()
+            if statement is not None:
+                program.add_statement(statement)
+
+            self._advance_token()
+
+        return program
+
+    def _retained(self, token: Token) -> Optional[Token]:
+        return token if self._retain_tokens else None
+
     def _advance_token(self) -> None:
         self._current_token = self._peek_token
         self._peek_token = self._lexer.next_token()
@@ -104,7 +182,11 @@ class Parser:
         error = \
             f'Se esperaba que el siguiente token fuera {token_type} ' \
             f'pero se obtuvo {self._peek_token.token_type}'
+        self._add_error(error, self._peek_token)
+
+    def _add_error(self, error: str, token: Token) -> None:
         self._errors.append(error)
+        self._error_offsets.append(token.offset)
 
     def _parse_statement(self) -> Optional[Statement]:
         if self._current_token.token_type == TokenType.LET:
@@ -132,7 +214,8 @@ class Parser:
             self._advance_token()
 
         return LetStatement(
-            token=let_token,
+            token=self._retained(let_token),
+            offset=let_token.offset,
             name=let_name,
             value=let_value,
         )
@@ -147,7 +230,8 @@ class Parser:
             self._advance_token()
 
         return ReturnStatement(
-            token=return_token,
+            token=self._retained(return_token),
+            offset=return_token.offset,
             return_value=return_value,
         )
 
@@ -159,7 +243,8 @@ class Parser:
             self._advance_token()
 
         return ExpressionStatement(
-            token=expression_token,
+            token=self._retained(expression_token),
+            offset=expression_token.offset,
             expression=expression_expression,
         )
 
@@ -167,19 +252,25 @@ class Parser:
         try:
             value = int(self._current_token.literal)
         except ValueError:
-            self._errors.append(
+            self._add_error(
                 'No se ha podido parsear el valor ' \
-                f'{self._current_token.literal} como entero'
+                f'{self._current_token.literal} como entero',
+                self._current_token,
             )
             return None
-        return Integer(token=self._current_token, value=value)
+        return Integer(
+            token=self._retained(self._current_token),
+            value=value,
+            offset=self._current_token.offset,
+        )
 
     def _parse_prefix_expression(self) -> Prefix:
         token = self._current_token
         self._advance_token()
         right=self._parse_expression(Precedence.PREFIX)
         return Prefix(
-            token=token,
+            token=self._retained(token),
+            offset=token.offset,
             operator=token.literal,
             right=right
         )
@@ -189,7 +280,8 @@ class Parser:
         precedence = self._current_precedence()
         self._advance_token()
         return Infix(
-            token=token,
+            token=self._retained(token),
+            offset=token.offset,
             operator=token.literal,
             left=left,
             right=self._parse_expression(precedence)
@@ -220,7 +312,8 @@ class Parser:
             if_alternative = self._parse_block()
 
         return If(
-            token=if_token,
+            token=self._retained(if_token),
+            offset=if_token.offset,
             condition=if_condition,
             consequence=if_consequence,
             alternative=if_alternative,
@@ -238,10 +331,14 @@ class Parser:
         if not self._expected_token(TokenType.LBRACE):
             return None
 
-        function_body = self._parse_block()
+        if self._lazy_functions:
+            function_body = self._parse_lazy_block()
+        else:
+            function_body = self._parse_block()
 
         return Function(
-            token=function_token,
+            token=self._retained(function_token),
+            offset=function_token.offset,
             parameters=function_params,
             body=function_body,
         )
@@ -295,9 +392,10 @@ class Parser:
         try:
             prefix_parse_fn = self._prefix_parse_fns[self._current_token.token_type]
         except KeyError:
-            self._errors.append(
+            self._add_error(
                 f'No se ha encontrado una función para parsear ' \
-                f'{self._current_token.literal}'
+                f'{self._current_token.literal}',
+                self._current_token,
             )
             return None
 
@@ -320,13 +418,15 @@ class Parser:
         
     def _parse_identifier(self) -> Identifier:
         return Identifier(
-            token=self._current_token,
+            token=self._retained(self._current_token),
+            offset=self._current_token.offset,
             value=self._current_token.literal
         )
 
     def _parse_boolean(self) -> Boolean:
         return Boolean(
-            token=self._current_token,
+            token=self._retained(self._current_token),
+            offset=self._current_token.offset,
             value=self._current_token.token_type == TokenType.TRUE
         )
 
@@ -355,10 +455,90 @@ class Parser:
             self._advance_token()
 
         return Block(
-            token=token,
+            token=self._retained(token),
+            offset=token.offset,
             statements=statements,
         )
 
+    # Only matches braces to find where the block ends, the block is parsed
+    # the first time its statements are needed.
+    def _parse_lazy_block(self) -> Block:
+        token = self._current_token
+
+        if isinstance(self._lexer, Lexer):
+            block = self._skip_block_source(self._lexer)
+            if block is not None:
+                return block
+
+        tokens = [token]
+        depth = 1
+
+        while not self._peek_token.token_type == TokenType.EOF:
+            self._advance_token()
+            tokens.append(self._current_token)
+
+            if self._current_token.token_type == TokenType.LBRACE:
+                depth += 1
+            elif self._current_token.token_type == TokenType.RBRACE:
+                depth -= 1
+                if depth == 0:
+                    break
+
+        if depth > 0:
+            tokens.append(self._peek_token)
+        else:
+            tokens.append(Token(TokenType.EOF, '', self._current_token.offset + 1))
+
+        return self._lazy_block(token, lambda: _TokenListReader(tokens))
+
+    # With the whole source at hand the block is skipped without producing
+    # its tokens, only its span is kept to lex it again when needed.
+    def _skip_block_source(self, lexer: Lexer) -> Optional[Block]:
+        token = self._current_token
+        peek_type = self._peek_token.token_type
+        if peek_type in (TokenType.RBRACE, TokenType.EOF):
+            return None
+
+        depth = 2 if peek_type == TokenType.LBRACE else 1
+        end = lexer.find_closing_brace(depth)
+        if end is None:
+            return None
+
+        lexer.seek(end)
+        self._peek_token = lexer.next_token()
+        self._advance_token()
+
+        source = lexer.source
+        symbols = lexer.symbols
+        stop = end + 1
+        return self._lazy_block(
+            token,
+            lambda: Lexer(source, symbols, token.offset, stop),
+        )
+
+    def _lazy_block(
+        self,
+        token: Token,
+        lexer: Callable[[], TokenSource],
+    ) -> Block:
+        # the program was returned long before the block is parsed, its
+        # errors are kept in the block and given when the function is called
+        def parse_statements() -> list[Statement]:
+            parser = type(self)(lexer(), self._retain_tokens, self._lazy_functions)
+            block = parser._parse_block()
+            if len(parser.errors) > 0:
+                lazy_block.parse_error = (parser.errors[0], parser.error_offsets[0])
+
+            return block.statements
+
+        lazy_block = Block(
+            token=self._retained(token),
+            offset=token.offset,
+            statements=[],
+            parse_statements=parse_statements,
+        )
+        return lazy_block
+
     def _parse_function_parameters(self) -> list[Identifier]:
         parameters: list[Identifier] = []
 
@@ -367,7 +547,8 @@ class Parser:
 
         while True:
             identifier = Identifier(
-                token=self._current_token,
+                token=self._retained(self._current_token),
+                offset=self._current_token.offset,
                 value=self._current_token.literal
             )
             parameters.append(identifier)
@@ -385,7 +566,8 @@ class Parser:
         call_token = self._current_token
         arguments = self._parse_call_arguments()
         return Call(
-            token=call_token,
+            token=self._retained(call_token),
+            offset=call_token.offset,
             function=function,
             arguments=arguments
         )
@@ -415,6 +597,284 @@ class Parser:
 
     def _parse_string_literal(self) -> Expression:
         return StringLiteral(
-            token=self._current_token,
+            token=self._retained(self._current_token),
+            offset=self._current_token.offset,
             value=self._current_token.literal
         )
+
+# Parses the same programs as Parser, but every rule that would recurse is
+# a generator and nested rules are kept in an explicit stack, so deeply
+# nested input does not grow the Python stack.
+class IterativeParser(Parser):
+
+    def __init__(
+        self,
+        lexer: Union[TokenSource, TokenStream],
+        retain_tokens: bool = True,
+        lazy_functions: bool = False,
+    ) -> None:
+        super().__init__(lexer, retain_tokens, lazy_functions)
+
+        self._prefix_parse_steps: dict[TokenType, PrefixParseStep] = {
+            TokenType.MINUS: self._prefix_expression_step,
+            TokenType.NEGATION: self._prefix_expression_step,
+            TokenType.LPAREN: self._grouped_expression_step,
+            TokenType.IF: self._if_step,
+            TokenType.FUNCTION: self._function_step,
+        }
+        self._infix_parse_steps: dict[TokenType, InfixParseStep] = {
+            token_type: self._infix_expression_step
+            for token_type in self._infix_parse_fns
+        }
+        self._infix_parse_steps[TokenType.LPAREN] = self._call_step
+
+    def _parse_statement(self) -> Optional[Statement]:
+        return self._run(self._statement_step())
+
+    def _run(self, step: ParseStep) -> Any:
+        stack = [step]
+        result = None
+
+        while stack:
+            try:
+                nested_step = stack[-1].send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+            else:
+                stack.append(nested_step)
+                result = None
+
+        return result
+
+    def _statement_step(self) -> ParseStep:
+        if self._current_token.token_type == TokenType.LET:
+            return (yield self._let_statement_step())
+        if self._current_token.token_type == TokenType.RETURN:
+            return (yield self._return_statement_step())
+        else:
+            return (yield self._expression_statement_step())
+
+    def _let_statement_step(self) -> ParseStep:
+        let_token = self._current_token
+
+        if not self._expected_token(TokenType.IDENT):
+            return None
+
+        let_name = self._parse_identifier()
+
+        if not self._expected_token(TokenType.ASSIGN):
+            return None
+        self._advance_token()
+
+        let_value = yield self._expression_step(Precedence.LOWEST)
+
+        if self._peek_token.token_type == TokenType.SEMICOLON:
+            self._advance_token()
+
+        return LetStatement(
+            token=self._retained(let_token),
+            offset=let_token.offset,
+            name=let_name,
+            value=let_value,
+        )
+
+    def _return_statement_step(self) -> ParseStep:
+        return_token = self._current_token
+
+        self._advance_token()
+
+        return_value = yield self._expression_step(Precedence.LOWEST)
+        if self._peek_token.token_type == TokenType.SEMICOLON:
+            self._advance_token()
+
+        return ReturnStatement(
+            token=self._retained(return_token),
+            offset=return_token.offset,
+            return_value=return_value,
+        )
+
+    def _expression_statement_step(self) -> ParseStep:
+        expression_token = self._current_token
+        expression_expression = yield self._expression_step(Precedence.LOWEST)
+
+        if self._peek_token.token_type == TokenType.SEMICOLON:
+            self._advance_token()
+
+        return ExpressionStatement(
+            token=self._retained(expression_token),
+            offset=expression_token.offset,
+            expression=expression_expression,
+        )
+
+    def _expression_step(self, precedence: Precedence) -> ParseStep:
+        token_type = self._current_token.token_type
+        if token_type in self._prefix_parse_steps:
+            left_expression = yield self._prefix_parse_steps[token_type]()
+        elif token_type in self._prefix_parse_fns:
+            left_expression = self._prefix_parse_fns[token_type]()
+        else:
+            self._add_error(
+                f'No se ha encontrado una función para parsear ' \
+                f'{self._current_token.literal}',
+                self._current_token,
+            )
+            return None
+
+        while (
+            not self._peek_token.token_type == TokenType.SEMICOLON and \
+            self._peek_precedence() > precedence
+        ):
+            try:
+                infix_parse_step = self._infix_parse_steps[self._peek_token.token_type]
+            except KeyError:
+                return left_expression
+
+            self._advance_token()
+            assert left_expression is not None
+            left_expression = yield infix_parse_step(left_expression)
+
+        return left_expression
+
+    def _prefix_expression_step(self) -> ParseStep:
+        token = self._current_token
+        self._advance_token()
+        right = yield self._expression_step(Precedence.PREFIX)
+        return Prefix(
+            token=self._retained(token),
+            offset=token.offset,
+            operator=token.literal,
+            right=right
+        )
+
+    def _infix_expression_step(self, left: Expression) -> ParseStep:
+        token = self._current_token
+        precedence = self._current_precedence()
+        self._advance_token()
+        right = yield self._expression_step(precedence)
+        return Infix(
+            token=self._retained(token),
+            offset=token.offset,
+            operator=token.literal,
+            left=left,
+            right=right
+        )
+
+    def _grouped_expression_step(self) -> ParseStep:
+        self._advance_token()
+        expression = yield self._expression_step(Precedence.LOWEST)
+        if not self._expected_token(TokenType.RPAREN):
+            return None
+
+        return expression
+
+    def _if_step(self) -> ParseStep:
+        if_token = self._current_token
+        if not self._expected_token(TokenType.LPAREN):
+            return None
+
+        self._advance_token()
+
+        if_condition = yield self._expression_step(Precedence.LOWEST)
+
+        if not self._expected_token(TokenType.RPAREN):
+            return None
+
+        if not self._expected_token(TokenType.LBRACE):
+            return None
+
+        if_consequence = yield self._block_step()
+
+        if_alternative = None
+        if self._peek_token.token_type == TokenType.ELSE:
+            self._advance_token()
+            if not self._expected_token(TokenType.LBRACE):
+                return None
+            if_alternative = yield self._block_step()
+
+        return If(
+            token=self._retained(if_token),
+            offset=if_token.offset,
+            condition=if_condition,
+            consequence=if_consequence,
+            alternative=if_alternative,
+        )
+
+    def _function_step(self) -> ParseStep:
+        function_token = self._current_token
+
+        if not self._expected_token(TokenType.LPAREN):
+            return None
+        self._advance_token()
+
+        function_params = self._parse_function_parameters()
+
+        if not self._expected_token(TokenType.LBRACE):
+            return None
+
+        if self._lazy_functions:
+            function_body = self._parse_lazy_block()
+        else:
+            function_body = yield self._block_step()
+
+        return Function(
+            token=self._retained(function_token),
+            offset=function_token.offset,
+            parameters=function_params,
+            body=function_body,
+        )
+
+    def _block_step(self) -> ParseStep:
+        token = self._current_token
+        statements = []
+
+        self._advance_token()
+
+        while (
+            not self._current_token.token_type == TokenType.RBRACE \
+            and not self._peek_token.token_type == TokenType.EOF
+        ):
+            statement = yield self._statement_step()
+            if statement:
+                statements.append(statement)
+
+            self._advance_token()
+
+        return Block(
+            token=self._retained(token),
+            offset=token.offset,
+            statements=statements,
+        )
+
+    def _call_step(self, function: Expression) -> ParseStep:
+        call_token = self._current_token
+        arguments = yield self._call_arguments_step()
+        return Call(
+            token=self._retained(call_token),
+            offset=call_token.offset,
+            function=function,
+            arguments=arguments
+        )
+
+    def _call_arguments_step(self) -> ParseStep:
+        arguments: list[Expression] = []
+
+        if self._peek_token.token_type == TokenType.RPAREN:
+            self._advance_token()
+            return arguments
+
+        self._advance_token()
+
+        while True:
+            if expression := (yield self._expression_step(Precedence.LOWEST)):
+                arguments.append(expression)
+
+            if self._peek_token.token_type != TokenType.COMMA:
+                break
+            self._advance_token()
+            self._advance_token()
+
+        if not self._expected_token(TokenType.RPAREN):
+            return []
+
+        return arguments
@@ -2,34 +2,50 @@ from lpp.ast import Program
 from lpp.lexer import Lexer
 from lpp.parser import Parser
 from lpp.token import (
+    SymbolTable,
     Token,
     TokenType,
 )
-from lpp.evaluator import evaluate
-from lpp.object import Enviroment
+from lpp.vm import execute
+from lpp.optimizer import optimize
+from lpp.object import Enviroment, Error
+from lpp.source import SourceMap
 
 EOF_TOKEN = Token(TokenType.EOF, '')
 
-def _print_parse_errors(errors: list[str]) -> None:
-    for error in errors:
+def _print_parse_errors(
+    errors: list[str],
+    offsets: list[int],
+    source_map: SourceMap,
+) -> None:
+    for error, offset in zip(errors, offsets):
         print('--- Error ---')
-        print(error)
+        print(f'{source_map.describe(offset)}: {error}')
 
 def start_repl() -> None:
     env = Enviroment()
+    symbols = SymbolTable()
 
     try:
         while True:
             source = input('>> ')
-            lexer = Lexer(source)
+            lexer = Lexer(source, symbols)
             parser = Parser(lexer)
             program = parser.parse_program()
             
             if len(parser.errors) > 0:
-                _print_parse_errors(parser.errors)
+                _print_parse_errors(
+                    parser.errors,
+                    parser.error_offsets,
+                    SourceMap(source),
+                )
                 continue
 
-            evaluated = evaluate(program, env)
+            # the functions of a line can be bound again by the next ones,
+            # their calls are not inlined
+            evaluated = execute(optimize(program, inline_functions=False), env)
+            if isinstance(evaluated, Error) and evaluated.offset is not None:
+                print(f'{SourceMap(source).describe(evaluated.offset)}:')
             if evaluated is not None:
                 print(evaluated.inspect())    
     except KeyboardInterrupt:
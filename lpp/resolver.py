@@ -0,0 +1,239 @@
+from typing import (
+    NamedTuple,
+    Optional,
+    cast,
+)
+
+import lpp.ast as ast
+from lpp.flat_ast import (
+    NO_INDEX,
+    FlatProgram,
+    NodeKind,
+)
+
+# Value of the local slots that have not been set (a missing argument, or a
+# variable whose let statement did not run yet).
+UNSET = object()
+
+# A name as seen from a function: the (depth, slot) of every enclosing
+# function that declares it, innermost first. At run time the first slot
+# that is set wins (a missing argument leaves its slot unset), and the
+# global enviroment and the builtins are tried last.
+class Name(NamedTuple):
+    name: str
+    candidates: tuple[tuple[int, int], ...]
+
+# Nodes shared between functions in different contexts (see lpp.hash_cons)
+# cannot be resolved to slots, they are looked up and stored by name.
+DYNAMIC = Name('', ())
+BY_NAME = -1
+
+# The slots of a function: its parameters and the variables of its body,
+# without the ones of nested functions.
+class Layout:
+    def __init__(
+        self,
+        parameters: list[str],
+        declared: list[str],
+        creates_closures: bool
+    ) -> None:
+        self.names: dict[str, int] = {}
+        for name in [*parameters, *declared]:
+            self.names.setdefault(name, len(self.names))
+
+        self.parameter_slots = [self.names[name] for name in parameters]
+        self.size = len(self.names)
+        self.creates_closures = creates_closures
+        self.unset_locals = (UNSET,) * self.size
+        self.free_frames: list[object] = [] # see lpp.object.Frame
+
+    @classmethod
+    def of_function(cls, function: ast.Function) -> 'Layout':
+        assert function.body is not None
+        return cls(
+            [parameter.value for parameter in function.parameters],
+            declared_names(function.body),
+            any(type(node) == ast.Function for node in ast.walk(function.body)),
+        )
+
+    @classmethod
+    def of_flat_function(cls, program: FlatProgram, index: int) -> 'Layout':
+        children = program.child_indices(index)
+        declared: list[str] = []
+        creates_closures = False
+
+        stack = [children[-1]]
+        while stack:
+            node = stack.pop()
+            kind = program.kinds[node]
+            if kind == NodeKind.LET:
+                name = program.child_indices(node)[0]
+                declared.append(cast(str, program.literal(name)))
+            if kind == NodeKind.FUNCTION:
+                creates_closures = True
+                continue
+            stack.extend(reversed([
+                child for child in program.child_indices(node) if child != NO_INDEX
+            ]))
+
+        return cls(
+            [cast(str, program.literal(parameter)) for parameter in children[:-1]],
+            declared,
+            creates_closures,
+        )
+
+# Resolution state of a function literal. The body of a lazily parsed
+# function is resolved on its first call, when it has to be parsed anyway.
+class FunctionScope:
+    def __init__(self, function: ast.Function) -> None:
+        self.function = function
+        # scopes of the enclosing functions, innermost first, or None when
+        # the function appears in more than one context
+        self.enclosing: Optional[tuple['FunctionScope', ...]] = ()
+        self.resolved = False
+        self._layout: Optional[Layout] = None
+
+    @property
+    def layout(self) -> Layout:
+        if self._layout is None:
+            self._layout = Layout.of_function(self.function)
+        return self._layout
+
+    def ensure_resolved(self) -> None:
+        if self.resolved:
+            return
+
+        assert self.function.body is not None
+        self.resolved = True
+        if self.enclosing is None:
+            _resolve(self.function.body, (self,), dynamic=True)
+        else:
+            _resolve(self.function.body, (self, *self.enclosing), dynamic=False)
+        _mark_tail_calls(self.function.body, returned=True)
+
+def resolve(node: ast.ASTNode) -> None:
+    _resolve(node, (), dynamic=False)
+    _mark_tail_calls(node, returned=False)
+
+def find(name: str, layouts: list[Layout]) -> tuple[tuple[int, int], ...]:
+    return tuple(
+        (depth, layout.names[name])
+        for depth, layout in enumerate(layouts)
+        if name in layout.names
+    )
+
+# Variables a function body can set: the let statements of the body and of
+# the blocks inside it, but not the ones inside nested function literals.
+def declared_names(body: ast.Block) -> list[str]:
+    names: list[str] = []
+    stack: list[ast.ASTNode] = [body]
+    while stack:
+        node = stack.pop()
+        if type(node) == ast.LetStatement:
+            names.append(cast(ast.LetStatement, node).name.value)
+        if type(node) == ast.Function:
+            continue
+        stack.extend(reversed(list(ast.iter_children(node))))
+
+    return names
+
+def _resolve(
+    node: ast.ASTNode,
+    chain: tuple[FunctionScope, ...],
+    dynamic: bool
+) -> None:
+    layouts = [scope.layout for scope in chain]
+    stack: list[ast.ASTNode] = [node]
+
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+
+        if node_type == ast.Identifier:
+            identifier = cast(ast.Identifier, node)
+            if dynamic:
+                identifier.resolved = DYNAMIC
+            else:
+                name = Name(identifier.value, find(identifier.value, layouts))
+                if identifier.resolved is None:
+                    identifier.resolved = name
+                elif identifier.resolved != name:
+                    identifier.resolved = DYNAMIC
+
+        elif node_type == ast.LetStatement:
+            let_statement = cast(ast.LetStatement, node)
+            slot = BY_NAME
+            if len(chain) > 0:
+                slot = layouts[0].names[let_statement.name.value]
+            if let_statement.slot is None:
+                let_statement.slot = slot
+            elif let_statement.slot != slot:
+                let_statement.slot = BY_NAME
+
+            if let_statement.value is not None:
+                stack.append(let_statement.value)
+
+        elif node_type == ast.Function:
+            _resolve_function(cast(ast.Function, node), chain, dynamic)
+
+        else:
+            stack.extend(ast.iter_children(node))
+
+def _resolve_function(
+    function: ast.Function,
+    chain: tuple[FunctionScope, ...],
+    dynamic: bool
+) -> None:
+    scope = function.scope
+    if scope is None:
+        scope = FunctionScope(function)
+        scope.enclosing = None if dynamic else chain
+        function.scope = scope
+    elif scope.enclosing is not None and (dynamic or scope.enclosing != chain):
+        scope.enclosing = None
+        scope.resolved = False
+    elif scope.resolved:
+        return
+
+    assert function.body is not None
+    if function.body.parsed:
+        scope.ensure_resolved()
+
+# A return statement is a tail call when its value is a call and the Return
+# reaches the end of the function unchanged: it is a statement of the body,
+# or of a block of an if that is itself a statement of such a block. A
+# shared statement (see lpp.hash_cons) found in any other position, or
+# outside of a function, is not.
+def _mark_tail_calls(node: ast.ASTNode, returned: bool) -> None:
+    # nodes paired with whether their value is the value of the function
+    stack: list[tuple[ast.ASTNode, bool]] = [(node, returned)]
+
+    while stack:
+        node, returned = stack.pop()
+        node_type = type(node)
+
+        if node_type == ast.ReturnStatement:
+            return_statement = cast(ast.ReturnStatement, node)
+            tail = returned and type(return_statement.return_value) == ast.Call
+            if return_statement.tail is None:
+                return_statement.tail = tail
+            else:
+                return_statement.tail = return_statement.tail and tail
+
+        if node_type == ast.Function:
+            continue
+        elif returned and node_type == ast.Block:
+            statements = cast(ast.Block, node).statements
+            stack.extend((statement, True) for statement in statements)
+        elif returned and node_type == ast.ExpressionStatement:
+            expression = cast(ast.ExpressionStatement, node).expression
+            if expression is not None:
+                stack.append((expression, True))
+        elif returned and node_type == ast.If:
+            if_node = cast(ast.If, node)
+            stack.extend(
+                (child, child is not if_node.condition)
+                for child in ast.iter_children(if_node)
+            )
+        else:
+            stack.extend((child, False) for child in ast.iter_children(node))
@@ -0,0 +1,25 @@
+from bisect import bisect_right
+from re import compile
+from typing import Optional
+
+NEWLINE_REGEX = compile(r'\n')
+
+class SourceMap:
+    def __init__(self, source: str) -> None:
+        self._source = source
+        self._line_starts: Optional[list[int]] = None
+
+    def line_column(self, offset: int) -> tuple[int, int]:
+        if self._line_starts is None:
+            self._line_starts = [0] + [
+                match.end() for match in NEWLINE_REGEX.finditer(self._source)
+            ]
+
+        line = bisect_right(self._line_starts, offset)
+        column = offset - self._line_starts[line - 1] + 1
+
+        return line, column
+
+    def describe(self, offset: int) -> str:
+        line, column = self.line_column(offset)
+        return f'línea {line}, columna {column}'
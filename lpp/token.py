@@ -35,19 +35,64 @@ class TokenType(Enum):
 class Token(NamedTuple):
     token_type: TokenType
     literal: str
+    offset: int = -1 # offset is the index of the first character in the source
 
     def __str__(self) -> str:
         return f'Type: {self.token_type}, Literal: {self.literal}'
 
+    # The offset is not part of a token's identity, tokens read from
+    # different places of a source still compare equal.
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, tuple):
+            return NotImplemented
+        return self[:2] == other[:2]
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    def __hash__(self) -> int:
+        return hash(self[:2])
+
+KEYWORDS: dict[str, TokenType] = {
+    'falso': TokenType.FALSE,
+    'procedimiento': TokenType.FUNCTION,
+    'regresa': TokenType.RETURN,
+    'si': TokenType.IF,
+    'si_no': TokenType.ELSE,
+    'variable': TokenType.LET,
+    'verdadero': TokenType.TRUE,
+}
+
 def lookup_token_type(literal: str) -> TokenType:
-    keywords: dict[str, TokenType] = {
-        'falso': TokenType.FALSE,
-        'procedimiento': TokenType.FUNCTION,
-        'regresa': TokenType.RETURN,
-        'si': TokenType.IF,
-        'si_no': TokenType.ELSE,
-        'variable': TokenType.LET,
-        'verdadero': TokenType.TRUE,
-    }
-
-    return keywords.get(literal, TokenType.IDENT)
+    return KEYWORDS.get(literal, TokenType.IDENT)
+
+class SymbolTable:
+    def __init__(self) -> None:
+        self._entries: dict[str, tuple[TokenType, str]] = {
+            keyword: (token_type, keyword)
+            for keyword, token_type in KEYWORDS.items()
+        }
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def lookup(self, literal: str) -> tuple[TokenType, str]:
+        try:
+            return self._entries[literal]
+        except KeyError:
+            entry = (TokenType.IDENT, literal)
+            self._entries[literal] = entry
+            self._ids[literal] = len(self._names)
+            self._names.append(literal)
+            return entry
+
+    def intern(self, name: str) -> str:
+        return self.lookup(name)[1]
+
+    def symbol_id(self, name: str) -> int:
+        return self._ids[self.intern(name)]
+
+    def name(self, symbol_id: int) -> str:
+        return self._names[symbol_id]
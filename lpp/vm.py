@@ -0,0 +1,433 @@
+from typing import (
+    Optional,
+    Union,
+    cast,
+)
+
+import lpp.ast as ast
+from lpp.builtins import BUILTINS
+from lpp.compiler import (
+    CodeObject,
+    Name,
+    Opcode,
+    compile_program,
+)
+from lpp.evaluator import (
+    FALSE,
+    NULL,
+    TRUE,
+    _UNKNOW_IDENTIFIER,
+    _apply_function,
+    _evaluate_infix_expression,
+    _evaluate_prefix_expression,
+    _new_error,
+)
+from lpp.flat_ast import FlatProgram
+from lpp.object import (
+    MAX_FREE_FRAMES,
+    Boolean,
+    Enviroment,
+    Error,
+    Function,
+    Integer,
+    Null,
+    Object,
+    Return,
+    new_integer,
+)
+from lpp.resolver import UNSET
+
+_LOAD_CONST = Opcode.LOAD_CONST.value
+_LOAD_NONE = Opcode.LOAD_NONE.value
+_LOAD_LOCAL = Opcode.LOAD_LOCAL.value
+_LOAD_NAME = Opcode.LOAD_NAME.value
+_LOAD_GLOBAL = Opcode.LOAD_GLOBAL.value
+_STORE_LOCAL = Opcode.STORE_LOCAL.value
+_STORE_GLOBAL = Opcode.STORE_GLOBAL.value
+_ADD = Opcode.ADD.value
+_SUB = Opcode.SUB.value
+_MUL = Opcode.MUL.value
+_DIV = Opcode.DIV.value
+_LT = Opcode.LT.value
+_GT = Opcode.GT.value
+_EQ = Opcode.EQ.value
+_NE = Opcode.NE.value
+_INFIX = Opcode.INFIX.value
+_MINUS = Opcode.MINUS.value
+_NOT = Opcode.NOT.value
+_PREFIX = Opcode.PREFIX.value
+_JUMP = Opcode.JUMP.value
+_JUMP_IF_FALSY = Opcode.JUMP_IF_FALSY.value
+_JUMP_IF_ABRUPT = Opcode.JUMP_IF_ABRUPT.value
+_MAKE_RETURN = Opcode.MAKE_RETURN.value
+_MAKE_FUNCTION = Opcode.MAKE_FUNCTION.value
+_CALL = Opcode.CALL.value
+_RETURN = Opcode.RETURN.value
+
+# Integers, booleans and null are Python ints, bools and None inside the VM:
+# in the constants, the stack, the locals and the values of Return. They
+# are boxed into objects when they leave it (the result of the program,
+# the global enviroment, the arguments of builtins) and for the helpers of
+# lpp.evaluator. NO_VALUE is the value of let statements and empty blocks,
+# None for the evaluator.
+NO_VALUE = object()
+
+# The locals of a call. `parent` is the frame where the function was created,
+# where the names of the enclosing functions live.
+class Frame:
+    __slots__ = ('code', 'locals', 'parent', 'stack', 'ip', 'call_offset')
+
+    def __init__(
+        self,
+        code: CodeObject,
+        locals: list[object],
+        parent: Optional['Frame'],
+        call_offset: int
+    ) -> None:
+        self.code = code
+        self.locals = locals
+        self.parent = parent
+        self.stack: list[object] = []
+        self.ip = 0
+        self.call_offset = call_offset
+
+# The parameters and the body are only needed to inspect the closure, they
+# are taken from the function node then, which for the functions of flat
+# programs is built at that moment (see CodeObject.function).
+class Closure(Function):
+    def __init__(self, env: Enviroment, code: CodeObject, frame: Frame):
+        self.env = env
+        self.scope = None
+        self.code = code
+        self.frame = frame
+
+    def __getattr__(self, name: str) -> object:
+        if name in ['parameters', 'body']:
+            return getattr(self.code.function, name)
+        raise AttributeError(name)
+
+def execute(
+    program: Union[ast.Program, FlatProgram],
+    env: Enviroment
+) -> Optional[Object]:
+    return cast(Optional[Object], _box(run(compile_program(program), env)))
+
+# Calls to closures push a frame instead of recursing, only calls to
+# builtins (and to functions of the tree walker) use the Python stack.
+# Returns an unboxed value.
+def run(code: CodeObject, env: Enviroment) -> object:
+    frame = Frame(code, [], None, -1)
+    frames: list[Frame] = []
+
+    instructions = code.instructions
+    offsets = code.offsets
+    constants = code.constants
+    names = code.names
+    local_values = frame.locals
+    stack = frame.stack
+    ip = 0
+
+    while True:
+        opcode = instructions[ip]
+        argument = instructions[ip + 1]
+        ip += 2
+
+        if opcode == _LOAD_LOCAL:
+            name = names[argument]
+            value = local_values[name.candidates[0][1]]
+            if value is UNSET:
+                value = _lookup(frame, name, env, offsets[(ip >> 1) - 1])
+            stack.append(value)
+
+        elif opcode == _LOAD_CONST:
+            stack.append(constants[argument])
+
+        elif opcode == _LOAD_GLOBAL:
+            stack.append(_global(names[argument].name, env, offsets[(ip >> 1) - 1]))
+
+        elif opcode == _LOAD_NAME:
+            stack.append(_lookup(frame, names[argument], env, offsets[(ip >> 1) - 1]))
+
+        elif opcode == _JUMP_IF_FALSY:
+            condition = stack.pop()
+            assert condition is not NO_VALUE
+            if condition is None or condition is False:
+                ip = argument
+
+        elif opcode == _JUMP_IF_ABRUPT:
+            value = stack[-1]
+            if type(value) is Return or type(value) is Error:
+                ip = argument
+            else:
+                stack.pop()
+
+        elif opcode == _JUMP:
+            ip = argument
+
+        elif opcode == _CALL:
+            args = stack[len(stack) - argument:]
+            del stack[len(stack) - argument:]
+            function = stack.pop()
+            assert function is not NO_VALUE
+            assert NO_VALUE not in args
+
+            if type(function) is not Closure:
+                result = _apply_function(
+                    cast(Object, _box(function)),
+                    [cast(Object, _box(arg)) for arg in args],
+                )
+                stack.append(_unbox(_locate(result, offsets[(ip >> 1) - 1])))
+                continue
+
+            closure = cast(Closure, function)
+            callee = closure.code
+            if not callee.compiled:
+                callee.ensure_compiled()
+
+            call_offset = offsets[(ip >> 1) - 1]
+            frame.ip = ip
+            frames.append(frame)
+            frame = _acquire(callee, closure.frame, call_offset)
+
+            local_values = frame.locals
+            for slot, arg in zip(callee.parameter_slots, args):
+                local_values[slot] = arg
+
+            instructions = callee.instructions
+            offsets = callee.offsets
+            constants = callee.constants
+            names = callee.names
+            stack = frame.stack
+            ip = 0
+
+        elif opcode == _RETURN:
+            value = stack.pop()
+            if type(value) is Return:
+                value = cast(Return, value).value
+            if len(frames) == 0:
+                return value
+
+            assert value is not NO_VALUE
+            if type(value) is Error:
+                value = _locate(cast(Error, value), frame.call_offset)
+
+            _release(frame)
+            frame = frames.pop()
+            instructions = frame.code.instructions
+            offsets = frame.code.offsets
+            constants = frame.code.constants
+            names = frame.code.names
+            local_values = frame.locals
+            stack = frame.stack
+            ip = frame.ip
+
+            stack.append(value)
+
+        elif opcode == _STORE_LOCAL:
+            local_values[argument] = stack.pop()
+
+        elif opcode == _ADD:
+            right = stack.pop()
+            left = stack[-1]
+            if type(left) is int and type(right) is int:
+                stack[-1] = cast(int, left) + cast(int, right)
+            else:
+                stack[-1] = _infix('+', left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _SUB:
+            right = stack.pop()
+            left = stack[-1]
+            if type(left) is int and type(right) is int:
+                stack[-1] = cast(int, left) - cast(int, right)
+            else:
+                stack[-1] = _infix('-', left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _LT:
+            right = stack.pop()
+            left = stack[-1]
+            if type(left) is int and type(right) is int:
+                stack[-1] = cast(int, left) < cast(int, right)
+            else:
+                stack[-1] = _infix('<', left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _GT:
+            right = stack.pop()
+            left = stack[-1]
+            if type(left) is int and type(right) is int:
+                stack[-1] = cast(int, left) > cast(int, right)
+            else:
+                stack[-1] = _infix('>', left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _EQ:
+            right = stack.pop()
+            left = stack[-1]
+            if type(left) is int and type(right) is int:
+                stack[-1] = cast(int, left) == cast(int, right)
+            elif type(left) is bool or left is None:
+                stack[-1] = left is right
+            else:
+                stack[-1] = _infix('==', left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _NE:
+            right = stack.pop()
+            left = stack[-1]
+            if type(left) is int and type(right) is int:
+                stack[-1] = cast(int, left) != cast(int, right)
+            elif type(left) is bool or left is None:
+                stack[-1] = left is not right
+            else:
+                stack[-1] = _infix('!=', left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _MUL:
+            right = stack.pop()
+            left = stack[-1]
+            if type(left) is int and type(right) is int:
+                stack[-1] = cast(int, left) * cast(int, right)
+            else:
+                stack[-1] = _infix('*', left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _DIV:
+            right = stack.pop()
+            left = stack[-1]
+            if type(left) is int and type(right) is int:
+                stack[-1] = cast(int, left) // cast(int, right)
+            else:
+                stack[-1] = _infix('/', left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _INFIX:
+            right = stack.pop()
+            left = stack[-1]
+            operator = cast(str, constants[argument])
+            stack[-1] = _infix(operator, left, right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _MINUS:
+            right = stack[-1]
+            if type(right) is int:
+                stack[-1] = -cast(int, right)
+            else:
+                stack[-1] = _prefix('-', right, offsets[(ip >> 1) - 1])
+
+        elif opcode == _NOT:
+            right = stack[-1]
+            assert right is not NO_VALUE
+            stack[-1] = right is False or right is None
+
+        elif opcode == _PREFIX:
+            operator = cast(str, constants[argument])
+            stack[-1] = _prefix(operator, stack[-1], offsets[(ip >> 1) - 1])
+
+        elif opcode == _MAKE_RETURN:
+            value = stack[-1]
+            assert value is not NO_VALUE
+            stack[-1] = Return(cast(Object, value))
+
+        elif opcode == _MAKE_FUNCTION:
+            stack.append(Closure(env, cast(CodeObject, constants[argument]), frame))
+
+        elif opcode == _STORE_GLOBAL:
+            env[names[argument].name] = _box(stack.pop())
+
+        elif opcode == _LOAD_NONE:
+            stack.append(NO_VALUE)
+
+        else:
+            raise ValueError(f'Instrucción desconocida: {opcode}')
+
+def _acquire(code: CodeObject, parent: Frame, call_offset: int) -> Frame:
+    if len(code.free_frames) == 0:
+        return Frame(code, [UNSET] * code.local_count, parent, call_offset)
+
+    frame = cast(Frame, code.free_frames.pop())
+    frame.parent = parent
+    frame.call_offset = call_offset
+    frame.ip = 0
+
+    return frame
+
+# Only frames of code that creates no closures can be reused, any other
+# frame may be the parent of a closure that outlives the call.
+def _release(frame: Frame) -> None:
+    code = frame.code
+    if code.creates_closures or len(code.free_frames) >= MAX_FREE_FRAMES:
+        return
+
+    frame.locals[:] = code.unset_locals
+    frame.parent = None
+    code.free_frames.append(frame)
+
+def _lookup(frame: Frame, name: Name, env: Enviroment, offset: int) -> object:
+    for depth, slot in name.candidates:
+        scope = frame
+        for _ in range(depth):
+            assert scope.parent is not None
+            scope = scope.parent
+
+        value = scope.locals[slot]
+        if value is not UNSET:
+            return value
+
+    return _global(name.name, env, offset)
+
+def _global(name: str, env: Enviroment, offset: int) -> object:
+    try:
+        return _unbox(env[name])
+    except KeyError:
+        builtin = BUILTINS.get(name)
+        if builtin is not None:
+            return builtin
+        return _locate(_new_error(_UNKNOW_IDENTIFIER, [name]), offset)
+
+def _infix(operator: str, left: object, right: object, offset: int) -> object:
+    assert left is not NO_VALUE
+    assert right is not NO_VALUE
+    result = _evaluate_infix_expression(
+        operator,
+        cast(Object, _box(left)),
+        cast(Object, _box(right)),
+    )
+
+    return _unbox(_locate(result, offset))
+
+def _prefix(operator: str, right: object, offset: int) -> object:
+    assert right is not NO_VALUE
+    result = _evaluate_prefix_expression(operator, cast(Object, _box(right)))
+
+    return _unbox(_locate(result, offset))
+
+def _box(value: object) -> object:
+    value_type = type(value)
+    if value_type is int:
+        return new_integer(cast(int, value))
+    if value_type is bool:
+        return TRUE if value else FALSE
+    if value is None:
+        return NULL
+    if value is NO_VALUE:
+        return None
+    if value_type is Return:
+        return Return(cast(Object, _box(cast(Return, value).value)))
+
+    return value
+
+def _unbox(obj: object) -> object:
+    obj_type = type(obj)
+    if obj_type is Integer:
+        return cast(Integer, obj).value
+    if obj_type is Boolean:
+        return cast(Boolean, obj).value
+    if obj_type is Null:
+        return None
+    if obj is None:
+        return NO_VALUE
+    if obj_type is Return:
+        return Return(cast(Object, _unbox(cast(Return, obj).value)))
+
+    return obj
+
+def _locate(obj: Object, offset: int) -> Object:
+    if type(obj) is Error:
+        obj = cast(Error, obj)
+        if obj.offset is None:
+            obj.offset = offset
+
+    return obj
@@ -1,21 +1,44 @@
 #!/usr/bin/env python
 
-from lpp.lexer import Lexer
-from lpp.parser import Parser
-from lpp.evaluator import evaluate
-from lpp.object import Enviroment
-from sys import argv
+from lpp.cache import parse_file
+from lpp.inference import infer
+from lpp.vm import execute
+from lpp.optimizer import optimize
+from lpp.object import Enviroment, Error
+from lpp.source import SourceMap
+from sys import argv, exit
+
+def _source_map(path: str) -> SourceMap:
+    with open(path, 'r') as f:
+        return SourceMap(f.read())
 
 if __name__ == '__main__':
-    with open(argv[1], 'r') as f:
-        source = f.read()
+    program, errors, error_offsets = parse_file(argv[1])
+
+    if len(errors) > 0:
+        source_map = _source_map(argv[1])
+        for error, offset in zip(errors, error_offsets):
+            print(f'{source_map.describe(offset)}: {error}')
+        exit(1)
 
-    lexer = Lexer(source)
-    parser = Parser(lexer)
-    program = parser.parse_program()
+    # the inference and the optimizer work on the ast nodes, they are built
+    # once from the flat program
+    tree = program.program()
+
+    # errors the program is sure to give if the expressions are evaluated,
+    # it still runs: they may be in a branch that is never taken
+    type_errors = infer(tree)
+    if len(type_errors) > 0:
+        source_map = _source_map(argv[1])
+        for type_error in type_errors:
+            assert type_error.offset is not None
+            print(f'{source_map.describe(type_error.offset)}: {type_error.message}')
 
     env = Enviroment()
-    evaluation = evaluate(program, env)
+    evaluation = execute(optimize(tree), env)
+
+    if isinstance(evaluation, Error) and evaluation.offset is not None:
+        print(f'{_source_map(argv[1]).describe(evaluation.offset)}:')
 
     if evaluation:
         print(evaluation.inspect())
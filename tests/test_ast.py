@@ -8,6 +8,11 @@ from lpp.ast import (
     ReturnStatement,
     Integer,
 )
+from lpp.evaluator import evaluate
+from lpp.flat_ast import FlatProgram, NodeKind
+from lpp.lexer import Lexer
+from lpp.object import Enviroment
+from lpp.parser import Parser
 from lpp.token import (
     Token,
     TokenType
@@ -78,4 +83,28 @@ class ASTTest(TestCase):
         ])
 
 
-        self.assertEqual(str(program), '10')
\ No newline at end of file
+        self.assertEqual(str(program), '10')
+
+    def test_flat_program(self) -> None:
+        source = '''
+            variable suma = procedimiento(x, y) { regresa x + y; };
+            variable z = si (suma(1, 2) > -3) { "mayor" } si_no { !falso };
+            suma(z, 10);
+        '''
+        program = Parser(Lexer(source)).parse_program()
+        flat_program = Parser(Lexer(source)).parse_program(flat=True)
+
+        self.assertIsInstance(flat_program, FlatProgram)
+        self.assertEqual(str(flat_program), str(program))
+        self.assertEqual(len(flat_program.statements), 3)
+        self.assertEqual(flat_program.kinds[flat_program.statements[0]], NodeKind.LET)
+        self.assertEqual(flat_program.pool.count('suma'), 1)
+
+        loaded = FlatProgram.from_bytes(flat_program.to_bytes())
+        self.assertEqual(str(loaded), str(program))
+        self.assertEqual(str(loaded.program()), str(program))
+
+        evaluated = evaluate(loaded, Enviroment())
+        expected = evaluate(program, Enviroment())
+        assert evaluated is not None and expected is not None
+        self.assertEqual(evaluated.inspect(), expected.inspect())
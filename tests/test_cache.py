@@ -0,0 +1,46 @@
+from os import listdir
+from os.path import basename, dirname, exists, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lpp.cache import cache_path_for, parse_file
+from lpp.evaluator import evaluate
+from lpp.object import Enviroment, Integer
+from typing import cast
+
+class CacheTest(TestCase):
+    def test_parse_file_uses_cache(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = join(directory, 'programa.lpp')
+            self._write(path, 'variable doble = procedimiento(x) { x * 2 }; doble(21);')
+
+            parsed = parse_file(path)
+            self.assertEqual(parsed.errors, [])
+            self.assertTrue(exists(cache_path_for(path)))
+            # the temporary file the cache was written to is gone
+            cache_directory = dirname(cache_path_for(path))
+            self.assertEqual(listdir(cache_directory), [basename(cache_path_for(path))])
+
+            cached = parse_file(path)
+            self.assertEqual(str(cached.program), str(parsed.program))
+            evaluated = cast(Integer, evaluate(cached.program, Enviroment()))
+            self.assertEqual(evaluated.value, 42)
+
+            self._write(path, 'variable doble = procedimiento(x) { x * 3 }; doble(21);')
+            evaluated = cast(Integer, evaluate(parse_file(path).program, Enviroment()))
+            self.assertEqual(evaluated.value, 63)
+
+    def test_parse_errors_are_not_cached(self) -> None:
+        with TemporaryDirectory() as directory:
+            path = join(directory, 'programa.lpp')
+            self._write(path, 'variable x 5;')
+
+            parsed = parse_file(path)
+
+            self.assertEqual(len(parsed.errors), 1)
+            self.assertEqual(parsed.error_offsets, [11])
+            self.assertFalse(exists(cache_path_for(path)))
+
+    def _write(self, path: str, source: str) -> None:
+        with open(path, 'w') as f:
+            f.write(source)
@@ -0,0 +1,43 @@
+import lpp.ast as ast
+from lpp.closures import CompiledFunction, execute
+from lpp.lexer import Lexer
+from lpp.object import (
+    Enviroment,
+    Object,
+)
+from lpp.parser import Parser
+from tests import test_evaluator
+
+class ClosuresTest(test_evaluator.EvaluatorTest):
+
+    def test_compiled_function(self) -> None:
+        evaluated = self._evaluate_tests('procedimiento(x) { x + 2; };')
+
+        self.assertIsInstance(evaluated, CompiledFunction)
+
+    def test_same_results_as_evaluate(self) -> None:
+        self._test_same_results_as_evaluate(execute)
+
+    def test_lazy_bodies_are_compiled_when_called(self) -> None:
+        self._test_lazy_bodies_are_parsed_when_called(execute)
+
+    def test_syntax_errors_in_lazy_bodies(self) -> None:
+        program = Parser(
+            Lexer(test_evaluator.LAZY_SYNTAX_ERROR),
+            lazy_functions=True,
+        ).parse_program()
+
+        self._test_lazy_syntax_error(execute(program, Enviroment()))
+
+    def _evaluate_tests(self, source: str) -> Object:
+        evaluated = execute(self._parse(source), Enviroment())
+
+        assert evaluated is not None
+        return evaluated
+
+    def _parse(self, source: str) -> ast.Program:
+        parser = Parser(Lexer(source))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+
+        return program
@@ -2,12 +2,17 @@ from unittest import TestCase
 from typing import (
     cast,
     Any,
+    Callable,
+    Optional,
     Union,
 )
 
+import lpp.ast as ast
 from lpp.lexer import Lexer
 from lpp.parser import Parser
 from lpp.object import (
+    SMALL_INTEGERS,
+    configure_small_integers,
     Enviroment,
     Object,
     Integer,
@@ -21,7 +26,107 @@ from lpp.evaluator import (
     evaluate,
 )
 
-class EvaluatorTest(TestCase):
+# a function whose body is only parsed, and found wrong, when it is called
+LAZY_SYNTAX_ERROR = '''
+    variable f = procedimiento() { si (1 { 2 } };
+    f();
+'''
+
+# programs every engine must run with the same results as evaluate
+PROGRAMS: list[str] = [
+    '''
+        variable fib = procedimiento(n) {
+            si (n < 2) { regresa n; }
+            regresa fib(n - 1) + fib(n - 2);
+        };
+        fib(15);
+    ''',
+    '''
+        variable suma = procedimiento(a) {
+            procedimiento(b) { a + b };
+        };
+        variable mas_dos = suma(2);
+        mas_dos(40) * -1;
+    ''',
+    'variable x = 1 + verdadero; x;',
+    'variable f = procedimiento(x, y) { y }; variable y = 7; f(1);',
+    'si (0) { "cero" } si_no { "otro" };',
+    'si (1 > 2) { 1 };',
+    '!5 == falso;',
+    'verdadero == 1;',
+    '"a" + "b" == "ab";',
+    '5; regresa 10; 9;',
+    'variable f = procedimiento() { si (verdadero) { regresa 3; } 4; }; f() + 1;',
+    '5(1);',
+    'longitud("hola" + " mundo");',
+    'procedimiento() { -"texto"; 1; }();',
+    'variable a = 5;',
+]
+
+Engine = Callable[[ast.Program, Enviroment], Optional[Object]]
+
+# Checks shared by the tests of the other engines and passes, which give
+# them the function that runs a program.
+class EngineTestCase(TestCase):
+    def _test_same_results_as_evaluate(
+        self,
+        execute: Engine,
+        programs: list[str] = PROGRAMS
+    ) -> None:
+        for source in programs:
+            with self.subTest(source=source):
+                expected = evaluate(self._parse_program(source), Enviroment())
+                executed = execute(self._parse_program(source), Enviroment())
+
+                if expected is None:
+                    self.assertIsNone(executed)
+                    continue
+
+                assert executed is not None
+                self.assertEqual(type(executed), type(expected))
+                self.assertEqual(executed.inspect(), expected.inspect())
+                if isinstance(expected, Error):
+                    self.assertEqual(cast(Error, executed).offset, expected.offset)
+
+    def _test_lazy_bodies_are_parsed_when_called(self, execute: Engine) -> None:
+        source = '''
+            variable usada = procedimiento(x) { x * 2 };
+            variable sin_usar = procedimiento() { 1 };
+            usada(21);
+        '''
+        program = Parser(Lexer(source), lazy_functions=True).parse_program()
+        bodies = [
+            cast(ast.Function, cast(ast.LetStatement, statement).value).body
+            for statement in program.statements[:2]
+        ]
+
+        executed = execute(program, Enviroment())
+
+        assert executed is not None
+        self.assertIsInstance(executed, Integer)
+        self.assertEqual(cast(Integer, executed).value, 42)
+        self.assertTrue(cast(ast.Block, bodies[0]).parsed)
+        self.assertFalse(cast(ast.Block, bodies[1]).parsed)
+
+    def _test_lazy_syntax_error(self, evaluated: Optional[Object]) -> None:
+        self.assertIsInstance(evaluated, Error)
+        evaluated = cast(Error, evaluated)
+
+        self.assertEqual(
+            evaluated.message,
+            'Se esperaba que el siguiente token fuera TokenType.RPAREN ' \
+            'pero se obtuvo TokenType.LBRACE',
+        )
+        self.assertEqual(evaluated.offset, LAZY_SYNTAX_ERROR.index('{ 2 }'))
+
+    def _parse_program(self, source: str) -> ast.Program:
+        parser = Parser(Lexer(source))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+
+        return program
+
+class EvaluatorTest(EngineTestCase):
     def test_integer_evaluation(self) -> None:
         tests: list[tuple[str, int]] = [
             ('5', 5),
@@ -167,6 +272,25 @@ class EvaluatorTest(TestCase):
             evaluated = cast(Error, evaluated)
             self.assertEqual(evaluated.message, expected)
 
+    def test_error_offsets(self) -> None:
+        tests: list[tuple[str, int]] = [
+            ('5 + verdadero', 2),
+            ('1;\n  -verdadero;', 5),
+            ('variable f = procedimiento() { foobar; };\nf();', 31),
+            ('longitud(1);', 8),
+            (
+                'variable g = procedimiento() { 1 + verdadero };\n'
+                'variable f = procedimiento() { regresa g(); };\nf();',
+                33,
+            ),
+            ('variable f = procedimiento() { regresa 5(); };\nf();', 40),
+        ]
+        for source, expected in tests:
+            evaluated = self._evaluate_tests(source)
+            self.assertIsInstance(evaluated, Error)
+            evaluated = cast(Error, evaluated)
+            self.assertEqual(evaluated.offset, expected)
+
     def test_assignment_evaluation(self) -> None:
         tests: list[tuple[str, int]] = [
             ('variable a = 5; a;', 5),
@@ -237,6 +361,138 @@ class EvaluatorTest(TestCase):
             evaluated = self._evaluate_tests(source)
             self._test_integer_object(evaluated, expected)
 
+    def test_lazy_function_bodies(self) -> None:
+        source = '''
+            variable fib = procedimiento(n) {
+                si (n < 2) { regresa n; }
+                regresa fib(n - 1) + fib(n - 2);
+            };
+            variable sin_usar = procedimiento() { 1 };
+            fib(10);
+        '''
+        program = Parser(Lexer(source), lazy_functions=True).parse_program()
+        unused = cast(ast.LetStatement, program.statements[1]).value
+        unused_body = cast(ast.Function, unused).body
+        assert unused_body is not None
+
+        evaluated = evaluate(program, Enviroment())
+
+        self._test_integer_object(cast(Object, evaluated), 55)
+        self.assertFalse(unused_body.parsed)
+
+    def test_syntax_errors_in_lazy_bodies(self) -> None:
+        program = Parser(Lexer(LAZY_SYNTAX_ERROR), lazy_functions=True).parse_program()
+
+        self._test_lazy_syntax_error(evaluate(program, Enviroment()))
+
+    def test_frame_reuse(self) -> None:
+        source = '''
+            variable fib = procedimiento(n) {
+                si (n < 2) { regresa n; }
+                regresa fib(n - 1) + fib(n - 2);
+            };
+            variable suma = procedimiento(a) { procedimiento(b) { a + b } };
+            fib(10) + suma(1)(2) + suma(3)(4);
+        '''
+        program = Parser(Lexer(source)).parse_program()
+        evaluated = evaluate(program, Enviroment())
+
+        self._test_integer_object(cast(Object, evaluated), 55 + 3 + 7)
+
+        fib = cast(ast.Function, cast(ast.LetStatement, program.statements[0]).value)
+        suma = cast(ast.Function, cast(ast.LetStatement, program.statements[1]).value)
+        assert fib.scope is not None
+        assert suma.scope is not None
+        self.assertEqual(len(fib.scope.layout.free_frames), 10)
+        self.assertEqual(len(suma.scope.layout.free_frames), 0)
+
+    def test_tail_calls(self) -> None:
+        source = '''
+            variable cuenta = procedimiento(n, total) {
+                si (n == 0) { regresa total; }
+                si (n > 5000) {
+                    regresa cuenta(n - 1, total + 2);
+                } si_no {
+                    regresa cuenta(n - 1, total + 1);
+                }
+            };
+            variable doble = procedimiento(n) { regresa cuenta(n, 0) * 2; };
+            doble(10000);
+        '''
+        program = Parser(Lexer(source)).parse_program()
+        evaluated = evaluate(program, Enviroment())
+
+        self._test_integer_object(cast(Object, evaluated), 30000)
+
+        cuenta = cast(ast.Function, cast(ast.LetStatement, program.statements[0]).value)
+        doble = cast(ast.Function, cast(ast.LetStatement, program.statements[1]).value)
+        assert cuenta.body is not None
+        assert doble.body is not None
+        returns = [
+            node for node in ast.walk(cuenta.body) if type(node) == ast.ReturnStatement
+        ]
+        self.assertEqual(
+            [cast(ast.ReturnStatement, node).tail for node in returns],
+            [False, True, True],
+        )
+        self.assertFalse(cast(ast.ReturnStatement, doble.body.statements[0]).tail)
+
+    def test_small_integers_are_shared(self) -> None:
+        first = self._evaluate_tests('variable a = 100; a + 100 - 100;')
+        second = self._evaluate_tests('50 * 2;')
+
+        self.assertIs(first, second)
+        self.assertIs(first, SMALL_INTEGERS[100])
+
+    def test_literal_objects(self) -> None:
+        program = Parser(Lexer('variable f = procedimiento() { 1000 }; f();')).parse_program()
+        first = evaluate(program, Enviroment())
+        second = evaluate(program, Enviroment())
+
+        self._test_integer_object(cast(Object, first), 1000)
+        self.assertIs(first, second)
+
+        try:
+            configure_small_integers(0, 2000)
+            evaluated = evaluate(Parser(Lexer('1500 + 500;')).parse_program(), Enviroment())
+            self.assertIs(evaluated, SMALL_INTEGERS[2000])
+        finally:
+            configure_small_integers()
+        self.assertNotIn(2000, SMALL_INTEGERS)
+
+    def test_infix_specialization(self) -> None:
+        program = Parser(Lexer('''
+            variable suma = procedimiento(a, b) { a + b };
+            suma(1, 2);
+        ''')).parse_program()
+        env = Enviroment()
+        self._test_integer_object(cast(Object, evaluate(program, env)), 3)
+
+        infix = next(node for node in ast.walk(program) if type(node) == ast.Infix)
+        specialized = cast(ast.Infix, infix).specialized
+        self.assertIsNotNone(specialized)
+
+        tests: list[tuple[str, Union[int, str]]] = [
+            ('suma(40, 2);', 42),
+            ('suma(300, 300);', 600),
+            ('suma("a", "b");', 'ab'),
+            ('suma(2, 3);', 5),
+            ('suma(verdadero, 1);', 'Discrepancia de tipos: BOOLEAN + INTEGER'),
+        ]
+        for source, expected in tests:
+            evaluated = evaluate(Parser(Lexer(source)).parse_program(), env)
+            assert evaluated is not None
+            if type(expected) == int:
+                self._test_integer_object(evaluated, cast(int, expected))
+            elif type(evaluated) == String:
+                self._test_string_object(evaluated, cast(str, expected))
+            else:
+                self._test_error_object(evaluated, cast(str, expected))
+
+        # operands of other types send the node back to the generic path
+        self.assertIsNotNone(cast(ast.Infix, infix).specialized)
+        self.assertIsNot(cast(ast.Infix, infix).specialized, specialized)
+
     def test_string_evaluation(self) -> None:
         tests: list[tuple[str, str]] = [
             ('"Hola";', 'Hola'),
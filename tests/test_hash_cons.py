@@ -0,0 +1,138 @@
+from typing import cast
+from unittest import TestCase
+
+import lpp.ast as ast
+from lpp.evaluator import evaluate
+from lpp.hash_cons import HashConser, hash_cons
+from lpp.lexer import Lexer
+from lpp.object import (
+    Enviroment,
+    Error,
+)
+from lpp.parser import IterativeParser, Parser
+
+class HashConsTest(TestCase):
+
+    def test_equal_subtrees_are_shared(self) -> None:
+        program = hash_cons(self._parse('(a + 1) * 2; (a + 1) * 3; 1;'))
+
+        first = self._expression(program, 0)
+        second = self._expression(program, 1)
+        third = self._expression(program, 2)
+
+        assert isinstance(first, ast.Infix)
+        assert isinstance(second, ast.Infix)
+        assert isinstance(first.left, ast.Infix)
+        assert isinstance(second.left, ast.Infix)
+        self.assertIs(first.left.right, second.left.right)
+        self.assertIs(first.left.right, third)
+        self.assertIsNot(first.left, second.left)
+        self.assertEqual(str(program), '((a + 1) * 2)((a + 1) * 3)1')
+
+    def test_equal_statements_are_shared(self) -> None:
+        program = hash_cons(self._parse('''
+            si (verdadero) { regresa 1; };
+            si (verdadero) { regresa 1; };
+            si (falso) { regresa 1; };
+        '''))
+
+        self.assertIs(program.statements[0], program.statements[1])
+        self.assertIsNot(program.statements[0], program.statements[2])
+
+    def test_errors_point_to_their_occurrence(self) -> None:
+        source = 'variable a = "a"; si (falso) { a - 1 }; a - 1;'
+        program = hash_cons(self._parse(source))
+
+        evaluated = evaluate(program, Enviroment())
+
+        self.assertIsInstance(evaluated, Error)
+        self.assertEqual(cast(Error, evaluated).offset, source.rindex('-'))
+
+    def test_equal_subtrees_of_different_programs(self) -> None:
+        conser = HashConser()
+        first = hash_cons(self._parse('variable a = 1; a + 1;'), conser)
+        second = hash_cons(self._parse('variable b = 2; a + 1;'), conser)
+
+        self.assertIs(self._expression(first, 1), self._expression(second, 1))
+
+    def test_different_literal_types_are_not_shared(self) -> None:
+        program = hash_cons(self._parse('1; "1"; verdadero; 1 == 1; verdadero == 1;'))
+
+        values = [self._expression(program, i) for i in range(3)]
+        self.assertEqual(len({id(value) for value in values}), 3)
+        self.assertIsNot(self._expression(program, 3), self._expression(program, 4))
+
+    def test_structural_hash(self) -> None:
+        conser = HashConser()
+        other_conser = HashConser()
+        first = hash_cons(self._parse('f(1, x + 2);'), conser)
+        second = hash_cons(self._parse('f(1, x + 2);'), other_conser)
+        third = hash_cons(self._parse('f(1, x + 3);'), conser)
+
+        first_call = self._expression(first, 0)
+        second_call = self._expression(second, 0)
+        third_call = self._expression(third, 0)
+        first_hash = conser.structural_hash(first_call)
+
+        self.assertIsNotNone(first_hash)
+        self.assertIsNot(first_call, second_call)
+        self.assertEqual(first_hash, other_conser.structural_hash(second_call))
+        self.assertNotEqual(first_hash, conser.structural_hash(third_call))
+        self.assertIsNone(other_conser.structural_hash(third_call))
+
+        assert isinstance(first_call, ast.Call)
+        assert isinstance(third_call, ast.Call)
+        self.assertIs(first_call.function, third_call.function)
+        self.assertIs(first_call.arguments[0], third_call.arguments[0])
+
+    def test_lazy_bodies_are_not_parsed(self) -> None:
+        parser = Parser(
+            Lexer('variable f = procedimiento(x) { x * x }; f(3);'),
+            lazy_functions=True,
+        )
+        program = hash_cons(parser.parse_program())
+
+        let_statement = cast(ast.LetStatement, program.statements[0])
+        function = cast(ast.Function, let_statement.value)
+        assert function.body is not None
+        self.assertFalse(function.body.parsed)
+        evaluated = evaluate(program, Enviroment())
+        assert evaluated is not None
+        self.assertEqual(evaluated.inspect(), '9')
+
+    def test_evaluation_is_unchanged(self) -> None:
+        source = '''
+            variable fib = procedimiento(n) {
+                si (n < 2) { regresa n; }
+                regresa fib(n - 1) + fib(n - 2);
+            };
+            variable a = fib(10) + fib(10);
+            variable b = procedimiento(n) { regresa n + 1; }(fib(10));
+            a * b;
+        '''
+        expected = evaluate(self._parse(source), Enviroment())
+        evaluated = evaluate(hash_cons(self._parse(source)), Enviroment())
+
+        assert expected is not None
+        assert evaluated is not None
+        self.assertEqual(evaluated.inspect(), expected.inspect())
+
+    def test_deeply_nested_program(self) -> None:
+        depth = 5000
+        source = '(' * depth + '1' + ')' * depth + ' + 1;'
+        program = hash_cons(IterativeParser(Lexer(source)).parse_program())
+
+        self.assertEqual(len(program.statements), 1)
+
+    def _parse(self, source: str) -> ast.Program:
+        parser = Parser(Lexer(source))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+
+        return program
+
+    def _expression(self, program: ast.Program, index: int) -> ast.Expression:
+        statement = cast(ast.ExpressionStatement, program.statements[index])
+        assert statement.expression is not None
+
+        return statement.expression
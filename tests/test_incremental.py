@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+from lpp.ast import Program, walk
+from lpp.incremental import TextEdit, apply_edit, reparse
+from lpp.lexer import Lexer
+from lpp.parser import Parser
+
+SOURCE = '''variable a = 1;
+variable suma = procedimiento(x, y) {
+    regresa x + y;
+};
+5;
+-3;
+variable b = suma(a, 2);
+"texto";
+b * 2;
+'''
+
+class IncrementalTest(TestCase):
+    def test_reparse_matches_full_parse(self) -> None:
+        body = SOURCE.index('x + y') + len('x + y')
+        semicolon = SOURCE.index('5;') + 1
+        name = SOURCE.index('b = suma') + 1
+        string = SOURCE.index('"texto"')
+        edits: list[TextEdit] = [
+            TextEdit(13, 14, '42'),
+            TextEdit(0, 0, 'variable z = 0;\n'),
+            TextEdit(body, body, ' * 10'),
+            TextEdit(len(SOURCE), len(SOURCE), 'suma(b, 1);'),
+            TextEdit(semicolon, semicolon + 1, ''), # 5 and -3 become 5 - 3
+            TextEdit(name, name, 'x'),
+            TextEdit(string, string + len('"texto"'), '"otro texto"'),
+            TextEdit(0, len(SOURCE), 'si (verdadero) { 1 }'),
+        ]
+        for edit in edits:
+            program = Parser(Lexer(SOURCE)).parse_program()
+            new_source = apply_edit(SOURCE, edit)
+            expected = Parser(Lexer(new_source)).parse_program()
+
+            result = reparse(program, SOURCE, edit)
+
+            self.assertEqual(result.source, new_source)
+            self.assertEqual(str(result.program), str(expected))
+            self.assertEqual(self._offsets(result.program), self._offsets(expected))
+
+    def test_statements_without_semicolon_before_the_edit(self) -> None:
+        source = 'variable a = 1;\na !x;\n'
+        edit = TextEdit(19, 19, '=')
+        program = Parser(Lexer(source)).parse_program()
+        parser = Parser(Lexer(apply_edit(source, edit)))
+        expected = parser.parse_program()
+
+        result = reparse(program, source, edit)
+
+        self.assertEqual(str(result.program), str(expected))
+        self.assertEqual(str(result.program), 'variable a = 1;(a != x)')
+        self.assertEqual(self._offsets(result.program), self._offsets(expected))
+        self.assertEqual(result.errors, parser.errors)
+
+    def test_reparse_reuses_untouched_statements(self) -> None:
+        program = Parser(Lexer(SOURCE)).parse_program()
+        reused_statement = program.statements[-1]
+
+        result = reparse(program, SOURCE, TextEdit(13, 14, '42'))
+
+        self.assertEqual(result.parsed, 1)
+        self.assertEqual(result.reused, len(program.statements) - 1)
+        self.assertIs(result.program.statements[-1], reused_statement)
+        self.assertEqual(reused_statement.offset, SOURCE.index('b * 2') + 1)
+        self.assertEqual(len(result.errors), 0)
+
+    def _offsets(self, program: Program) -> list[int]:
+        return [getattr(node, 'offset') for node in walk(program)]
@@ -0,0 +1,161 @@
+from typing import (
+    Optional,
+    cast,
+)
+
+import lpp.ast as ast
+from lpp.evaluator import (
+    FALSE,
+    evaluate,
+)
+from lpp.hash_cons import HashConser, hash_cons
+from lpp.inference import infer
+from lpp.lexer import Lexer
+from lpp.object import (
+    Enviroment,
+    Error,
+    Integer,
+    Object,
+    ObjectType,
+    String,
+)
+from lpp.parser import Parser
+from tests.test_evaluator import EngineTestCase
+
+INTEGERS = (ObjectType.INTEGER, ObjectType.INTEGER)
+
+class InferenceTest(EngineTestCase):
+
+    def test_proven_types(self) -> None:
+        tests: list[tuple[str, list[tuple[ObjectType, ...]]]] = [
+            ('1 + 2 * 3;', [INTEGERS, INTEGERS]),
+            ('-5 < 10;', [INTEGERS, (ObjectType.INTEGER,)]),
+            ('"a" + "b" == "ab";', [
+                (ObjectType.STRING, ObjectType.STRING),
+                (ObjectType.STRING, ObjectType.STRING),
+            ]),
+            ('variable a = 5; variable b = a * 2; b - a;', [INTEGERS, INTEGERS]),
+            ('!(1 < 2) == falso;', [
+                (ObjectType.BOOLEAN, ObjectType.BOOLEAN),
+                (ObjectType.BOOLEAN,),
+                INTEGERS,
+            ]),
+            ('variable f = procedimiento(x) { variable y = 1; y + 1 }; f == f;', [
+                INTEGERS,
+                (ObjectType.FUNCTION, ObjectType.FUNCTION),
+            ]),
+        ]
+        for source, expected in tests:
+            with self.subTest(source=source):
+                program = self._parse(source)
+                self.assertEqual(infer(program), [])
+                self.assertEqual(self._proven_types(program), expected)
+
+    def test_unknown_types(self) -> None:
+        tests: list[str] = [
+            'x + 1;',
+            'procedimiento(n) { n - 1 };',
+            'variable f = procedimiento() { 1 }; f() * 2;',
+            'variable a = 1; si (verdadero) { variable a = "a"; } a + 1;',
+            'variable a = 1; procedimiento() { a + 1 };',
+        ]
+        for source in tests:
+            with self.subTest(source=source):
+                program = self._parse(source)
+                self.assertEqual(infer(program), [])
+                self.assertEqual(self._proven_types(program)[-1], ())
+
+    def test_type_errors(self) -> None:
+        tests: list[tuple[str, str]] = [
+            ('1 + verdadero;', 'Discrepancia de tipos: INTEGER + BOOLEAN'),
+            ('variable a = "a"; a - 1;', 'Discrepancia de tipos: STRING - INTEGER'),
+            ('variable a = 2 * 3; a + "a";', 'Discrepancia de tipos: INTEGER + STRING'),
+            ('-"texto";', 'Operador desconocido: -STRING'),
+            ('verdadero < falso;', 'Operador desconocido: BOOLEAN < BOOLEAN'),
+            ('"a" * "b";', 'Operador desconocido: STRING * STRING'),
+            ('procedimiento(x) { x } + 1;', 'Discrepancia de tipos: FUNCTION + INTEGER'),
+        ]
+        for source, expected in tests:
+            with self.subTest(source=source):
+                program = self._parse(source)
+                errors = infer(program)
+                evaluated = evaluate(program, Enviroment())
+
+                self.assertEqual([error.message for error in errors], [expected])
+                self.assertIsInstance(evaluated, Error)
+                evaluated = cast(Error, evaluated)
+                self.assertEqual(evaluated.message, expected)
+                self.assertEqual(errors[0].offset, evaluated.offset)
+
+    def test_errors_in_branches_that_may_not_run(self) -> None:
+        program = self._parse('si (x) { 1 + "a" + 2; } si_no { 2 };')
+        errors = infer(program)
+
+        # the expressions over an error are not reported again
+        self.assertEqual([error.message for error in errors], [
+            'Discrepancia de tipos: INTEGER + STRING',
+        ])
+        env = Enviroment()
+        env['x'] = FALSE
+        self.assertIsInstance(evaluate(program, env), Integer)
+
+    def test_equal_expressions_in_different_contexts(self) -> None:
+        program = hash_cons(self._parse('''
+            variable x = 1;
+            variable a = x + 1;
+            variable f = procedimiento(x) { x + 1 };
+            f("b");
+        '''))
+        infer(program)
+
+        # at different offsets they are not shared, each keeps its proof
+        self.assertEqual(self._proven_types(program), [INTEGERS, ()])
+        evaluated = evaluate(program, Enviroment())
+        self.assertIsInstance(evaluated, Error)
+        self.assertEqual(
+            cast(Error, evaluated).message,
+            'Discrepancia de tipos: STRING + INTEGER'
+        )
+
+    def test_nodes_shared_between_programs(self) -> None:
+        conser = HashConser()
+        tests: list[tuple[str, str]] = [
+            # the values have the same length, x + x is at the same offset
+            ('variable x = 100; x + x;', '200'),
+            ('variable x = "a"; x + x;', '"aa"'),
+            ('variable x = 200; x + x;', '400'),
+        ]
+        for source, expected in tests:
+            program = hash_cons(self._parse(source), conser)
+            infer(program)
+            evaluated = evaluate(program, Enviroment())
+
+            assert evaluated is not None
+            self.assertEqual(evaluated.inspect(), expected)
+            self.assertEqual(type(evaluated), String if expected == '"aa"' else Integer)
+
+        self.assertEqual(self._proven_types(program), [()])
+
+    def test_same_results_as_evaluate(self) -> None:
+        self._test_same_results_as_evaluate(_infer_and_evaluate)
+
+    def _proven_types(self, program: ast.Program) -> list[tuple[ObjectType, ...]]:
+        proven: list[tuple[ObjectType, ...]] = []
+        for node in ast.walk(program):
+            if type(node) in [ast.Infix, ast.Prefix]:
+                types = cast(ast.Infix, node).proven_types
+                assert types is not None
+                proven.append(types)
+
+        return proven
+
+    def _parse(self, source: str) -> ast.Program:
+        parser = Parser(Lexer(source))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+
+        return program
+
+def _infer_and_evaluate(program: ast.Program, env: Enviroment) -> Optional[Object]:
+    infer(program)
+    return evaluate(program, env)
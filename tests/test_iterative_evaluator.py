@@ -0,0 +1,55 @@
+import lpp.ast as ast
+from lpp.iterative_evaluator import execute
+from lpp.lexer import Lexer
+from lpp.object import (
+    Enviroment,
+    Object,
+)
+from lpp.parser import Parser
+from tests import test_evaluator
+
+class IterativeEvaluatorTest(test_evaluator.EvaluatorTest):
+
+    def test_same_results_as_evaluate(self) -> None:
+        self._test_same_results_as_evaluate(execute)
+
+    def test_deep_recursion(self) -> None:
+        source = '''
+            variable cuenta = procedimiento(n) {
+                si (n == 0) { regresa 0; }
+                regresa 1 + cuenta(n - 1);
+            };
+            variable pares = procedimiento(n) {
+                si (n == 0) { regresa verdadero; }
+                regresa !impares(n - 1) == falso;
+            };
+            variable impares = procedimiento(n) {
+                si (n == 0) { regresa falso; }
+                regresa !pares(n - 1) == falso;
+            };
+            si (pares(10000)) { cuenta(20000) } si_no { 0 };
+        '''
+        evaluated = self._evaluate_tests(source)
+
+        self._test_integer_object(evaluated, 20000)
+
+    def test_syntax_errors_in_lazy_bodies(self) -> None:
+        program = Parser(
+            Lexer(test_evaluator.LAZY_SYNTAX_ERROR),
+            lazy_functions=True,
+        ).parse_program()
+
+        self._test_lazy_syntax_error(execute(program, Enviroment()))
+
+    def _evaluate_tests(self, source: str) -> Object:
+        evaluated = execute(self._parse(source), Enviroment())
+
+        assert evaluated is not None
+        return evaluated
+
+    def _parse(self, source: str) -> ast.Program:
+        parser = Parser(Lexer(source))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+
+        return program
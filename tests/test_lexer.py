@@ -1,6 +1,16 @@
+from io import BytesIO, StringIO
+from mmap import mmap, ACCESS_READ
+from tempfile import TemporaryFile
 from unittest import TestCase
-from lpp.token import Token, TokenType
-from lpp.lexer import Lexer
+from lpp.token import SymbolTable, Token, TokenType
+from lpp.lexer import (
+    LegacyLexer,
+    Lexer,
+    StreamLexer,
+    TokenSource,
+    lex_parallel,
+    tokenize,
+)
 
 class LexerTest(TestCase):
     def test_ilegal(self) -> None:
@@ -224,3 +234,119 @@ class LexerTest(TestCase):
             Token(TokenType.SEMICOLON, ';'),
         ]
         self.assertEqual(tokens, expected_tokens)
+
+    def test_legacy_lexer_equivalence(self) -> None:
+        source = '''
+            variable año_1 = procedimiento(x, y) {
+                si (x == y) { regresa "igual"; } si_no { regresa x != y; }
+            };
+            año_1(5, -10) * 2 / 3 < 4 > 1; !verdadero; falso;
+            ¡@ 12abc "texto
+            con salto" "sin cerrar
+        '''
+        lexer = Lexer(source)
+        legacy_lexer = LegacyLexer(source)
+
+        tokens: list[Token] = []
+        legacy_tokens: list[Token] = []
+        while True:
+            tokens.append(lexer.next_token())
+            legacy_tokens.append(legacy_lexer.next_token())
+            if tokens[-1].token_type == TokenType.EOF:
+                break
+
+        self.assertEqual(tokens, legacy_tokens)
+        self.assertEqual(lexer.next_token(), Token(TokenType.EOF, ''))
+
+    def test_tokenize(self) -> None:
+        source = 'variable cinco = "5"; cinco != 5;  '
+        stream = tokenize(source)
+
+        expected_tokens: list[Token] = [
+            Token(TokenType.LET, 'variable'),
+            Token(TokenType.IDENT, 'cinco'),
+            Token(TokenType.ASSIGN, '='),
+            Token(TokenType.STRING, '5'),
+            Token(TokenType.SEMICOLON, ';'),
+            Token(TokenType.IDENT, 'cinco'),
+            Token(TokenType.NOT_EQ, '!='),
+            Token(TokenType.INT, '5'),
+            Token(TokenType.SEMICOLON, ';'),
+            Token(TokenType.EOF, ''),
+        ]
+        self.assertEqual(list(stream), expected_tokens)
+        self.assertEqual(stream.token_type(3), TokenType.STRING)
+        self.assertEqual(stream.literal(1), 'cinco')
+        self.assertEqual((stream.starts[3], stream.ends[3]), (18, 19))
+        self.assertEqual(stream.offset(3), 17)
+
+    def test_stream_lexer_chunk_boundaries(self) -> None:
+        source = '''
+            variable año = "cadena larga con ñ";
+            si (año == 10) { regresa año != 100000; }
+        '''
+        expected_tokens = self._read_all(Lexer(source))
+
+        for chunk_size in range(1, 12):
+            text_lexer = StreamLexer(StringIO(source), chunk_size=chunk_size)
+            tokens = self._read_all(text_lexer)
+            self.assertEqual(tokens, expected_tokens)
+            self.assertEqual(
+                [t.offset for t in tokens],
+                [t.offset for t in expected_tokens],
+            )
+
+            binary_source = BytesIO(source.encode('utf-8'))
+            binary_lexer = StreamLexer(binary_source, chunk_size=chunk_size)
+            self.assertEqual(self._read_all(binary_lexer), expected_tokens)
+
+    def test_stream_lexer_mmap(self) -> None:
+        source = 'variable x = "ñandú"; x == "ñandú";'
+        with TemporaryFile() as f:
+            f.write(source.encode('utf-8'))
+            f.flush()
+            with mmap(f.fileno(), 0, access=ACCESS_READ) as mapped:
+                tokens = self._read_all(StreamLexer(mapped, chunk_size=3))
+
+        self.assertEqual(tokens, self._read_all(Lexer(source)))
+
+    def test_identifier_interning(self) -> None:
+        source = 'variable contador = contador + otro; contador;'
+        symbols = SymbolTable()
+        tokens = self._read_all(Lexer(source, symbols))
+
+        identifiers = [t.literal for t in tokens if t.token_type == TokenType.IDENT]
+        self.assertEqual(identifiers, ['contador', 'contador', 'otro', 'contador'])
+        self.assertIs(identifiers[0], identifiers[1])
+        self.assertIs(identifiers[0], identifiers[3])
+        self.assertIs(tokenize(source, symbols).literal(1), identifiers[0])
+
+        self.assertEqual(len(symbols), 2)
+        self.assertEqual(symbols.symbol_id('contador'), 0)
+        self.assertEqual(symbols.symbol_id('otro'), 1)
+        self.assertEqual(symbols.name(1), 'otro')
+        self.assertEqual(symbols.lookup('si_no'), (TokenType.ELSE, 'si_no'))
+
+    def test_lex_parallel(self) -> None:
+        source = '''
+            variable texto = "una cadena
+            con saltos de línea
+            dentro";
+            variable suma = procedimiento(x, y) { regresa x + y; };
+            suma(1, 2) == 3;
+        ''' * 5
+        expected = tokenize(source)
+
+        stream = lex_parallel(source, workers=3, min_chunk_size=1)
+
+        self.assertEqual(stream.types, expected.types)
+        self.assertEqual(stream.starts, expected.starts)
+        self.assertEqual(stream.ends, expected.ends)
+        self.assertEqual(list(stream), list(expected))
+
+    def _read_all(self, lexer: TokenSource) -> list[Token]:
+        tokens: list[Token] = []
+        while not tokens or tokens[-1].token_type != TokenType.EOF:
+            tokens.append(lexer.next_token())
+
+        return tokens
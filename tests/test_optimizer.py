@@ -0,0 +1,168 @@
+from typing import cast
+
+import lpp.ast as ast
+from lpp.evaluator import evaluate
+from lpp.hash_cons import hash_cons
+from lpp.lexer import Lexer
+from lpp.object import (
+    Enviroment,
+    Error,
+)
+from lpp.optimizer import count_nodes, optimize
+from lpp.parser import Parser
+from tests.test_evaluator import (
+    LAZY_SYNTAX_ERROR,
+    EngineTestCase,
+)
+
+class OptimizerTest(EngineTestCase):
+
+    def test_constant_folding(self) -> None:
+        tests: list[tuple[str, str]] = [
+            ('2 * 60 * 60;', '7200'),
+            ('-(5 - 8) + x;', '(3 + x)'),
+            ('"Hola" + " " + "mundo";', 'Hola mundo'),
+            ('!(1 < 2) == falso;', 'verdadero'),
+            ('1 == verdadero;', 'falso'),
+            ('f(1 + 1, 2 * x);', 'f(2, (2 * x))'),
+            ('7 / 2 / 0;', '(3 / 0)'),
+        ]
+        for source, expected in tests:
+            with self.subTest(source=source):
+                self.assertEqual(str(optimize(self._parse(source))), expected)
+
+    def test_errors_are_not_folded(self) -> None:
+        for source in ['1 + verdadero * 2;', '-"texto";', 'verdadero < falso;']:
+            with self.subTest(source=source):
+                program = self._parse(source)
+                optimized = optimize(program)
+                expected = evaluate(program, Enviroment())
+                evaluated = evaluate(optimized, Enviroment())
+
+                self.assertEqual(str(optimized), str(program))
+                self.assertIsInstance(evaluated, Error)
+                self.assertEqual(cast(Error, evaluated).message, cast(Error, expected).message)
+                self.assertEqual(cast(Error, evaluated).offset, cast(Error, expected).offset)
+
+    def test_dead_branches(self) -> None:
+        tests: list[tuple[str, str]] = [
+            ('si (verdadero) { 1 } si_no { 2 };', '1'),
+            ('si (2 > 3) { 1 } si_no { x };', 'x'),
+            ('si (0) { variable a = 1; a } si_no { 2 };', 'variable a = 1;a'),
+            ('variable y = si (falso) { 1 };', 'variable y = si falso ;'),
+            ('si (falso) { 1 }; x;', 'x'),
+            ('procedimiento() { si ("a" == "a") { regresa 1; } 2; };', 'procedimiento() regresa 1;'),
+        ]
+        for source, expected in tests:
+            with self.subTest(source=source):
+                self.assertEqual(str(optimize(self._parse(source))), expected)
+
+    def test_unreachable_statements(self) -> None:
+        program = self._parse('''
+            variable f = procedimiento(x) {
+                regresa x * 2;
+                variable y = x;
+                y;
+            };
+            5;
+            "cadena";
+            f(4);
+        ''')
+        optimized = optimize(program, inline_functions=False)
+
+        self.assertEqual(str(optimized), 'variable f = procedimiento(x) regresa (x * 2);;f(4)')
+        self.assertEqual(count_nodes(program), 23)
+        self.assertEqual(count_nodes(optimized), 14)
+
+    def test_inlining(self) -> None:
+        tests: list[tuple[str, str]] = [
+            (
+                'variable doble = procedimiento(x) { regresa x * 2; }; doble(a) + doble(3);',
+                'variable doble = procedimiento(x) regresa (x * 2);;((a * 2) + 6)',
+            ),
+            (
+                'variable f = procedimiento(x, y) { x - y }; f(g(1), g(2));',
+                'variable f = procedimiento(x,  y) (x - y);(g(1) - g(2))',
+            ),
+            (
+                'variable f = procedimiento(a) { a * 2 }; variable g = procedimiento(b) { f(b) + 1 }; g(c);',
+                'variable f = procedimiento(a) (a * 2);variable g = procedimiento(b) ((b * 2) + 1);((c * 2) + 1)',
+            ),
+        ]
+        for source, expected in tests:
+            with self.subTest(source=source):
+                self.assertEqual(str(optimize(self._parse(source))), expected)
+
+    def test_functions_that_are_not_inlined(self) -> None:
+        sources = [
+            # recursive
+            'variable f = procedimiento(n) { f(n - 1) }; f(1);',
+            # captures a global
+            'variable k = 2; variable f = procedimiento(n) { n * k }; f(1);',
+            # bound more than once
+            'variable f = procedimiento(n) { n * 2 }; variable f = 3; f(1);',
+            'variable f = procedimiento(n) { n * 2 }; procedimiento(f) { f(1) };',
+            # called before it is bound, or with a different number of arguments
+            'variable g = procedimiento() { f(1) }; variable f = procedimiento(n) { n * 2 }; g();',
+            'variable f = procedimiento(n) { n * 2 }; f(1, 2);',
+            # more than one statement, or statements inside an if
+            'variable f = procedimiento(n) { variable m = n; m }; f(1);',
+            'variable f = procedimiento(n) { si (n) { regresa 1; } }; f(1);',
+            # arguments evaluated more than once, or after a call
+            'variable f = procedimiento(n) { n * n }; f(g(1));',
+            'variable f = procedimiento(x, y) { y - x }; f(g(1), g(2));',
+            'variable f = procedimiento(x) { imprime("a") + x }; f(g(1));',
+        ]
+        for source in sources:
+            with self.subTest(source=source):
+                program = self._parse(source)
+                optimized = optimize(program)
+                calls = [node for node in ast.walk(optimized) if type(node) == ast.Call]
+                self.assertEqual(len(calls), sum(
+                    1 for node in ast.walk(program) if type(node) == ast.Call
+                ))
+
+    def test_same_results_as_evaluate(self) -> None:
+        self._test_same_results_as_evaluate(
+            lambda program, env: evaluate(optimize(program), env)
+        )
+
+    def test_shared_nodes_are_not_modified(self) -> None:
+        program = hash_cons(self._parse('(1 + 2) * x; (1 + 2) * x;'))
+        source = str(program)
+
+        optimized = optimize(program)
+
+        self.assertEqual(str(optimized), '(3 * x)(3 * x)')
+        self.assertEqual(str(program), source)
+
+    def test_lazy_bodies(self) -> None:
+        parser = Parser(
+            Lexer('variable f = procedimiento() { 2 * 3 }; variable g = procedimiento() { 1 }; f();'),
+            lazy_functions=True,
+        )
+        optimized = optimize(parser.parse_program())
+        bodies = [
+            cast(ast.Function, cast(ast.LetStatement, statement).value).body
+            for statement in optimized.statements[:2]
+        ]
+
+        evaluated = evaluate(optimized, Enviroment())
+        assert evaluated is not None
+        self.assertEqual(evaluated.inspect(), '6')
+        self.assertTrue(cast(ast.Block, bodies[0]).parsed)
+        self.assertFalse(cast(ast.Block, bodies[1]).parsed)
+        self.assertEqual(str(bodies[0]), '6')
+
+    def test_syntax_errors_in_lazy_bodies(self) -> None:
+        parser = Parser(Lexer(LAZY_SYNTAX_ERROR), lazy_functions=True)
+        optimized = optimize(parser.parse_program())
+
+        self._test_lazy_syntax_error(evaluate(optimized, Enviroment()))
+
+    def _parse(self, source: str) -> ast.Program:
+        parser = Parser(Lexer(source))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+
+        return program
@@ -1,6 +1,7 @@
 from unittest import TestCase
-from lpp.lexer import Lexer
-from lpp.parser import Parser
+from lpp.lexer import Lexer, tokenize
+from lpp.parser import IterativeParser, Parser
+from lpp.source import SourceMap
 from lpp.ast import (
     Expression,
     Identifier,
@@ -100,6 +101,139 @@ class ParserTest(TestCase):
 
         self.assertEqual(len(parser.errors), 1)
 
+    def test_parse_error_positions(self) -> None:
+        source = 'variable x = 1;\nvariable y 5;\n  variable = 3;'
+        parser = Parser(Lexer(source))
+
+        parser.parse_program()
+
+        source_map = SourceMap(source)
+        positions = [source_map.line_column(o) for o in parser.error_offsets]
+        self.assertEqual(len(parser.errors), len(parser.error_offsets))
+        self.assertEqual(positions[:2], [(2, 12), (3, 12)])
+
+    def test_node_offsets(self) -> None:
+        source = 'variable x = 1;\n  x + "a";'
+        program = Parser(Lexer(source)).parse_program()
+
+        statement = cast(ExpressionStatement, program.statements[1])
+        infix = cast(Infix, statement.expression)
+        self.assertEqual(program.statements[0].offset, 0)
+        self.assertEqual(statement.offset, 18)
+        self.assertEqual(infix.offset, 20)
+        self.assertEqual(cast(Expression, infix.right).offset, 22)
+
+    def test_parse_without_tokens(self) -> None:
+        source = '''
+            variable suma = procedimiento(x, y) { regresa x + y; };
+            si (suma(1, -2) > 0) { verdadero } si_no { "no" };
+        '''
+        expected_program = Parser(Lexer(source)).parse_program()
+
+        parser = Parser(Lexer(source), retain_tokens=False)
+        program = parser.parse_program()
+
+        self.assertEqual(len(parser.errors), 0)
+        self.assertEqual(str(program), str(expected_program))
+        self.assertEqual(program.token_literal(), 'variable')
+
+        let_statement = cast(LetStatement, program.statements[0])
+        self.assertIsNone(let_statement.token)
+        self.assertEqual(let_statement.offset, 13)
+        self.assertFalse(hasattr(let_statement, '__dict__'))
+
+    def test_lazy_function_bodies(self) -> None:
+        source = '''
+            variable usada = procedimiento(x) {
+                variable doble = procedimiento(y) { y * 2 };
+                regresa doble(x) + 1;
+            };
+            variable sin_usar = procedimiento() { si (1 { 2 } };
+            usada(5);
+        '''
+        expected_program = Parser(Lexer(source)).parse_program()
+
+        parsers = [
+            Parser(Lexer(source), lazy_functions=True),
+            IterativeParser(Lexer(source), lazy_functions=True),
+            Parser(tokenize(source), lazy_functions=True),
+        ]
+        for parser in parsers:
+            program = parser.parse_program()
+            self.assertEqual(len(parser.errors), 0)
+
+            functions = [
+                cast(Function, cast(LetStatement, s).value)
+                for s in program.statements[:2]
+            ]
+            bodies = [cast(Block, f.body) for f in functions]
+            self.assertFalse(bodies[0].parsed)
+            self.assertFalse(bodies[1].parsed)
+
+            self.assertEqual(str(bodies[0]), str(cast(Function, cast(
+                LetStatement,
+                expected_program.statements[0],
+            ).value).body))
+            self.assertTrue(bodies[0].parsed)
+            self.assertEqual(len(parser.errors), 0)
+
+            # the errors of a body parsed later are kept in the body
+            bodies[1].statements
+            self.assertEqual(len(parser.errors), 0)
+            self.assertEqual(bodies[1].parse_error, (
+                'Se esperaba que el siguiente token fuera TokenType.RPAREN ' \
+                'pero se obtuvo TokenType.LBRACE',
+                source.index('{ 2 }'),
+            ))
+
+    def test_iterative_parser(self) -> None:
+        sources = [
+            '''
+                variable suma = procedimiento(x, y) { regresa x + y; };
+                variable z = si (suma(1, 2) > -3) { "mayor" } si_no { !falso };
+                suma(z, 10) * (2 + -z) / suma();
+                procedimiento() { 1 }();
+            ''',
+            'variable x 5; regresa; si (x { 1 }; suma(1, 2;',
+            '(1 + 2; -; procedimiento(x { x };',
+        ]
+        for source in sources:
+            parser = Parser(Lexer(source))
+            program = parser.parse_program()
+            iterative_parser = IterativeParser(Lexer(source))
+            iterative_program = iterative_parser.parse_program()
+
+            self.assertEqual(str(iterative_program), str(program))
+            self.assertEqual(iterative_parser.errors, parser.errors)
+
+    def test_iterative_parser_deep_nesting(self) -> None:
+        depth = 5000
+        sources = [
+            '(' * depth + '1' + ')' * depth,
+            '-' * depth + '1',
+            'si (verdadero) { ' * depth + '1' + ' }' * depth,
+            'f(' * depth + ')' * depth,
+        ]
+        for source in sources:
+            parser = IterativeParser(Lexer(source))
+            program = parser.parse_program()
+
+            self.assertEqual(len(parser.errors), 0)
+            self.assertEqual(len(program.statements), 1)
+
+    def test_parse_token_stream(self) -> None:
+        source = '''
+            variable suma = procedimiento(x, y) { regresa x + y; };
+            suma(1, 2 * 3);
+        '''
+        lexer_program = Parser(Lexer(source)).parse_program()
+
+        parser = Parser(tokenize(source))
+        program = parser.parse_program()
+
+        self.assertEqual(len(parser.errors), 0)
+        self.assertEqual(str(program), str(lexer_program))
+
     def test_return_statement(self) -> None:
         source = '''
             regresa 5;
@@ -527,12 +661,14 @@ class ParserTest(TestCase):
         self.assertIsInstance(expression, Identifier)
         identifier = cast(Identifier, expression)
         self.assertEqual(identifier.value, expected_value)
+        assert identifier.token is not None
         self.assertEqual(identifier.token.literal, expected_value)
 
     def _test_integer(self, expression: Expression, expected_value: int) -> None:
         self.assertIsInstance(expression, Integer)
         integer = cast(Integer, expression)
         self.assertEqual(integer.value, expected_value)
+        assert integer.token is not None
         self.assertEqual(integer.token.literal, str(expected_value))
 
     def _test_infix_expression(
@@ -555,4 +691,5 @@ class ParserTest(TestCase):
         self.assertIsInstance(expression, Boolean)
         boolean = cast(Boolean, expression)
         self.assertEqual(boolean.value, expected_value)
+        assert boolean.token is not None
         self.assertEqual(boolean.token.literal, 'verdadero' if expected_value else 'falso')
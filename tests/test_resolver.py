@@ -0,0 +1,132 @@
+from typing import cast
+from unittest import TestCase
+
+import lpp.ast as ast
+from lpp.evaluator import evaluate
+from lpp.hash_cons import HashConser, hash_cons
+from lpp.lexer import Lexer
+from lpp.object import (
+    Enviroment,
+    Integer,
+)
+from lpp.parser import Parser
+from lpp.resolver import (
+    BY_NAME,
+    DYNAMIC,
+    Name,
+    resolve,
+)
+
+class ResolverTest(TestCase):
+
+    def test_identifiers(self) -> None:
+        program = self._parse('''
+            variable f = procedimiento(a, b) {
+                variable c = a;
+                procedimiento(b) { a + b + c + d };
+            };
+        ''')
+        resolve(program)
+
+        let_statement = cast(ast.LetStatement, program.statements[0])
+        outer = cast(ast.Function, let_statement.value)
+        assert outer.body is not None
+        inner_let = cast(ast.LetStatement, outer.body.statements[0])
+        inner_statement = cast(ast.ExpressionStatement, outer.body.statements[1])
+        inner = cast(ast.Function, inner_statement.expression)
+        assert inner.body is not None
+        body = cast(ast.ExpressionStatement, inner.body.statements[0]).expression
+
+        self.assertEqual(let_statement.slot, BY_NAME)
+        self.assertEqual(inner_let.slot, 2)
+        self.assertEqual(cast(ast.Identifier, inner_let.value).resolved, Name('a', ((0, 0),)))
+
+        resolved = [
+            cast(ast.Identifier, node).resolved
+            for node in ast.walk(cast(ast.ASTNode, body))
+            if type(node) == ast.Identifier
+        ]
+        self.assertEqual(resolved, [
+            Name('a', ((1, 0),)),
+            Name('b', ((0, 0), (1, 1))),
+            Name('c', ((1, 2),)),
+            Name('d', ()),
+        ])
+
+    def test_shared_nodes_in_different_contexts(self) -> None:
+        # the inner functions are at the same offset, so they are shared
+        conser = HashConser()
+        sources = [
+            'variable f = procedimiento(a, b) { procedimiento() { a } }; f(1, 2)();',
+            'variable f = procedimiento(b, a) { procedimiento() { a } }; f(2, 3)();',
+        ]
+        results: list[int] = []
+        for source in sources:
+            program = hash_cons(self._parse(source), conser)
+            evaluated = evaluate(program, Enviroment())
+            self.assertIsInstance(evaluated, Integer)
+            results.append(cast(Integer, evaluated).value)
+
+        self.assertEqual(results, [1, 3])
+        identifiers = [
+            cast(ast.Identifier, node)
+            for node in ast.walk(program)
+            if type(node) == ast.Identifier and cast(ast.Identifier, node).value == 'a'
+        ]
+        self.assertIn(DYNAMIC, [identifier.resolved for identifier in identifiers])
+
+    def test_unset_slots_fall_back_to_outer_scopes(self) -> None:
+        source = '''
+            variable x = 1;
+            variable f = procedimiento(x) {
+                si (x) { variable y = 5; }
+                procedimiento(x) { x + y }(10);
+            };
+            variable y = 100;
+            f(verdadero) + f(falso) + procedimiento(x) { x }();
+        '''
+        evaluated = evaluate(self._parse(source), Enviroment())
+
+        self.assertIsInstance(evaluated, Integer)
+        self.assertEqual(cast(Integer, evaluated).value, 15 + 110 + 1)
+
+    def test_shared_return_statements_in_tail_position(self) -> None:
+        # the return statements are at the same offset, so they are shared
+        conser = HashConser()
+        sources = [
+            '''
+                variable g = procedimiento(x) { x + 1 };
+                variable f = procedimiento(x) {
+                                 si (x > 0) { regresa g(x); }  };
+                f(1);
+            ''',
+            '''
+                variable g = procedimiento(x) { x + 1 };
+                variable f = procedimiento(x) {
+                    variable y = si (x > 0) { regresa g(x); }; y };
+                f(2);
+            ''',
+        ]
+        results: list[int] = []
+        returns: dict[int, ast.ReturnStatement] = {}
+        for source in sources:
+            program = hash_cons(self._parse(source), conser)
+            evaluated = evaluate(program, Enviroment())
+            self.assertIsInstance(evaluated, Integer)
+            results.append(cast(Integer, evaluated).value)
+            returns.update({
+                id(node): cast(ast.ReturnStatement, node)
+                for node in ast.walk(program)
+                if type(node) == ast.ReturnStatement
+            })
+
+        self.assertEqual(results, [2, 3])
+        self.assertEqual(len(returns), 1)
+        self.assertEqual([node.tail for node in returns.values()], [False])
+
+    def _parse(self, source: str) -> ast.Program:
+        parser = Parser(Lexer(source))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+
+        return program
@@ -0,0 +1,136 @@
+from typing import cast
+from unittest.mock import patch
+
+import lpp.ast as ast
+from lpp.compiler import Opcode, compile_program
+from lpp.flat_ast import FlatProgram
+from lpp.lexer import Lexer
+from lpp.object import (
+    Enviroment,
+    Integer,
+    Object,
+    String,
+)
+from lpp.parser import Parser
+from lpp.vm import Closure, execute, run
+from tests import test_evaluator
+
+class VMTest(test_evaluator.EvaluatorTest):
+
+    def test_closure(self) -> None:
+        evaluated = self._evaluate_tests('procedimiento(x) { x + 2; };')
+
+        self.assertIsInstance(evaluated, Closure)
+
+    def test_same_results_as_evaluate(self) -> None:
+        programs = test_evaluator.PROGRAMS + [
+            '''
+                variable contador = procedimiento(n) {
+                    variable siguiente = procedimiento() { n + 1 };
+                    variable n = n * 10;
+                    siguiente();
+                };
+                contador(4);
+            ''',
+            '''
+                variable f = procedimiento(a) {
+                    si (a > 0) { variable b = a; }
+                    procedimiento() { b }();
+                };
+                variable b = "global";
+                f(1) + " " + f(0);
+            ''',
+            'variable x = si (verdadero) { regresa 1; }; x;',
+            '1 + si (verdadero) { regresa 2; };',
+        ]
+        self._test_same_results_as_evaluate(execute, programs)
+
+    def test_deep_recursion(self) -> None:
+        source = '''
+            variable cuenta = procedimiento(n) {
+                si (n == 0) { regresa 0; }
+                regresa 1 + cuenta(n - 1);
+            };
+            cuenta(20000);
+        '''
+        evaluated = self._evaluate_tests(source)
+
+        self._test_integer_object(evaluated, 20000)
+
+    def test_bytecode(self) -> None:
+        code = compile_program(self._parse('si (a) { 1 } si_no { 2 };'))
+        opcodes = [Opcode(op) for op in code.instructions[::2]]
+
+        self.assertEqual(opcodes, [
+            Opcode.LOAD_GLOBAL,
+            Opcode.JUMP_IF_FALSY,
+            Opcode.LOAD_CONST,
+            Opcode.JUMP,
+            Opcode.LOAD_CONST,
+            Opcode.RETURN,
+        ])
+        self.assertEqual(code.instructions[3], 8)
+        self.assertEqual(code.instructions[7], 10)
+
+    def test_unboxed_values(self) -> None:
+        code = compile_program(self._parse('''
+            variable a = 2 * 3;
+            si (falso) { 1 };
+            "b";
+            a < 10;
+        '''))
+        env = Enviroment()
+
+        self.assertEqual([type(constant) for constant in code.constants], [
+            int, int, bool, int, type(None), String, int,
+        ])
+        self.assertIs(run(code, env), True)
+        self.assertIsInstance(env['a'], Integer)
+        self._test_boolean_object(cast(Object, execute(self._parse('a < 10;'), env)), True)
+
+    def test_flat_programs_are_compiled_from_their_arrays(self) -> None:
+        for source in test_evaluator.PROGRAMS:
+            with self.subTest(source=source):
+                program = self._parse(source)
+                flat_program = Parser(Lexer(source)).parse_program(flat=True)
+                assert type(flat_program) == FlatProgram
+
+                expected = execute(program, Enviroment())
+                with patch.object(FlatProgram, 'node', side_effect=AssertionError):
+                    executed = execute(flat_program, Enviroment())
+                    code = compile_program(flat_program)
+
+                self.assertEqual(
+                    code.disassemble(),
+                    compile_program(program).disassemble()
+                )
+                if expected is None:
+                    self.assertIsNone(executed)
+                    continue
+
+                assert isinstance(executed, Object)
+                self.assertEqual(executed.inspect(), expected.inspect())
+
+    def test_lazy_bodies_are_compiled_when_called(self) -> None:
+        self._test_lazy_bodies_are_parsed_when_called(execute)
+
+    def test_syntax_errors_in_lazy_bodies(self) -> None:
+        program = Parser(
+            Lexer(test_evaluator.LAZY_SYNTAX_ERROR),
+            lazy_functions=True,
+        ).parse_program()
+
+        self._test_lazy_syntax_error(execute(program, Enviroment()))
+
+    def _evaluate_tests(self, source: str) -> Object:
+        evaluated = execute(self._parse(source), Enviroment())
+
+        assert evaluated is not None
+        return evaluated
+
+    def _parse(self, source: str) -> ast.Program:
+        parser = Parser(Lexer(source))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+
+        return program